@@ -0,0 +1,530 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Iterator, Optional
+
+import requests
+
+import utils
+from archive import archive_generation, get_archive
+from batch import DEFAULT_ASPECT_RATIO, iter_briefs
+from gemini_standin import standin_response
+from request_scheduler import set_request_priority
+from utils import (
+    GeminiAPIError, batch_response_result, build_payload, generation_log_fields, get_api_key,
+    get_current_date, http_request, json_dumps, json_loads, log_rows_to_excel, output_token_budget,
+)
+from video_gen import DEFAULT_GEMINI_MODEL, normalise_model, storyboard_payload, storyboard_result
+
+
+# One directory per submitted batch: packed requests, job details, downloaded results and batch.json state
+BATCH_JOBS_DIR = "batch_jobs"
+REQUESTS_FILE = "requests.jsonl"
+JOBS_FILE = "jobs.jsonl"
+RESULTS_FILE = "results.jsonl"
+STATE_FILE = "batch.json"
+# The local stand-in keeps its "remote" copies here
+LOCAL_BATCH_DIR = os.path.join(BATCH_JOBS_DIR, "local")
+
+BATCH_BACKENDS = ("gemini", "local")
+# Batch jobs trade latency for cost (Gemini completes them within 24h), so poll sparsely
+BATCH_POLL_SECONDS = 60
+BATCH_TIMEOUT_SECONDS = 24 * 3600
+TERMINAL_STATES = ("succeeded", "failed", "cancelled", "expired")
+# Results are written to the job log this many rows per workbook write
+FAN_BACK_CHUNK = 200
+
+GEMINI_FILES_UPLOAD_URL = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+GEMINI_FILES_DOWNLOAD_BASE = "https://generativelanguage.googleapis.com/download/v1beta"
+
+# Brief fields kept per job so results can be logged like run_workflow rows
+JOB_FIELDS = ("title", "prompt", "aspect_ratio", "budget_key", "user_message")
+
+
+class BatchJobError(ValueError):
+    """A batch job could not be submitted, ended without results, or timed out."""
+
+
+class BatchBackend(ABC):
+    """
+    Where batch jobs run. submit() takes a JSONL file of {"key", "request"}
+    lines (generateContent payloads) and returns the backend's job name,
+    poll() reports {"state", "stats"?, "error"?} with state one of pending,
+    running or TERMINAL_STATES, and download() writes the {"key", "response"}
+    or {"key", "error"} result lines of a succeeded job to a file.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def submit(self, requests_path: str, model: str, display_name: str) -> str:
+        ...
+
+    @abstractmethod
+    def poll(self, job_name: str) -> dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def download(self, job_name: str, results_path: str) -> None:
+        ...
+
+
+def _write_atomic(chunks: Iterable[bytes], path: str) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+    os.replace(temp_path, path)
+
+
+class GeminiBatchBackend(BatchBackend):
+    """
+    Gemini Batch API: the request file is uploaded through the Files API and
+    run as one batchGenerateContent job at the batch discount; results come
+    back as a file of the same keyed lines.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or get_api_key()
+        # Cassettes only cover generateContent, so the replay placeholder key cannot submit a batch
+        if not self.api_key or self.api_key == utils.REPLAY_API_KEY:
+            raise BatchJobError("Missing Gemini API key. Set GEMINI_API_KEY or KIE_API_TOKEN.")
+        # Batch operations live next to the models collection (.../v1beta/batches/...)
+        self.api_root = utils.GEMINI_API_BASE.rsplit("/models", 1)[0]
+
+    def _request(self, method: str, url: str, params: Optional[dict[str, str]] = None, timeout: float = 60, **kwargs: Any) -> requests.Response:
+        try:
+            response = http_request(method, url, params={"key": self.api_key, **(params or {})}, timeout=timeout, **kwargs)
+        except requests.RequestException as exc:
+            raise GeminiAPIError(f"Gemini batch request failed: {exc}") from exc
+        if response.status_code != 200:
+            raise GeminiAPIError(f"Gemini API error {response.status_code}: {response.text}", response.status_code)
+        return response
+
+    def submit(self, requests_path: str, model: str, display_name: str) -> str:
+        size = os.path.getsize(requests_path)
+        started = self._request(
+            "POST",
+            GEMINI_FILES_UPLOAD_URL,
+            data=json_dumps({"file": {"display_name": display_name}}),
+            headers={
+                "Content-Type": "application/json",
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+            },
+        )
+        upload_url = started.headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise BatchJobError("Gemini Files API did not return an upload URL")
+        with open(requests_path, "rb") as handle:
+            uploaded = self._request(
+                "POST",
+                upload_url,
+                data=handle,
+                timeout=600,
+                headers={
+                    "Content-Length": str(size),
+                    "X-Goog-Upload-Offset": "0",
+                    "X-Goog-Upload-Command": "upload, finalize",
+                },
+            )
+        file_name = json_loads(uploaded.content)["file"]["name"]
+
+        created = self._request(
+            "POST",
+            f"{utils.GEMINI_API_BASE}/{model}:batchGenerateContent",
+            data=json_dumps({"batch": {"display_name": display_name, "input_config": {"file_name": file_name}}}),
+            headers={"Content-Type": "application/json"},
+        )
+        return json_loads(created.content)["name"]
+
+    def _operation(self, job_name: str) -> dict[str, Any]:
+        return json_loads(self._request("GET", f"{self.api_root}/{job_name}").content)
+
+    def poll(self, job_name: str) -> dict[str, Any]:
+        operation = self._operation(job_name)
+        metadata = operation.get("metadata", {})
+        # BATCH_STATE_SUCCEEDED -> "succeeded"
+        state = metadata.get("state", "BATCH_STATE_PENDING").rsplit("_", 1)[-1].lower()
+        return {
+            "state": state,
+            "stats": metadata.get("batchStats", {}),
+            "error": operation.get("error", {}).get("message", ""),
+        }
+
+    def download(self, job_name: str, results_path: str) -> None:
+        results_file = self._operation(job_name).get("response", {}).get("responsesFile")
+        if not results_file:
+            raise BatchJobError(f"Batch job {job_name} has no results file")
+        response = self._request(
+            "GET", f"{GEMINI_FILES_DOWNLOAD_BASE}/{results_file}:download", params={"alt": "media"}, stream=True, timeout=600
+        )
+        _write_atomic(response.iter_content(2**20), results_path)
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Offline stand-in for the Batch API. A background thread answers every
+    request line the way gemini_standin.py would (schema-shaped replies)
+    after turnaround_seconds, so submit, poll and fan-back can be exercised
+    without network or quota. Jobs are files under `directory`; a job that
+    was cut short (e.g. the process exited) is picked up again on the next poll.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = LOCAL_BATCH_DIR, turnaround_seconds: float = 0.0):
+        self.directory = directory
+        self.turnaround_seconds = turnaround_seconds
+        self._workers: dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, job_name: str) -> tuple[str, str]:
+        job_id = job_name.rsplit("/", 1)[-1]
+        return (
+            os.path.join(self.directory, f"{job_id}.requests.jsonl"),
+            os.path.join(self.directory, f"{job_id}.results.jsonl"),
+        )
+
+    def submit(self, requests_path: str, model: str, display_name: str) -> str:
+        job_name = f"batches/local-{uuid.uuid4().hex[:12]}"
+        os.makedirs(self.directory, exist_ok=True)
+        shutil.copyfile(requests_path, self._paths(job_name)[0])
+        self._start(job_name)
+        return job_name
+
+    def _start(self, job_name: str) -> None:
+        with self._lock:
+            worker = self._workers.get(job_name)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self._process, args=(job_name,), name="local-batch", daemon=True)
+                self._workers[job_name] = worker
+                worker.start()
+
+    def _answer(self, line: bytes) -> dict[str, Any]:
+        key = None
+        try:
+            entry = json_loads(line)
+            key = entry.get("key")
+            return {"key": key, "response": standin_response(entry["request"], len(line))}
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            return {"key": key, "error": {"code": 400, "message": f"Invalid batch request line: {exc}"}}
+
+    def _process(self, job_name: str) -> None:
+        requests_path, results_path = self._paths(job_name)
+        time.sleep(self.turnaround_seconds)
+        with open(requests_path, "rb") as source:
+            _write_atomic((json_dumps(self._answer(line)) + b"\n" for line in source if line.strip()), results_path)
+
+    def poll(self, job_name: str) -> dict[str, Any]:
+        requests_path, results_path = self._paths(job_name)
+        if os.path.exists(results_path):
+            return {"state": "succeeded"}
+        if not os.path.exists(requests_path):
+            return {"state": "failed", "error": f"Unknown local batch job {job_name}"}
+        self._start(job_name)
+        return {"state": "running"}
+
+    def download(self, job_name: str, results_path: str) -> None:
+        shutil.copyfile(self._paths(job_name)[1], results_path)
+
+
+def make_backend(name: str, turnaround_seconds: float = 0.0) -> BatchBackend:
+    if name == "gemini":
+        return GeminiBatchBackend()
+    if name == "local":
+        return LocalBatchBackend(turnaround_seconds=turnaround_seconds)
+    raise ValueError(f"Unknown batch backend '{name}', expected one of {BATCH_BACKENDS}")
+
+
+def _load_state(directory: str) -> dict[str, Any]:
+    with open(os.path.join(directory, STATE_FILE), "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _save_state(directory: str, state: dict[str, Any]) -> None:
+    path = os.path.join(directory, STATE_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _iter_jsonl(path: str) -> Iterator[dict[str, Any]]:
+    with open(path, "rb") as handle:
+        for line in handle:
+            if line.strip():
+                yield json_loads(line)
+
+
+def _brief_request(brief: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """
+    The (kind, generateContent payload) for one brief. Briefs with a
+    "user_message" are ainvoke_llm-style calls ("system_prompt",
+    "temperature"?, "response_schema"?); the rest are storyboard requests.
+    """
+    if "user_message" in brief:
+        if not brief.get("system_prompt"):
+            raise ValueError("Batch LLM briefs need a system_prompt")
+        budget_key = brief.get("budget_key") or "llm"
+        kind = "llm"
+        payload = build_payload(
+            brief["system_prompt"], brief["user_message"], brief.get("temperature", 0.1), brief.get("response_schema"), label=budget_key
+        )
+    else:
+        budget_key = brief.get("budget_key") or "storyboard"
+        kind = "storyboard"
+        payload = storyboard_payload(brief["prompt"], brief.get("aspect_ratio", DEFAULT_ASPECT_RATIO), brief.get("budget_key"))
+    # A batch result cannot be continued, so set the adaptive output budget up front
+    payload["generationConfig"]["maxOutputTokens"] = output_token_budget(budget_key)
+    return kind, payload
+
+
+def submit_batch(
+    briefs: Iterable[dict[str, Any]],
+    backend: BatchBackend,
+    model: Optional[str] = None,
+    jobs_dir: str = BATCH_JOBS_DIR,
+) -> str:
+    """
+    Pack briefs (see batch.iter_briefs) into one request file and submit it
+    as a single batch job. A batch runs one model; briefs naming another
+    model are rejected. Returns the batch directory, whose batch.json
+    records the submission for wait_for_batch / fan_back (or --resume).
+    """
+    target_model = normalise_model(model)
+    batch_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    directory = os.path.join(jobs_dir, batch_id)
+    os.makedirs(directory)
+    requests_path = os.path.join(directory, REQUESTS_FILE)
+
+    jobs = 0
+    try:
+        with open(requests_path, "wb") as request_file, open(os.path.join(directory, JOBS_FILE), "wb") as job_file:
+            for brief in briefs:
+                if brief.get("model") and normalise_model(brief["model"]) != target_model:
+                    raise ValueError(f"Brief asks for {brief['model']} but this batch runs {target_model}; submit it separately")
+                key = brief.get("job_id") or uuid.uuid4().hex
+                kind, payload = _brief_request(brief)
+                request_file.write(json_dumps({"key": key, "request": payload}) + b"\n")
+                details = {field: brief.get(field) for field in JOB_FIELDS}
+                if kind == "storyboard":
+                    details["aspect_ratio"] = brief.get("aspect_ratio", DEFAULT_ASPECT_RATIO)
+                job_file.write(json_dumps({"key": key, "kind": kind, "created_at": get_current_date(), **details}) + b"\n")
+                jobs += 1
+        if not jobs:
+            raise ValueError("No briefs to submit")
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    state = {
+        "id": batch_id,
+        "backend": backend.name,
+        "model": target_model,
+        "jobs": jobs,
+        "job_name": backend.submit(requests_path, target_model, f"storyboards-{batch_id}"),
+        "state": "pending",
+        "submitted_at": time.time(),
+        "finished_at": None,
+        "fanned_back": 0,
+        "fan_back_done": False,
+    }
+    _save_state(directory, state)
+    print(f"Batch {batch_id}: {jobs} requests submitted to {backend.name} as {state['job_name']}")
+    return directory
+
+
+def wait_for_batch(
+    directory: str,
+    backend: BatchBackend,
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    timeout: float = BATCH_TIMEOUT_SECONDS,
+) -> dict[str, Any]:
+    """
+    Poll a submitted batch until it finishes, then download its results into
+    the batch directory. Raises BatchJobError if the job failed, was
+    cancelled or expired, or is still running after `timeout` seconds.
+    """
+    state = _load_state(directory)
+    while state["state"] not in TERMINAL_STATES:
+        status = backend.poll(state["job_name"])
+        if status["state"] != state["state"]:
+            print(f"Batch {state['id']}: {status['state']} {status.get('stats') or ''}".rstrip())
+            state["state"] = status["state"]
+            if status["state"] in TERMINAL_STATES:
+                state["finished_at"] = time.time()
+                state["error"] = status.get("error", "")
+            _save_state(directory, state)
+        if state["state"] in TERMINAL_STATES:
+            break
+        if time.time() - state["submitted_at"] > timeout:
+            raise BatchJobError(f"Batch {state['id']} still {state['state']} after {timeout:.0f}s, resume it later with --resume {directory}")
+        time.sleep(poll_seconds)
+
+    if state["state"] != "succeeded":
+        raise BatchJobError(f"Batch {state['id']} ended {state['state']}: {state.get('error') or 'no details'}")
+    results_path = os.path.join(directory, RESULTS_FILE)
+    if not os.path.exists(results_path):
+        backend.download(state["job_name"], results_path)
+    return state
+
+
+def _log_entry(key: str, job: dict[str, Any]) -> dict[str, Any]:
+    return {
+        'task_id': key,
+        'title': job.get('title') or "",
+        'prompt': job.get('prompt') or job.get('user_message') or "",
+        'status': "in_progress",
+        'created_at': job['created_at'],
+        'video_url': "",
+        'gemini_output': "",
+        'error': "",
+        'aspect_ratio': job.get('aspect_ratio') or "",
+    }
+
+
+def _job_outcome(job: dict[str, Any], result: dict[str, Any], model: str, api_key: Optional[str]) -> dict[str, Any]:
+    """A start_video_generation-shaped result for one batch result line."""
+    if "response" not in result:
+        error = result.get("error") or {}
+        message = error.get("message", error) if isinstance(error, dict) else error
+        return {"status": "failed", "model": model, "error": f"Gemini batch error: {message or 'no response'}"}
+
+    response = batch_response_result(model, result["response"], job.get("budget_key") or job["kind"])
+    if job["kind"] == "storyboard":
+        # Same validation and shot repair as an interactive storyboard
+        return storyboard_result(response, api_key, job.get("budget_key"))
+    if not response["text"]:
+        return {"status": "failed", "model": model, "error": "Gemini response did not include any text output."}
+    return {
+        "status": "completed",
+        "model": model,
+        "response": {key: response[key] for key in ("text", "raw", "finish_reason", "usage")},
+    }
+
+
+def fan_back(directory: str, chunk: int = FAN_BACK_CHUNK) -> dict[str, int]:
+    """
+    Write every result of a finished batch to the job log, chunk rows per
+    workbook write, and archive storyboard results. Jobs the batch returned
+    nothing for are logged as failed. storyboard_latency_ms is the batch
+    turnaround. Progress is saved after each chunk, so an interrupted
+    fan-back resumes where it stopped instead of logging rows twice.
+    """
+    state = _load_state(directory)
+    counts = {"jobs": state["jobs"], "completed": 0, "failed": 0, "missing": 0}
+    if state["fan_back_done"]:
+        return counts
+    # Shot repairs go through the normal request path behind interactive traffic
+    set_request_priority("backfill")
+    api_key = get_api_key()
+    latency_ms = (state["finished_at"] - state["submitted_at"]) * 1000
+    jobs = {job.pop("key"): job for job in _iter_jsonl(os.path.join(directory, JOBS_FILE))}
+    pending: list[dict[str, Any]] = []
+
+    def flush(position: int) -> None:
+        if pending:
+            log_rows_to_excel(pending)
+            pending.clear()
+        state["fanned_back"] = position
+        _save_state(directory, state)
+
+    def add(entry: dict[str, Any], generation_result: dict[str, Any]) -> None:
+        entry.update(generation_log_fields(generation_result, latency_ms))
+        if generation_result.get("status") == "completed":
+            entry['status'] = "completed"
+            entry['gemini_output'] = generation_result["response"]["text"]
+            counts["completed"] += 1
+        else:
+            entry['status'] = "failed"
+            entry['error'] = generation_result.get("error", "Unknown error")
+            counts["failed"] += 1
+        pending.append(entry)
+
+    position = 0
+    for position, result in enumerate(_iter_jsonl(os.path.join(directory, RESULTS_FILE)), start=1):
+        key = result.get("key")
+        job = jobs.pop(key, None)
+        if job is None:
+            print(f"Batch {state['id']}: ignoring result for unknown key {key!r}")
+            continue
+        if position <= state["fanned_back"]:
+            continue
+        entry = _log_entry(key, job)
+        generation_result = _job_outcome(job, result, state["model"], api_key)
+        if job["kind"] == "storyboard":
+            archive_generation(key, entry, generation_result, latency_ms)
+        add(entry, generation_result)
+        if len(pending) >= chunk:
+            flush(position)
+
+    for key, job in jobs.items():
+        counts["missing"] += 1
+        add(_log_entry(key, job), {"status": "failed", "model": state["model"], "error": "The batch job returned no result for this request"})
+    state["fan_back_done"] = True
+    flush(position)
+
+    archive = get_archive()
+    if archive is not None:
+        archive.flush()
+    print(f"Batch {state['id']}: fanned back into the job log: {counts}")
+    return counts
+
+
+def run_batch_job(
+    briefs: Iterable[dict[str, Any]],
+    backend: BatchBackend,
+    model: Optional[str] = None,
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    timeout: float = BATCH_TIMEOUT_SECONDS,
+    jobs_dir: str = BATCH_JOBS_DIR,
+) -> dict[str, int]:
+    """Submit briefs as one batch job, wait for it and fan the results back into the job log."""
+    directory = submit_batch(briefs, backend, model, jobs_dir)
+    wait_for_batch(directory, backend, poll_seconds, timeout)
+    return fan_back(directory)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline bulk storyboard generation through a batch job")
+    parser.add_argument("briefs", nargs="?", help="JSONL file of briefs (or one prompt per line)")
+    parser.add_argument("--model", default=DEFAULT_GEMINI_MODEL, help="model for the whole batch")
+    parser.add_argument("--backend", choices=BATCH_BACKENDS, default="gemini",
+                        help="gemini uses the Gemini Batch API; local processes the file offline with stand-in replies")
+    parser.add_argument("--resume", metavar="BATCH_DIR", help="keep waiting for (and fan back) an earlier submission")
+    parser.add_argument("--no-wait", action="store_true", help="submit and exit; finish later with --resume")
+    parser.add_argument("--poll-seconds", type=float, default=BATCH_POLL_SECONDS)
+    parser.add_argument("--timeout", type=float, default=BATCH_TIMEOUT_SECONDS, help="give up waiting after this many seconds")
+    parser.add_argument("--turnaround-seconds", type=float, default=0.0, help="simulated queue time of the local backend")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        directory = args.resume
+        backend = make_backend(_load_state(directory)["backend"], args.turnaround_seconds)
+    elif args.briefs:
+        backend = make_backend(args.backend, args.turnaround_seconds)
+        directory = submit_batch(iter_briefs(args.briefs), backend, args.model)
+        if args.no_wait:
+            print(f"Resume with: python batch_submit.py --resume {directory}")
+            return
+    else:
+        parser.error("a briefs file is required unless --resume is given")
+
+    wait_for_batch(directory, backend, args.poll_seconds, args.timeout)
+    fan_back(directory)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    main()
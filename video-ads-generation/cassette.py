@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+
+# GEMINI_CASSETTE_MODE=record saves every Gemini exchange, =replay serves them back with no network
+CASSETTE_MODE_ENV = "GEMINI_CASSETTE_MODE"
+CASSETTE_PATH_ENV = "GEMINI_CASSETTE"
+# Replay timing: 1 keeps the recorded latency, 0.5 halves it, 0 replies immediately
+CASSETTE_SPEED_ENV = "GEMINI_CASSETTE_SPEED"
+# "request" replays the recording of the same request; "sequence" replays in recorded order
+CASSETTE_MATCH_ENV = "GEMINI_CASSETTE_MATCH"
+
+DEFAULT_CASSETTE_PATH = "gemini_cassette.jsonl"
+CASSETTE_MODES = ("record", "replay")
+MATCH_MODES = ("request", "sequence")
+
+
+class CassetteMissError(ValueError):
+    """Replay found no recording for a request."""
+
+    retryable = False
+
+
+def request_key(model: str, payload: dict[str, Any]) -> str:
+    """
+    Identify a request by model, prompt and response schema. Sampling settings
+    such as the adaptive maxOutputTokens are left out so replays still match
+    after the output budgets have moved.
+    """
+    generation_config = payload.get("generationConfig", {})
+    identity = {
+        "model": model,
+        "systemInstruction": payload.get("systemInstruction"),
+        "contents": payload.get("contents"),
+        "responseSchema": generation_config.get("responseSchema"),
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Records generateContent exchanges to a JSONL file and replays them offline.
+    Each entry holds the request, the decoded response (or the error and
+    status code) and the latency seen when recording. A request recorded
+    several times is replayed round-robin, so replays can run longer than the
+    recording.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CASSETTE_PATH,
+        mode: Optional[str] = None,
+        speed: float = 1.0,
+        match: str = "request",
+    ):
+        if mode is not None and mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {CASSETTE_MODES}")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown cassette match '{match}', expected one of {MATCH_MODES}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.match = match
+        self._lock = threading.Lock()
+        self._by_key: Optional[dict[str, deque]] = None
+        self._sequence: Optional[deque] = None
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+    def record(
+        self,
+        model: str,
+        payload: dict[str, Any],
+        latency_ms: float,
+        response: Optional[dict[str, Any]] = None,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None,
+    ) -> None:
+        """Append one exchange to the cassette (a no-op unless recording)."""
+        if self.mode != "record":
+            return
+        entry = {
+            "key": request_key(model, payload),
+            "model": model,
+            "request": payload,
+            "latency_ms": round(latency_ms, 1),
+            "status_code": status_code,
+            "response": response,
+            "error": error,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(line)
+            self._stats["recorded"] += 1
+
+    def _load(self) -> None:
+        by_key: dict[str, deque] = {}
+        sequence: deque = deque()
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                by_key.setdefault(entry["key"], deque()).append(entry)
+                sequence.append(entry)
+        self._by_key, self._sequence = by_key, sequence
+
+    def next_entry(self, model: str, payload: dict[str, Any]) -> dict[str, Any]:
+        """
+        Take the recorded exchange for a request and wait out its recorded
+        latency scaled by speed. Raises CassetteMissError when nothing matches.
+        """
+        with self._lock:
+            if self._by_key is None:
+                self._load()
+            queue = self._sequence if self.match == "sequence" else self._by_key.get(request_key(model, payload))
+            if not queue:
+                self._stats["misses"] += 1
+                raise CassetteMissError(f"No recorded Gemini response for this {model} request in {self.path}")
+            entry = queue[0]
+            queue.rotate(-1)
+            self._stats["replayed"] += 1
+
+        if self.speed > 0:
+            time.sleep(entry["latency_ms"] * self.speed / 1000)
+        return entry
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, **self._stats}
+
+
+def _configured_cassette() -> Cassette:
+    return Cassette(
+        path=os.getenv(CASSETTE_PATH_ENV, DEFAULT_CASSETTE_PATH),
+        mode=os.getenv(CASSETTE_MODE_ENV) or None,
+        speed=float(os.getenv(CASSETTE_SPEED_ENV, "1")),
+        match=os.getenv(CASSETTE_MATCH_ENV, "request"),
+    )
+
+
+CASSETTE = _configured_cassette()
@@ -0,0 +1,84 @@
+import os
+import sys
+from typing import Any, Optional
+
+import utils
+from utils import json_dumps, json_loads, parse_failure_stats
+from video_gen import start_video_generation
+
+
+# A storyboard that passes validation, so the check makes no repair calls
+CHECK_STORYBOARD = {
+    "overview": "Continuation check storyboard",
+    "shots": [
+        {"timestamp": f"{i * 2}s-{i * 2 + 2}s", "visuals": "Product close-up", "camera": "Slow dolly in", "narration": "Line"}
+        for i in range(4)
+    ],
+    "call_to_action": "Shop now",
+}
+
+
+def _truncating_gemini(sent: list[dict[str, Any]]):
+    """
+    Stand-in for utils._post_gemini that cuts the first reply off halfway with
+    MAX_TOKENS. Like Gemini, a turn that still carries a responseSchema answers
+    with a fresh, complete object; a plain-text turn continues where it stopped.
+    """
+    text = json_dumps(CHECK_STORYBOARD).decode("utf-8")
+    half = len(text) // 2
+
+    def post(model: str, api_key: str, payload: dict[str, Any]) -> dict[str, Any]:
+        sent.append(payload)
+        if len(sent) == 1:
+            piece, finish_reason = text[:half], "MAX_TOKENS"
+        elif "responseSchema" in payload.get("generationConfig", {}):
+            piece, finish_reason = text, "STOP"
+        else:
+            piece, finish_reason = text[half:], "STOP"
+        return {
+            "candidates": [{"content": {"parts": [{"text": piece}]}, "finishReason": finish_reason}],
+            "usageMetadata": {"promptTokenCount": 400, "candidatesTokenCount": 60, "totalTokenCount": 460},
+        }
+
+    return post
+
+
+def schema_continuation_check() -> dict[str, Any]:
+    """
+    Generate one schema-constrained storyboard whose first reply is truncated
+    and check that the continuation turn went out without the schema and the
+    joined pieces parse as the original storyboard.
+    """
+    os.environ.setdefault("GEMINI_API_KEY", "continuation-check")
+    sent: list[dict[str, Any]] = []
+    original_post = utils._post_gemini
+    utils._post_gemini = _truncating_gemini(sent)
+    try:
+        result = start_video_generation("Continuation check brief", "16:9", budget_key="continuation-check")
+    finally:
+        utils._post_gemini = original_post
+
+    text = result.get("response", {}).get("text", "")
+    try:
+        parsed = json_loads(text)
+    except ValueError:
+        parsed = None
+    return {
+        "requests": len(sent),
+        "first_has_schema": "responseSchema" in sent[0].get("generationConfig", {}),
+        "continuation_has_schema": any("responseSchema" in payload.get("generationConfig", {}) for payload in sent[1:]),
+        "parsed_intact": parsed == CHECK_STORYBOARD,
+        "storyboard_parse": parse_failure_stats().get("storyboard"),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    result = schema_continuation_check()
+    print(f"Schema-mode continuation: {result}")
+    if result["requests"] < 2 or result["continuation_has_schema"] or not result["parsed_intact"]:
+        print("Truncated structured output was not recovered")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
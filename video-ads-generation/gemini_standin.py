@@ -0,0 +1,125 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+
+# Simulated generateContent latency: base plus uniform jitter
+STANDIN_LATENCY_MS = 800
+STANDIN_JITTER_MS = 200
+# Array fields in a responseSchema get this many items (4 shots x 2s fits the 8s storyboard limit)
+SAMPLE_ARRAY_ITEMS = 4
+
+
+def sample_from_schema(schema: dict[str, Any], name: str = "", index: int = 0) -> Any:
+    """Build a value that satisfies a Gemini responseSchema, with storyboard-valid timestamps."""
+    kind = str(schema.get("type", "STRING")).upper()
+    if kind == "OBJECT":
+        return {key: sample_from_schema(value, key, index) for key, value in schema.get("properties", {}).items()}
+    if kind == "ARRAY":
+        return [sample_from_schema(schema.get("items", {}), name, item) for item in range(SAMPLE_ARRAY_ITEMS)]
+    if kind in ("INTEGER", "NUMBER"):
+        return index
+    if kind == "BOOLEAN":
+        return True
+    if name == "timestamp":
+        return f"{index * 2}s-{index * 2 + 2}s"
+    return f"Stand-in {name or 'text'} {index}"
+
+
+def standin_response(payload: dict[str, Any], request_bytes: int) -> dict[str, Any]:
+    """The generateContent response the stand-in gives for a request payload."""
+    schema = payload.get("generationConfig", {}).get("responseSchema")
+    text = json.dumps(sample_from_schema(schema)) if schema else "Stand-in response text."
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": request_bytes // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": request_bytes // 4 + len(text) // 4,
+        },
+    }
+
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    server: "GeminiStandin"
+
+    def do_POST(self) -> None:
+        if not self.path.split("?", 1)[0].endswith(":generateContent"):
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Request body is not JSON")
+            return
+
+        self.server.simulate_latency()
+        response = json.dumps(standin_response(payload, len(body))).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Keep load-test output readable; the server counts requests instead
+        pass
+
+
+class GeminiStandin(ThreadingHTTPServer):
+    """
+    Local generateContent endpoint for load tests and offline runs. Point the
+    app at it with GEMINI_API_BASE=http://127.0.0.1:<port>/v1beta/models.
+    Schema requests get a schema-shaped JSON reply, everything else plain text.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency_ms: float = STANDIN_LATENCY_MS, jitter_ms: float = STANDIN_JITTER_MS):
+        super().__init__(("127.0.0.1", port), _StandinHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def api_base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1beta/models"
+
+    def simulate_latency(self) -> None:
+        with self._lock:
+            self.requests += 1
+        time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+    def start(self) -> "GeminiStandin":
+        """Serve from a background thread; returns self."""
+        threading.Thread(target=self.serve_forever, name="gemini-standin", daemon=True).start()
+        return self
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local Gemini generateContent stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=STANDIN_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=STANDIN_JITTER_MS)
+    args = parser.parse_args(argv)
+
+    server = GeminiStandin(args.port, args.latency_ms, args.jitter_ms)
+    print(f"Gemini stand-in listening, set GEMINI_API_BASE={server.api_base}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Stand-in served {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
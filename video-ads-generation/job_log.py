@@ -0,0 +1,257 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# The job log is split into one xlsx partition per period under JOB_LOG_DIR
+JOB_LOG_DIR_ENV = "JOB_LOG_DIR"
+DEFAULT_JOB_LOG_DIR = "job_log"
+# "day" or "month" partitions
+JOB_LOG_PARTITION_ENV = "JOB_LOG_PARTITION"
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+# A partition larger than this is rotated even if its period is still running
+JOB_LOG_ROTATE_MB_ENV = "JOB_LOG_ROTATE_MB"
+DEFAULT_ROTATE_MB = 5.0
+# Closed partitions stay writable this long so in-flight jobs can still update their rows
+SEAL_GRACE_SECONDS = 900
+
+MANIFEST_FILE = "manifest.json"
+# Advisory lock shared by every process writing to the same log directory
+LOCK_FILE = ".lock"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Exclusive advisory lock on path (created if missing), held across processes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class LogRow(NamedTuple):
+    """Where a job's row lives: partition file name and its DataFrame index there."""
+
+    partition: str
+    index: int
+
+
+class JobLog:
+    """
+    Date-partitioned job log. New rows go to the active partition only, which
+    is closed when its period ends or it grows past the rotation size; closed
+    partitions are sealed read-only once in-flight jobs had time to finish.
+    manifest.json lists every partition with its period, row count, first and
+    last write, so history readers can prune by date without opening files.
+    A pre-partitioning single-file log is kept as a sealed legacy partition.
+    Writers hold locked(), which also excludes other processes, and the
+    manifest is re-read from disk each time so every process sees the others'
+    partitions.
+    """
+
+    def __init__(
+        self,
+        stem: str,
+        directory: Optional[str] = None,
+        granularity: Optional[str] = None,
+        rotate_mb: Optional[float] = None,
+        legacy_file: Optional[str] = None,
+    ):
+        self.stem = stem
+        self.directory = directory or os.getenv(JOB_LOG_DIR_ENV, DEFAULT_JOB_LOG_DIR)
+        self.granularity = granularity or os.getenv(JOB_LOG_PARTITION_ENV, "month")
+        if self.granularity not in PERIOD_FORMATS:
+            raise ValueError(f"Unknown job log partitioning '{self.granularity}', expected one of {sorted(PERIOD_FORMATS)}")
+        self.rotate_bytes = int((rotate_mb or float(os.getenv(JOB_LOG_ROTATE_MB_ENV, DEFAULT_ROTATE_MB))) * 2**20)
+        self.legacy_file = legacy_file
+        self._lock = threading.RLock()
+        self._manifest: Optional[dict[str, Any]] = None
+        self._loaded_from: Optional[str] = None
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold the log against other threads and processes for one write."""
+        with self._lock, file_lock(os.path.join(self.directory, LOCK_FILE)):
+            self._manifest = None
+            yield
+
+    # Manifest -------------------------------------------------------------
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def _load(self) -> dict[str, Any]:
+        # Reload when the working directory moved (benchmarks and load tests run in scratch dirs)
+        location = os.path.abspath(self.manifest_path)
+        if self._manifest is not None and self._loaded_from == location:
+            return self._manifest
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as handle:
+                manifest = json.load(handle)
+        else:
+            manifest = {"granularity": self.granularity, "active": None, "partitions": []}
+            if self.legacy_file and os.path.exists(self.legacy_file):
+                manifest["partitions"].append({
+                    "file": os.path.relpath(os.path.abspath(self.legacy_file), os.path.abspath(self.directory)),
+                    "period": "legacy",
+                    "rows": None,
+                    "first_at": None,
+                    "last_at": None,
+                    "closed_at": None,
+                    "sealed": True,
+                })
+        self._manifest, self._loaded_from = manifest, location
+        return manifest
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(self._manifest, handle, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _partition(self, name: Optional[str]) -> Optional[dict[str, Any]]:
+        for partition in self._load()["partitions"]:
+            if partition["file"] == name:
+                return partition
+        return None
+
+    def path(self, name: str) -> str:
+        """Filesystem path of a partition; names are relative to the log directory."""
+        return os.path.join(self.directory, name)
+
+    # Write path -----------------------------------------------------------
+
+    def _open_partition(self, now: datetime) -> dict[str, Any]:
+        manifest = self._load()
+        period = now.strftime(PERIOD_FORMATS[self.granularity])
+        taken = {partition["file"] for partition in manifest["partitions"]}
+        name, sequence = f"{self.stem}-{period}.xlsx", 1
+        while name in taken:
+            name, sequence = f"{self.stem}-{period}.{sequence}.xlsx", sequence + 1
+        partition = {
+            "file": name, "period": period, "rows": 0,
+            "first_at": None, "last_at": None, "closed_at": None, "sealed": False,
+        }
+        manifest["partitions"].append(partition)
+        manifest["active"] = name
+        print(f"Job log partition opened: {name}")
+        return partition
+
+    def _close(self, partition: dict[str, Any], now: datetime) -> None:
+        partition["closed_at"] = now.strftime(TIMESTAMP_FORMAT)
+        self._load()["active"] = None
+
+    def _seal_closed(self, now: datetime) -> None:
+        for partition in self._load()["partitions"]:
+            if partition["sealed"] or partition["closed_at"] is None:
+                continue
+            closed_at = datetime.strptime(partition["closed_at"], TIMESTAMP_FORMAT)
+            if (now - closed_at).total_seconds() < SEAL_GRACE_SECONDS:
+                continue
+            path = self.path(partition["file"])
+            if os.path.exists(path):
+                os.chmod(path, 0o444)
+            partition["sealed"] = True
+            print(f"Job log partition sealed: {partition['file']}")
+
+    def _active(self, now: datetime) -> dict[str, Any]:
+        """The partition new rows go to, rolling over on period change or size."""
+        active = self._partition(self._load()["active"])
+        if active is not None:
+            period = now.strftime(PERIOD_FORMATS[self.granularity])
+            path = self.path(active["file"])
+            too_big = os.path.exists(path) and os.path.getsize(path) >= self.rotate_bytes
+            if active["period"] != period or too_big:
+                self._close(active, now)
+                active = None
+        if active is None:
+            active = self._open_partition(now)
+            self._save()
+        return active
+
+    def target(self, row: Union[LogRow, int, None] = None) -> tuple[str, Optional[int]]:
+        """
+        Resolve where a write goes: (partition, row index) for an update,
+        (active partition, None) for a new row. Updates to a partition
+        that has been sealed meanwhile are written as a new row instead.
+        A bare int row index refers to the active partition. Call inside locked().
+        """
+        with self._lock:
+            now = datetime.now()
+            if isinstance(row, int):
+                row = LogRow(self._active(now)["file"], row)
+            if row is not None:
+                partition = self._partition(row.partition)
+                if partition is not None and not partition["sealed"]:
+                    return partition["file"], row.index
+                print(f"Job log partition {row.partition} is sealed, appending the update as a new row")
+            return self._active(now)["file"], None
+
+    def committed(self, name: str, index: int, appended: bool, rows: int = 1) -> LogRow:
+        """Record a finished write (of `rows` appended rows) in the manifest and return the row's locator."""
+        with self._lock:
+            now = datetime.now()
+            partition = self._partition(name)
+            if appended and partition is not None:
+                stamp = now.strftime(TIMESTAMP_FORMAT)
+                partition["rows"] = (partition["rows"] or 0) + rows
+                partition["first_at"] = partition["first_at"] or stamp
+                partition["last_at"] = stamp
+                self._seal_closed(now)
+                self._save()
+            return LogRow(name, index)
+
+    # Read path ------------------------------------------------------------
+
+    def partitions(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[dict[str, Any]]:
+        """
+        Manifest entries (oldest first) that may hold rows written in
+        [since, until]; partitions whose first/last write falls outside the
+        range are pruned without being opened.
+        """
+        with self._lock:
+            self._manifest = None
+            selected = []
+            for partition in self._load()["partitions"]:
+                first_at, last_at = partition["first_at"], partition["last_at"]
+                if since is not None and last_at and datetime.strptime(last_at, TIMESTAMP_FORMAT) < since.replace(second=0, microsecond=0):
+                    continue
+                if until is not None and first_at and datetime.strptime(first_at, TIMESTAMP_FORMAT) > until:
+                    continue
+                if partition["rows"] == 0:
+                    continue
+                selected.append({**partition, "path": self.path(partition["file"])})
+            return selected
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._manifest = None
+            manifest = self._load()
+            return {
+                "active": manifest["active"],
+                "partitions": len(manifest["partitions"]),
+                "sealed": sum(1 for partition in manifest["partitions"] if partition["sealed"]),
+            }
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Iterable, Optional
+
+
+# Requests per minute allowed per key; unset means no client-side cap
+KEY_RPM_ENV = "GEMINI_KEY_RPM"
+# How long to wait for a usable key before giving up
+KEY_WAIT_SECONDS = 30
+# Default parking time when Gemini answers 429 (rate limited) or 403 (key rejected)
+PARK_SECONDS = {429: 60, 403: 300}
+WINDOW_SECONDS = 60
+
+
+def _key_id(key: str) -> str:
+    """Short, non-secret label for a key; hashed from the whole key so keys sharing a suffix stay apart."""
+    return f"key-{hashlib.blake2b(key.encode('utf-8'), digest_size=4).hexdigest()}"
+
+
+class _KeyState:
+    def __init__(self):
+        self.recent: deque = deque()
+        self.parked_until = 0.0
+        self.last_used = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def prune(self, now: float) -> None:
+        while self.recent and now - self.recent[0] >= WINDOW_SECONDS:
+            self.recent.popleft()
+
+
+class KeyPool:
+    """
+    Pool of Gemini API keys with per-key quota scheduling.
+    Each request is assigned to the key with the most remaining budget in the
+    current minute; keys that return 429/403 are parked until they cool down.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), rpm: Optional[int] = None):
+        self.rpm = rpm
+        self._keys: dict[str, _KeyState] = {}
+        self._cond = threading.Condition()
+        self.sync(keys)
+
+    def sync(self, keys: Iterable[str]) -> None:
+        """Add newly configured keys and forget removed ones, keeping stats for the rest."""
+        keys = list(dict.fromkeys(key for key in keys if key))
+        with self._cond:
+            for key in keys:
+                self._keys.setdefault(key, _KeyState())
+            for key in list(self._keys):
+                if key not in keys:
+                    del self._keys[key]
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _remaining(self, state: _KeyState) -> float:
+        if self.rpm is None:
+            return float("inf")
+        return self.rpm - len(state.recent)
+
+    def _pick(self, now: float) -> Optional[str]:
+        best = None
+        for key, state in self._keys.items():
+            state.prune(now)
+            if state.parked_until > now or self._remaining(state) <= 0:
+                continue
+            rank = (self._remaining(state), -len(state.recent), -state.last_used)
+            if best is None or rank > best[0]:
+                best = (rank, key)
+        return best[1] if best else None
+
+    def _next_change(self, now: float) -> float:
+        """Seconds until some key is unparked or frees budget."""
+        waits = []
+        for state in self._keys.values():
+            if state.parked_until > now:
+                waits.append(state.parked_until - now)
+            elif state.recent:
+                waits.append(WINDOW_SECONDS - (now - state.recent[0]))
+        return max(0.05, min(waits)) if waits else 1.0
+
+    def _wait_for_key(self, deadline: float) -> Optional[str]:
+        # Called with self._cond held
+        while True:
+            now = time.monotonic()
+            key = self._pick(now)
+            if key is not None or not self._keys or now >= deadline:
+                return key
+            self._cond.wait(min(self._next_change(now), deadline - now))
+
+    def wait_available(self, timeout: float = KEY_WAIT_SECONDS) -> bool:
+        """Wait up to timeout until some key could take a request, without reserving it."""
+        with self._cond:
+            return self._wait_for_key(time.monotonic() + timeout) is not None
+
+    def acquire(self, timeout: float = KEY_WAIT_SECONDS) -> Optional[str]:
+        """Reserve budget on the best key, waiting up to timeout; None if no key frees up."""
+        with self._cond:
+            key = self._wait_for_key(time.monotonic() + timeout)
+            if key is None:
+                return None
+            now = time.monotonic()
+            state = self._keys[key]
+            state.recent.append(now)
+            state.last_used = now
+            state.requests += 1
+            return key
+
+    def report(self, key: str, status_code: Optional[int], retry_after: Optional[float] = None) -> None:
+        """Record the outcome of a request made with key, parking it on 429/403."""
+        with self._cond:
+            state = self._keys.get(key)
+            if state is None or status_code == 200:
+                return
+            state.errors += 1
+            if status_code in PARK_SECONDS:
+                state.rate_limited += 1
+                state.parked_until = time.monotonic() + (retry_after or PARK_SECONDS[status_code])
+                print(f"Parking Gemini API key {_key_id(key)} after HTTP {status_code}")
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per-key usage, keyed by a masked key id."""
+        with self._cond:
+            now = time.monotonic()
+            stats = {}
+            for key, state in self._keys.items():
+                state.prune(now)
+                remaining = self._remaining(state)
+                stats[_key_id(key)] = {
+                    "requests": state.requests,
+                    "errors": state.errors,
+                    "rate_limited": state.rate_limited,
+                    "last_minute": len(state.recent),
+                    "remaining": None if remaining == float("inf") else remaining,
+                    "parked_for": round(max(0.0, state.parked_until - now), 1),
+                }
+            return stats
+
+
+def _configured_rpm() -> Optional[int]:
+    value = os.getenv(KEY_RPM_ENV)
+    return int(value) if value else None
+
+
+KEY_POOL = KeyPool(rpm=_configured_rpm())
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "streamlit_app.py")
+
+# Simulated users per step; the ramp stops at the first step where latency breaks
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+REQUESTS_PER_USER = 3
+# Latency "breaks" once p95 exceeds this multiple of the single-user p95 (or any request fails)
+BREAK_FACTOR = 2.0
+RUN_TIMEOUT_SECONDS = 120
+RESOURCE_SAMPLE_SECONDS = 0.25
+
+LOAD_TEST_IDEA = "Ad for a lightweight running shoe showing speed on a city track at dawn"
+DRIVERS = ("apptest", "workflow")
+
+# Every AppTest run compiles the script again, and CPython 3.11 can fail with "AST constructor
+# recursion depth mismatch" when threads compile at the same time, so compiles take turns
+_compile_lock = threading.Lock()
+
+
+def _prepare_concurrent_apptest() -> None:
+    """
+    Make AppTest safe to run from several threads at once. Each run switches
+    app-test mode on by patching the process-wide config getter and restores
+    it when done, which turned it off under sessions still running (their
+    widgets then failed with KeyError); the option is set for the whole test
+    instead, and script compiles are serialised.
+    """
+    from streamlit import config
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    config.set_option("global.appTest", True)
+    if getattr(ScriptCache.get_bytecode, "serialised", False):
+        return
+    get_bytecode = ScriptCache.get_bytecode
+
+    def serialised_get_bytecode(self, script_path: str) -> Any:
+        with _compile_lock:
+            return get_bytecode(self, script_path)
+
+    serialised_get_bytecode.serialised = True
+    ScriptCache.get_bytecode = serialised_get_bytecode
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ResourceMonitor:
+    """Samples this process's CPU use and RSS in the background while a step runs."""
+
+    def __init__(self, interval: float = RESOURCE_SAMPLE_SECONDS):
+        self.interval = interval
+        self.cpu_samples: list[float] = []
+        self.rss_samples: list[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+
+    def __enter__(self) -> "ResourceMonitor":
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.wall_seconds = time.perf_counter() - self._started_wall
+        self.cpu_seconds = time.process_time() - self._started_cpu
+
+    def _run(self) -> None:
+        last_wall, last_cpu = time.perf_counter(), time.process_time()
+        while not self._stop.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.cpu_samples.append((cpu - last_cpu) / max(wall - last_wall, 1e-9) * 100)
+            self.rss_samples.append(_rss_mb())
+            last_wall, last_cpu = wall, cpu
+
+    def summary(self) -> dict[str, float]:
+        cpu_avg = self.cpu_seconds / max(self.wall_seconds, 1e-9) * 100
+        return {
+            "cpu_avg_pct": round(cpu_avg, 1),
+            "cpu_peak_pct": round(max(self.cpu_samples, default=cpu_avg), 1),
+            "rss_peak_mb": round(max(self.rss_samples, default=_rss_mb()), 1),
+        }
+
+
+def _apptest_session() -> Callable[[str], bool]:
+    """
+    One simulated browser session: the real streamlit_app.py script run through
+    Streamlit's AppTest, so widget handling, auto-pick and rendering are included.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    _prepare_concurrent_apptest()
+    app = AppTest.from_file(APP_FILE, default_timeout=RUN_TIMEOUT_SECONDS)
+    app.run()
+
+    def generate(idea: str) -> bool:
+        app.text_area[0].input(idea).run()
+        # A changed idea offers edit mode; the load test measures the full generate flow
+        for checkbox in app.checkbox:
+            checkbox.uncheck()
+        button = next(button for button in app.button if button.label.startswith("📝"))
+        button.click().run()
+        return not app.exception and any("Storyboard generated" in str(message.value) for message in app.success)
+
+    return generate
+
+
+def _workflow_session() -> Callable[[str], bool]:
+    """Scripted client: the same inputs the app sends, straight into run_workflow (no Streamlit needed)."""
+    from main import run_workflow
+    from prompt_library import PROMPT_LIBRARY
+    from prompt_search import auto_select_prompt
+
+    def generate(idea: str) -> bool:
+        inspiration = PROMPT_LIBRARY[auto_select_prompt(idea)]
+        inputs = {
+            "ad_idea": idea,
+            "inspiration_prompt": inspiration["prompt"],
+            "inspiration_name": inspiration["name"],
+            "aspect_ratio": "16:9",
+            "model": "gemini-1.5-flash",
+            "priority": "interactive",
+        }
+        return asyncio.run(run_workflow(inputs)) is not None
+
+    return generate
+
+
+def _simulated_user(driver: str, user: int, requests_per_user: int) -> list[tuple[float, bool]]:
+    session = _apptest_session() if driver == "apptest" else _workflow_session()
+    results = []
+    for request in range(requests_per_user):
+        # Distinct ideas per request so identical calls are not coalesced into one
+        idea = f"{LOAD_TEST_IDEA} (user {user}, take {request})"
+        started = time.perf_counter()
+        try:
+            ok = session(idea)
+        except Exception as exc:
+            print(f"User {user} request {request} failed: {exc}")
+            ok = False
+        results.append(((time.perf_counter() - started) * 1000, ok))
+    return results
+
+
+def run_step(users: int, driver: str = "apptest", requests_per_user: int = REQUESTS_PER_USER) -> dict[str, Any]:
+    """
+    Run `users` concurrent sessions and summarise latency, errors, CPU and
+    memory. Sessions run in this process like they would in one Streamlit
+    server, so CPU and RSS are the app's (the stand-in runs separately).
+    """
+    with ResourceMonitor() as monitor:
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            per_user = list(pool.map(lambda user: _simulated_user(driver, user, requests_per_user), range(users)))
+
+    latencies = [latency for results in per_user for latency, _ in results]
+    errors = sum(1 for results in per_user for _, ok in results if not ok)
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / monitor.wall_seconds, 2),
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p95_ms": round(_percentile(latencies, 95), 1),
+        "max_ms": round(max(latencies, default=0.0), 1),
+        "per_user_mean_ms": [round(sum(lat for lat, _ in results) / len(results), 1) for results in per_user],
+        **monitor.summary(),
+    }
+
+
+def _start_standin_process(latency_ms: float, jitter_ms: float) -> tuple[subprocess.Popen, str]:
+    """Run gemini_standin.py in its own process so its CPU is not billed to the app."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(APP_DIR, "gemini_standin.py"), "--port", "0",
+         "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    if "GEMINI_API_BASE=" not in line:
+        process.kill()
+        raise RuntimeError(f"Gemini stand-in did not start: {line!r}")
+    return process, line.strip().split("GEMINI_API_BASE=", 1)[1]
+
+
+def load_test(
+    levels: list[int] = CONCURRENCY_LEVELS,
+    driver: str = "apptest",
+    requests_per_user: int = REQUESTS_PER_USER,
+    break_factor: float = BREAK_FACTOR,
+) -> dict[str, Any]:
+    """
+    Ramp through concurrency levels until latency breaks: p95 above
+    break_factor x the first level's p95, or any failed request. Returns the
+    per-step results and breaking_concurrency (None if no step broke).
+    GEMINI_API_BASE must already point at a stand-in.
+    """
+    if driver not in DRIVERS:
+        raise ValueError(f"Unknown driver '{driver}', expected one of {DRIVERS}")
+
+    steps: list[dict[str, Any]] = []
+    breaking = None
+    for users in levels:
+        step = run_step(users, driver, requests_per_user)
+        steps.append(step)
+        baseline = steps[0]["p95_ms"]
+        step["broken"] = bool(step["errors"]) or step["p95_ms"] > break_factor * baseline
+        print(
+            f"{users:>3} users: p50 {step['p50_ms']:.0f} ms, p95 {step['p95_ms']:.0f} ms, "
+            f"{step['throughput_rps']} req/s, errors {step['errors']}, "
+            f"CPU avg {step['cpu_avg_pct']}% (peak {step['cpu_peak_pct']}%), RSS peak {step['rss_peak_mb']} MB"
+            + ("  <-- latency breaks" if step["broken"] else "")
+        )
+        if step["broken"]:
+            breaking = users
+            break
+    return {"driver": driver, "break_factor": break_factor, "breaking_concurrency": breaking, "steps": steps}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the storyboard app against a local Gemini stand-in")
+    parser.add_argument("--users", default=",".join(map(str, CONCURRENCY_LEVELS)), help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=REQUESTS_PER_USER, help="generate clicks per simulated user")
+    parser.add_argument("--driver", choices=DRIVERS, default="apptest",
+                        help="apptest runs streamlit_app.py via AppTest; workflow calls run_workflow directly")
+    parser.add_argument("--break-factor", type=float, default=BREAK_FACTOR)
+    parser.add_argument("--gemini-base", help="use an already running stand-in instead of starting one")
+    parser.add_argument("--latency-ms", type=float, default=800, help="stand-in latency per Gemini call")
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--json", help="also write the full results to this file")
+    args = parser.parse_args(argv)
+
+    standin = None
+    if args.gemini_base:
+        api_base = args.gemini_base
+    else:
+        standin, api_base = _start_standin_process(args.latency_ms, args.jitter_ms)
+    # Set before the app modules are imported: utils reads GEMINI_API_BASE once
+    os.environ["GEMINI_API_BASE"] = api_base
+    os.environ.setdefault("GEMINI_API_KEY", "load-test")
+    print(f"Load testing via {args.driver} against {api_base}")
+
+    # Job logs and archives from the test go to a scratch directory
+    cwd = os.getcwd()
+    scratch = tempfile.TemporaryDirectory()
+    os.chdir(scratch.name)
+    try:
+        results = load_test([int(level) for level in args.users.split(",")], args.driver, args.requests, args.break_factor)
+    finally:
+        from archive import get_archive
+
+        # Flush buffered archive rows before leaving the scratch directory
+        archive = get_archive()
+        if archive is not None:
+            archive.flush()
+        os.chdir(cwd)
+        scratch.cleanup()
+        if standin is not None:
+            standin.terminate()
+            standin.wait()
+
+    from utils import scheduler_stats
+
+    results["scheduler"] = scheduler_stats()
+    print(f"Request scheduler stats: {results['scheduler']}")
+    if results["breaking_concurrency"] is None:
+        print("Latency held at every tested concurrency level")
+    else:
+        print(f"Latency breaks at {results['breaking_concurrency']} concurrent users")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Any, Optional
+
+import pandas as pd
+
+from job_log import JOB_LOG_ROTATE_MB_ENV
+
+
+# Writer processes and the jobs each one logs (one insert plus one update per job)
+STRESS_WRITERS = 8
+STRESS_JOBS_PER_WRITER = 25
+
+# Concurrent coroutine log writes for the event-loop lag check, and how often the loop is probed
+LAG_WRITES = 40
+LAG_TICK_SECONDS = 0.01
+
+
+def _writer(worker: int, jobs: int) -> None:
+    from utils import get_current_date, log_to_excel
+
+    for job in range(jobs):
+        entry = {
+            "task_id": f"w{worker}-{job}",
+            "status": "in_progress",
+            "created_at": get_current_date(),
+            "prompt": f"Stress test job {job} from writer {worker}",
+        }
+        row = log_to_excel(entry)
+        log_to_excel({**entry, "status": "completed", "gemini_output": "{}"}, row)
+
+
+def stress_test(writers: int = STRESS_WRITERS, jobs: int = STRESS_JOBS_PER_WRITER, rotate_mb: Optional[float] = None) -> dict[str, Any]:
+    """
+    Start `writers` processes that log and then update `jobs` rows each against
+    one job log in a scratch directory, then read every partition back and
+    count lost, duplicated and never-completed jobs (all should be 0).
+    rotate_mb forces partition rotation while the writers are running.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        previous_rotate_mb = os.environ.get(JOB_LOG_ROTATE_MB_ENV)
+        if rotate_mb is not None:
+            os.environ[JOB_LOG_ROTATE_MB_ENV] = str(rotate_mb)
+        try:
+            started = time.perf_counter()
+            processes = [multiprocessing.Process(target=_writer, args=(worker, jobs)) for worker in range(writers)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            seconds = time.perf_counter() - started
+
+            from utils import JOB_LOG
+
+            partitions = JOB_LOG.partitions()
+            frames = [pd.read_excel(partition["path"]) for partition in partitions]
+        finally:
+            os.chdir(cwd)
+            if previous_rotate_mb is None:
+                os.environ.pop(JOB_LOG_ROTATE_MB_ENV, None)
+            else:
+                os.environ[JOB_LOG_ROTATE_MB_ENV] = previous_rotate_mb
+
+    history = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["task_id", "status"])
+    expected = {f"w{worker}-{job}" for worker in range(writers) for job in range(jobs)}
+    logged = set(history["task_id"])
+    final = history.drop_duplicates("task_id", keep="last")
+    return {
+        "writers": writers,
+        "jobs": len(expected),
+        "rows": len(history),
+        "lost": len(expected - logged),
+        "duplicates": len(history) - history["task_id"].nunique(),
+        "incomplete": int((final["status"] != "completed").sum()),
+        "partitions": len(partitions),
+        "failed_writers": sum(1 for process in processes if process.exitcode != 0),
+        "writes_per_second": round(2 * len(expected) / seconds, 1),
+    }
+
+
+async def _loop_lag(writes: int, offload: bool) -> dict[str, Any]:
+    from utils import get_current_date, log_to_excel, log_to_excel_async
+
+    loop = asyncio.get_running_loop()
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            expected = loop.time() + LAG_TICK_SECONDS
+            await asyncio.sleep(LAG_TICK_SECONDS)
+            lags.append(max(0.0, loop.time() - expected) * 1000)
+
+    async def write(job: int) -> None:
+        entry = {"task_id": f"lag-{job}", "status": "completed", "created_at": get_current_date(), "prompt": f"Loop lag job {job}"}
+        if offload:
+            await log_to_excel_async(entry)
+        else:
+            # What run_workflow did before: the workbook round-trip on the event loop
+            log_to_excel(entry)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(LAG_TICK_SECONDS * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(write(job) for job in range(writes)))
+    seconds = time.perf_counter() - started
+    done.set()
+    await tick
+
+    lags.sort()
+    return {
+        "mode": "to_thread" if offload else "inline",
+        "writes": writes,
+        "lag_p50_ms": round(lags[len(lags) // 2], 1),
+        "lag_p95_ms": round(lags[min(len(lags) - 1, int(0.95 * len(lags)))], 1),
+        "lag_max_ms": round(lags[-1], 1),
+        "seconds": round(seconds, 2),
+    }
+
+
+def loop_lag_check(writes: int = LAG_WRITES) -> list[dict[str, Any]]:
+    """
+    Start `writes` concurrent log writes from coroutines against a scratch job
+    log, once inline and once through log_to_excel_async, while a ticker
+    coroutine measures how late the event loop wakes it. With to_thread the
+    lag should stay near zero; inline, every write stalls the loop.
+    """
+    cwd = os.getcwd()
+    results = []
+    for offload in (False, True):
+        with tempfile.TemporaryDirectory() as scratch:
+            os.chdir(scratch)
+            try:
+                results.append(asyncio.run(_loop_lag(writes, offload)))
+            finally:
+                os.chdir(cwd)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Multi-process job log stress test")
+    parser.add_argument("--writers", type=int, default=STRESS_WRITERS)
+    parser.add_argument("--jobs", type=int, default=STRESS_JOBS_PER_WRITER, help="jobs logged per writer")
+    parser.add_argument("--rotate-mb", type=float, help="small values force rotation during the run")
+    parser.add_argument("--loop-lag", type=int, metavar="WRITES", help="measure event-loop lag during concurrent async log writes instead")
+    args = parser.parse_args(argv)
+
+    if args.loop_lag:
+        for result in loop_lag_check(args.loop_lag):
+            print(result)
+        return
+
+    result = stress_test(args.writers, args.jobs, args.rotate_mb)
+    print(result)
+    if result["lost"] or result["duplicates"] or result["incomplete"] or result["failed_writers"]:
+        raise SystemExit("Job log lost or corrupted rows under concurrent writers")
+
+
+if __name__ == "__main__":
+    main()
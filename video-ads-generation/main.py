@@ -1,10 +1,25 @@
-import os
+import argparse
+import time
+import uuid
 import asyncio
 from dotenv import load_dotenv
 from typing import Annotated, TypedDict
-from video_gen import start_video_generation
-from utils import log_to_excel, ainvoke_llm, get_current_date
+from video_gen import edit_video_generation, start_video_generation
+from utils import (
+    log_to_excel_async, ainvoke_llm, get_current_date, generation_log_fields,
+    last_call_info, parse_failure_stats, router_stats, coalescing_stats, key_pool_stats,
+    scheduler_stats, token_estimate_stats, cassette_stats, job_log_stats, get_api_key
+)
 from prompt_library import PROMPT_LIBRARY
+from archive import archive_generation
+from storyboard import repair_stats
+from request_scheduler import DEFAULT_PRIORITY, set_request_priority
+from tracing import span, trace_run
+from prompt_search import auto_select_prompt
+
+
+# Model used to adapt the inspiration prompt to the user's idea
+PROMPT_MODEL = "gemini-1.5-pro"
 
 
 # Models for structured outputs
@@ -39,7 +54,7 @@ Edit a structured prompt object (JSON) based on the provided user creative idea.
     
     # Use the AI invocation function
     result = await ainvoke_llm(
-        model="gemini-1.5-pro",
+        model=PROMPT_MODEL,
         system_prompt=system_prompt,
         user_message=user_message,
         temperature=0.3,
@@ -49,40 +64,70 @@ Edit a structured prompt object (JSON) based on the provided user creative idea.
 
 
 async def run_workflow(inputs):
+    # Opt-in profiling: set PIPELINE_TRACE_DIR to get a span trace of this run
+    with trace_run("run_workflow", aspect_ratio=inputs['aspect_ratio']) as run_attrs:
+        result = await _run_workflow(inputs)
+        run_attrs['status'] = "completed" if result else "failed"
+        return result
+
+
+async def _run_workflow(inputs):
+    # Interactive (Streamlit) runs are scheduled ahead of batch/backfill work
+    set_request_priority(inputs.get('priority', DEFAULT_PRIORITY))
     try:
         # Create a log entry for excel
+        job_id = uuid.uuid4().hex
         log_entry = {
+            'task_id': job_id,
             'title': "",
             'prompt': "",
             'status': "in_progress",
             'created_at': get_current_date(),
             'video_url': "",
             'gemini_output': "",
-            'error': ""
+            'error': "",
+            'aspect_ratio': inputs['aspect_ratio']
         }
     
         # Generate V3 prompt
-        video_details = await generate_veo3_video_prompt(inputs['ad_idea'], inputs['inspiration_prompt'])
+        started = time.perf_counter()
+        with span("stage.prompt"):
+            video_details = await generate_veo3_video_prompt(inputs['ad_idea'], inputs['inspiration_prompt'])
+        # The router may have served the prompt stage from a fallback model
+        log_entry['prompt_model'] = last_call_info().get('model', PROMPT_MODEL)
+        log_entry['prompt_latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
         log_entry['title'] = video_details['title']
         log_entry['prompt'] = video_details['prompt']
         
         # Log the initial entry and get the row index
-        row_index = log_to_excel(log_entry)
-        print(f"Log entry created with index: {row_index}")
+        row_index = await log_to_excel_async(log_entry)
+        print(f"Log entry created: {row_index.partition} row {row_index.index}")
         
         # Submit to Gemini LLM
-        generation_result = start_video_generation(
-            video_details['prompt'],
-            inputs['aspect_ratio'],
-            inputs['model']
-        )
+        # Output budgets adapt per inspiration template (its PROMPT_LIBRARY entry name)
+        budget_key = inputs.get('inspiration_name')
+        started = time.perf_counter()
+        with span("stage.storyboard", budget_key=budget_key):
+            generation_result = await asyncio.to_thread(
+                start_video_generation,
+                video_details['prompt'],
+                inputs['aspect_ratio'],
+                inputs['model'],
+                budget_key=budget_key
+            )
+        latency_ms = (time.perf_counter() - started) * 1000
+        log_entry.update(generation_log_fields(generation_result, latency_ms))
+
+        # Keep the full raw response and storyboard in the columnar archive
+        with span("archive.write"):
+            await asyncio.to_thread(archive_generation, job_id, log_entry, generation_result, latency_ms)
 
         if generation_result.get("status") != "completed":
             log_entry['status'] = "failed"
             log_entry['error'] = generation_result.get("error", "Unknown error")
             log_entry['gemini_output'] = ""
             # Update the existing row with error information
-            log_to_excel(log_entry, row_index)
+            await log_to_excel_async(log_entry, row_index)
             return None
 
         response_text = generation_result.get("response", {}).get("text", "")
@@ -91,9 +136,10 @@ async def run_workflow(inputs):
         print(f"Gemini output generated (truncated): {response_text[:120]}...")
 
         # Update the Excel log with final results
-        log_to_excel(log_entry, row_index)
+        await log_to_excel_async(log_entry, row_index)
 
         return {
+            "ad_idea": inputs['ad_idea'],
             "title": log_entry['title'],
             "prompt": log_entry['prompt'],
             "gemini_output": response_text
@@ -101,32 +147,110 @@ async def run_workflow(inputs):
     except Exception as e:
         print(f"Error in workflow: {str(e)}")
         return None
+
+
+async def run_edit_workflow(inputs, previous):
+    """
+    Edit mode: update the storyboard from a previous run_workflow result for a
+    tweaked ad idea. The prompt stage is skipped and only the shots affected
+    by the edit are regenerated, so an iteration costs one small Gemini call.
+    """
+    set_request_priority(inputs.get('priority', DEFAULT_PRIORITY))
+    try:
+        job_id = uuid.uuid4().hex
+        log_entry = {
+            'task_id': job_id,
+            'title': previous['title'],
+            'prompt': previous['prompt'],
+            'status': "in_progress",
+            'created_at': get_current_date(),
+            'video_url': "",
+            'gemini_output': "",
+            'error': "",
+            'aspect_ratio': inputs.get('aspect_ratio', "")
+        }
+        row_index = await log_to_excel_async(log_entry)
+
+        budget_key = inputs.get('inspiration_name')
+        started = time.perf_counter()
+        generation_result = await asyncio.to_thread(
+            edit_video_generation,
+            previous['gemini_output'],
+            previous['ad_idea'],
+            inputs['ad_idea'],
+            inputs.get('model'),
+            budget_key=budget_key
+        )
+        latency_ms = (time.perf_counter() - started) * 1000
+        log_entry.update(generation_log_fields(generation_result, latency_ms))
+        await asyncio.to_thread(archive_generation, job_id, log_entry, generation_result, latency_ms)
+
+        if generation_result.get("status") != "completed":
+            log_entry['status'] = "failed"
+            log_entry['error'] = generation_result.get("error", "Unknown error")
+            await log_to_excel_async(log_entry, row_index)
+            return None
+
+        response = generation_result.get("response", {})
+        log_entry['status'] = "completed"
+        log_entry['gemini_output'] = response.get("text", "")
+        print(f"Storyboard edited in {latency_ms:.0f} ms, changed shots: {response.get('changed_shots')}")
+        await log_to_excel_async(log_entry, row_index)
+
+        return {
+            "ad_idea": inputs['ad_idea'],
+            "title": previous['title'],
+            "prompt": previous['prompt'],
+            "gemini_output": log_entry['gemini_output'],
+            "changed_shots": response.get("changed_shots", [])
+        }
+    except Exception as e:
+        print(f"Error in edit workflow: {str(e)}")
+        return None
     
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate one ad storyboard")
+    parser.add_argument("--idea", default="I want an ad for the launch of the new Mercedes Formula 1 car")
+    parser.add_argument(
+        "--prompt-id", type=int, choices=range(len(PROMPT_LIBRARY)), metavar=f"0-{len(PROMPT_LIBRARY) - 1}",
+        help="prompt library entry to use as inspiration (default: auto-pick the best match for the idea)",
+    )
+    args = parser.parse_args()
+
     # Load environment variables from .env file
     load_dotenv()
     
-    # Check if Gemini API key environment variable is set
-    if not (
-        os.environ.get("GEMINI_API_KEY")
-        or os.environ.get("KIE_API_TOKEN")
-        or os.environ.get("KIE_API_KEY")
-    ):
+    # Check if Gemini API key environment variable is set (not needed when replaying a cassette)
+    if not get_api_key():
         print("Warning: GEMINI_API_KEY (or legacy KIE_API_TOKEN) environment variable not set")
         raise ValueError("GEMINI_API_KEY environment variable not set")
     
-    ad_idea = "I want an ad for the launch of the new Mercedes Formula 1 car"  # Example idea
+    ad_idea = args.idea
     
-    # Get a prompt from the prompts library list 
-    prompt_id = -1 # Tesla showdown prompt
+    # Get a prompt from the prompts library list, or auto-pick the best match when none is given
+    prompt_id = args.prompt_id
+    if prompt_id is None:
+        prompt_id = auto_select_prompt(ad_idea)
+        print(f"Auto-picked prompt inspiration: {PROMPT_LIBRARY[prompt_id]['name']}")
     inspiration_prompt = PROMPT_LIBRARY[prompt_id]['prompt']
+    inspiration_name = PROMPT_LIBRARY[prompt_id]['name']
     
     # Run main function
     inputs = {
         "ad_idea": ad_idea,
         "inspiration_prompt": inspiration_prompt,
+        "inspiration_name": inspiration_name,
         "aspect_ratio": "16:9", # or "9:16",
         "model": "gemini-1.5-flash" # Or choose "gemini-1.5-pro" for more detailed plans
     }
     asyncio.run(run_workflow(inputs))
+    print(f"Structured output parse stats: {parse_failure_stats()}")
+    print(f"Model router stats: {router_stats()}")
+    print(f"Request coalescing stats: {coalescing_stats()}")
+    print(f"API key pool stats: {key_pool_stats()}")
+    print(f"Request scheduler stats: {scheduler_stats()}")
+    print(f"Input token estimates: {token_estimate_stats()}")
+    print(f"Storyboard shot repair stats: {repair_stats()}")
+    print(f"Gemini cassette stats: {cassette_stats()}")
+    print(f"Job log partitions: {job_log_stats()}")
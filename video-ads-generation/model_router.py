@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+
+# Fallback order when a model's breaker is open or a call to it fails
+MODEL_FALLBACKS = {
+    "gemini-1.5-pro": ["gemini-1.5-flash"],
+    "gemini-1.5-flash": [],
+}
+
+# Rolling window of recent calls used to judge a model's health
+ROUTER_WINDOW = 20
+BREAKER_MIN_CALLS = 4
+BREAKER_ERROR_RATE = 0.5
+# Calls slower than this count against the model, so a degraded model trips the breaker too
+BREAKER_SLOW_CALL_MS = 20000
+# How long an open breaker waits before letting a single probe call through
+BREAKER_COOLDOWN_SECONDS = 30
+
+
+class CircuitOpenError(ValueError):
+    """Raised when every candidate model's breaker is open and the call is shed."""
+
+
+class ModelHealth:
+    """Rolling latency/error window and breaker state for one model."""
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.calls: deque = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(1 for _, ok in self.calls if not ok) / len(self.calls)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = sorted(latency for latency, _ in self.calls)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+
+class ModelRouter:
+    """
+    Latency-aware router with a circuit breaker per model.
+    A model whose recent calls mostly fail (or are slower than BREAKER_SLOW_CALL_MS)
+    is skipped in favour of its fallbacks until a probe call succeeds again.
+    """
+
+    def __init__(self, fallbacks: Optional[dict[str, list[str]]] = None):
+        self.fallbacks = MODEL_FALLBACKS if fallbacks is None else fallbacks
+        self._health: dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> ModelHealth:
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = ModelHealth()
+        return health
+
+    def _acquire(self, model: str) -> bool:
+        """Return True if a call to model may go ahead now."""
+        with self._lock:
+            health = self._get(model)
+            if health.state == "closed":
+                return True
+            if health.state == "open" and time.monotonic() - health.opened_at >= BREAKER_COOLDOWN_SECONDS:
+                health.state = "half_open"
+            if health.state == "half_open" and not health.probe_in_flight:
+                health.probe_in_flight = True
+                return True
+            return False
+
+    def record(self, model: str, latency_ms: float, ok: bool) -> None:
+        """Record the outcome of a call and update the model's breaker."""
+        healthy = ok and latency_ms <= BREAKER_SLOW_CALL_MS
+        with self._lock:
+            health = self._get(model)
+            health.calls.append((latency_ms, healthy))
+
+            if health.state == "half_open":
+                health.probe_in_flight = False
+                if healthy:
+                    health.state = "closed"
+                    health.calls.clear()
+                else:
+                    health.state = "open"
+                    health.opened_at = time.monotonic()
+            elif (
+                health.state == "closed"
+                and len(health.calls) >= BREAKER_MIN_CALLS
+                and health.error_rate() >= BREAKER_ERROR_RATE
+            ):
+                print(f"Circuit breaker opened for {model}")
+                health.state = "open"
+                health.opened_at = time.monotonic()
+
+    def candidates(self, model: str) -> list[str]:
+        return [model] + [fallback for fallback in self.fallbacks.get(model, []) if fallback != model]
+
+    def call(self, model: str, func: Callable[[str], dict[str, Any]]) -> dict[str, Any]:
+        """
+        Run func(target_model) against the first healthy candidate, falling back on
+        retryable failures. The returned dict gains a "model" key naming the model used.
+        """
+        last_error: Optional[Exception] = None
+        for target in self.candidates(model):
+            if not self._acquire(target):
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = func(target)
+            except ValueError as exc:
+                latency_ms = (time.perf_counter() - started) * 1000
+                if not getattr(exc, "retryable", True):
+                    # The request itself is bad; another model won't help
+                    self.record(target, latency_ms, True)
+                    raise
+                self.record(target, latency_ms, False)
+                last_error = exc
+                continue
+            except Exception:
+                self.record(target, (time.perf_counter() - started) * 1000, False)
+                raise
+
+            self.record(target, (time.perf_counter() - started) * 1000, True)
+            if target != model:
+                print(f"Routed {model} request to fallback model {target}")
+            return {**result, "model": target}
+
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError(f"All models are unavailable for {model}; request shed")
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Breaker state, error rate and latency percentiles per model."""
+        with self._lock:
+            return {
+                model: {
+                    "state": health.state,
+                    "calls": len(health.calls),
+                    "error_rate": round(health.error_rate(), 3),
+                    "p50_ms": health.latency_percentile(0.5),
+                    "p95_ms": health.latency_percentile(0.95),
+                }
+                for model, health in self._health.items()
+            }
+
+
+MODEL_ROUTER = ModelRouter()
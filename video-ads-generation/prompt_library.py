@@ -1,76 +1,107 @@
-from prompts import *
-
-PROMPT_LIBRARY = [
-    {
-        "name": "Amazon Gamer Room",
-        "description": "An Amazon box sits in an empty Scandinavian room and self-assembles an entire gaming setup through a hyperlapse",
-        "source": "https://x.com/caiotti_/status/1947360432085213634",
-        "prompt": amazon_gamer_room
-    },
-    {
-        "name": "Chewy Pet Supplies",
-        "description": "A Chewy box bursts open in a sunny kitchen, assembling pet supplies. A dog runs in and flops into the bed.",
-        "source": "https://x.com/venturetwins/status/1946582970380501122",
-        "prompt": chewy_pet_supplies
-    },
-    {
-        "name": "IKEA Prompt",
-        "description": "Classic IKEA box in a Scandinavian bedroom auto-assembles furniture into a calm, styled room.",
-        "source": "https://x.com/Salmaaboukarr/status/1946530151434428639",
-        "prompt": ikea_prompt
-    },
-    {
-        "name": "Jeep Basecamp",
-        "description": "In a desert canyon, a mechanical crate unfolds to reveal a rugged Jeep Rubicon surrounded by a fully assembled basecamp.",
-        "source": "https://x.com/guicastellanos1/status/1947723734338703618",
-        "prompt": jeep_basecamp
-    },
-    {
-        "name": "Lego Porsche",
-        "description": "A LEGO Porsche box trembles and explodes into hundreds of bricks that rapidly self-assemble into a detailed Porsche model on a sunset-lit kitchen island.",
-        "source": "https://x.com/heyrobinai/status/1947541977681002962",
-        "prompt": lego_porsche
-    },
-    {
-        "name": "Louis Vuitton Handbag Reveal",
-        "description": "A golden LV monogram disassembles into threads and weaves itself into a luxurious handbag on a velvet surface.",
-        "source": "https://x.com/ananasops/status/1948105568352161792",
-        "prompt": handbag_reveal
-    },
-    {
-        "name": "Nike Ad",
-        "description": "In a misty urban court, a Nike shoebox levitates and explodes into self-assembling Air Jordans, which land onto a character’s feet mid-lip sync.",
-        "source": "https://x.com/DomainDomme/status/1947007723024928771",
-        "prompt": nike_ad
-    },
-    {
-        "name": "NYC Skyline",
-        "description": "A sealed NYC container opens in a misty plaza and the New York skyline rapidly assembles out of it, complete with taxis, bridges, and skyscrapers.",
-        "source": "https://x.com/SearchPromptly/status/1947265849082941449",
-        "prompt": nyc_skyline
-    },
-    {
-        "name": "Rimowa Suitcase",
-        "description": "A transparent suitcase spins and fills with yellow mist, transforming into a hard-shell Rimowa in a white cyclorama studio.",
-        "source": "https://x.com/Salmaaboukarr/status/1946929763030839573",
-        "prompt": rimowa_suitcase
-    },
-    {
-        "name": "Stridex Sneaker Boutique",
-        "description": "In a neon-lit retail store, a StrideX shoebox explodes open, revealing self-lacing sneakers that sprint on a light treadmill before freezing in a hero pose.",
-        "source": "https://x.com/HBCoop_/status/1947362306750300362",
-        "prompt": stridex_sneaker_boutique
-    },
-    {
-        "name": "Tennis Spin",
-        "description": "A hyper-real macro tennis ball opens up and reveals a player.",
-        "source": "https://x.com/Salmaaboukarr/status/1947718753417888206",
-        "prompt": tennis_spin
-    },
-    {
-        "name": "Tesla Showroom",
-        "description": "Cinematic shot of a minimalist Tesla-branded crate magically opening to reveal a fully formed Tesla vehicle and an instantly assembled, sleek Tesla-themed showroom around it. No text.",
-        "source": "https://x.com/AzianMike/status/1947055581778563570",
-        "prompt": tesla_showroom
-    }
-]
\ No newline at end of file
+import json
+import os
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional
+
+
+# Each template body lives in its own JSON file; the manifest holds the metadata
+PROMPT_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_templates")
+MANIFEST_FILE = os.path.join(PROMPT_TEMPLATES_DIR, "manifest.json")
+
+_ENTRY_KEYS = ("name", "description", "source", "prompt")
+
+
+class PromptEntry(Mapping):
+    """
+    Prompt library entry. Metadata is loaded with the manifest while the
+    template body is only read from disk the first time 'prompt' is accessed.
+    """
+
+    def __init__(self, metadata: dict[str, Any], templates_dir: str = PROMPT_TEMPLATES_DIR):
+        self._metadata = metadata
+        self._path = os.path.join(templates_dir, metadata["file"])
+        self._prompt: Optional[Any] = None
+
+    @property
+    def prompt(self) -> Any:
+        if self._prompt is None:
+            with open(self._path, "r", encoding="utf-8") as handle:
+                self._prompt = json.load(handle)
+        return self._prompt
+
+    @property
+    def loaded(self) -> bool:
+        return self._prompt is not None
+
+    @property
+    def file(self) -> str:
+        return self._metadata["file"]
+
+    @property
+    def terms(self) -> Optional[dict[str, int]]:
+        """Precomputed template term counts used by the prompt search index."""
+        return self._metadata.get("terms")
+
+    @property
+    def estimated_tokens(self) -> Optional[int]:
+        """Offline (uncalibrated) input token estimate of the template body."""
+        return self._metadata.get("estimated_tokens")
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "prompt":
+            return self.prompt
+        if key not in _ENTRY_KEYS:
+            raise KeyError(key)
+        return self._metadata[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_ENTRY_KEYS)
+
+    def __len__(self) -> int:
+        return len(_ENTRY_KEYS)
+
+    def __repr__(self) -> str:
+        return f"PromptEntry(name={self._metadata['name']!r}, file={self.file!r})"
+
+
+def load_prompt_library(manifest_file: str = MANIFEST_FILE) -> list[PromptEntry]:
+    """Read the manifest and return lazily-loaded library entries."""
+    with open(manifest_file, "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    templates_dir = os.path.dirname(manifest_file)
+    return [PromptEntry(metadata, templates_dir) for metadata in manifest]
+
+
+def build_manifest(manifest_file: str = MANIFEST_FILE) -> None:
+    """
+    Refresh the precomputed search terms and token estimates in the manifest from the template files.
+    Run this after adding or editing a template: `python prompt_library.py`
+    """
+    from prompt_search import _flatten_text, tokenize
+    from token_estimator import estimate_text_tokens
+
+    with open(manifest_file, "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+
+    templates_dir = os.path.dirname(manifest_file)
+    for metadata in manifest:
+        with open(os.path.join(templates_dir, metadata["file"]), "r", encoding="utf-8") as handle:
+            template = json.load(handle)
+        metadata["terms"] = dict(Counter(tokenize(_flatten_text(template))).most_common())
+        # Templates are sent as their Python repr inside the prompt-stage message
+        metadata["estimated_tokens"] = estimate_text_tokens(str(template))
+
+    with open(manifest_file, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, ensure_ascii=False)
+        handle.write("\n")
+
+
+PROMPT_LIBRARY = load_prompt_library()
+
+
+if __name__ == "__main__":
+    build_manifest()
+    print(f"Manifest refreshed for {len(PROMPT_LIBRARY)} prompt templates")
+    for entry in load_prompt_library():
+        print(f"  ~{entry.estimated_tokens:>5} input tokens  {entry['name']}")
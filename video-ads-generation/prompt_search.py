@@ -0,0 +1,123 @@
+import math
+import re
+from collections import Counter
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Optional
+
+from prompt_library import PROMPT_LIBRARY
+
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Field weights: a hit in the template name counts more than one buried in the timeline
+FIELD_WEIGHTS = {
+    "name": 3,
+    "description": 2,
+    "prompt": 1,
+}
+
+AUTO_PICK_OPTION = "✨ Auto-pick best match for my idea"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "i", "in", "into",
+    "is", "it", "its", "me", "my", "no", "of", "on", "or", "our", "s", "that", "the",
+    "their", "this", "to", "want", "we", "with",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _flatten_text(value: Any) -> str:
+    """Collect every string inside a (possibly nested) template structure."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(_flatten_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_flatten_text(item) for item in value)
+    return ""
+
+
+def _template_terms(template: Mapping[str, Any]) -> Counter:
+    """
+    Weighted term frequencies for one library entry. Template body terms come
+    precomputed from the manifest so building the index never loads the bodies.
+    """
+    terms: Counter = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        if field == "prompt" and getattr(template, "terms", None) is not None:
+            field_terms = Counter(template.terms)
+        else:
+            field_terms = Counter(tokenize(_flatten_text(template.get(field, ""))))
+        for token, count in field_terms.items():
+            terms[token] += weight * count
+    return terms
+
+
+class PromptIndex:
+    """
+    Inverted BM25 index over the prompt library.
+    Per-term scores are precomputed at build time, so ranking a query is
+    a handful of dictionary lookups and additions.
+    """
+
+    def __init__(self, library: list[Mapping[str, Any]]):
+        self.size = len(library)
+        documents = [_template_terms(template) for template in library]
+        lengths = [sum(terms.values()) for terms in documents]
+        average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+        document_frequency: Counter = Counter()
+        for terms in documents:
+            document_frequency.update(terms.keys())
+
+        self.postings: dict[str, list[tuple[int, float]]] = {}
+        for doc_id, terms in enumerate(documents):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / (average_length or 1.0))
+            for term, frequency in terms.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                self.postings.setdefault(term, []).append((doc_id, score))
+
+    def rank(self, query: str, top_k: Optional[int] = 5) -> list[tuple[int, float]]:
+        """Return (library index, score) pairs, best match first."""
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            for doc_id, score in self.postings.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if top_k is None else ranked[:top_k]
+
+
+PROMPT_INDEX = PromptIndex(PROMPT_LIBRARY)
+
+
+def rank_prompts(ad_idea: str, top_k: Optional[int] = 5) -> list[tuple[int, float]]:
+    """Rank prompt library templates for an ad idea."""
+    return PROMPT_INDEX.rank(ad_idea, top_k)
+
+
+def auto_select_prompt(ad_idea: str, default: int = -1) -> int:
+    """Return the library index of the best template for an ad idea."""
+    ranked = PROMPT_INDEX.rank(ad_idea, top_k=1)
+    if not ranked:
+        return default % len(PROMPT_LIBRARY)
+    return ranked[0][0]
+
+
+@lru_cache(maxsize=1)
+def prompt_display_options() -> tuple[list[str], dict[str, int]]:
+    """Selectbox labels for the library and a label -> index lookup, built once per process."""
+    labels = []
+    for prompt in PROMPT_LIBRARY:
+        description = prompt['description']
+        labels.append(f"{prompt['name']} - {description[:100]}{'...' if len(description) > 100 else ''}")
+    return labels, {label: index for index, label in enumerate(labels)}
@@ -1,382 +0,0 @@
-
-# Amazon Gamer Room - Cinematic hyperlapse of Amazon box self-assembling gaming setup in empty Scandinavian room
-# Description: An Amazon box sits in an empty Scandinavian room and self-assembles an entire gaming setup through a hyperlapse.
-# Source: X — https://x.com/caiotti_/status/1947360432085213634
-amazon_gamer_room = {
-  "name": "Amazon Empty Room Assembly",
-  "description": "Cinematic hyperlapse of Amazon box self-assembling gaming setup in empty Scandinavian room",
-  "base_style": "cinematic, photorealistic, 4K",
-  "aspect_ratio": "16:9",
-  "room_description": "An empty, large, sunlit Scandinavian room with white walls and light wood floors.",
-  "camera_setup": "A single, fixed, wide-angle shot. The camera does not move for the entire 8-second duration.",
-  "key_elements": [
-    "A sealed Amazon box with logo visible"
-  ],
-  "assembled_elements": [
-    "bed with dark blue duvet",
-    "blue throw blanket",
-    "metal table",
-    "neon lamps",
-    "wardrobe",
-    "shelves",
-    "gamer PC",
-    "Gamer monitor and keyboard",
-    "rug",
-    "curtains",
-    "gamer headsets"
-  ],
-  "negative_prompts": ["no people", "no text overlays", "no distracting music"],
-  "timeline": [
-    {
-      "sequence": 1,
-      "timestamp": "00:00-00:01",
-      "action": "In the center of the otherwise empty room, a sealed Amazon box sits on the floor and begins to tremble gently.",
-      "audio": "Low, subtle rumbling sound. The echo of a large, empty room."
-    },
-    {
-      "sequence": 2,
-      "timestamp": "00:01-00:02",
-      "action": "The box seams burst open with a puff of cardboard dust.",
-      "audio": "A sharp 'POP' sound, followed by tearing cardboard."
-    },
-    {
-      "sequence": 3,
-      "timestamp": "00:02-00:06",
-      "action": "Hyper-lapse: From the fixed wide perspective, furniture pieces fly out of the box and assemble themselves, creating all the items from the 'assembled_elements' list.",
-      "audio": "A cascade of satisfying, fast-paced ASMR sounds: whirring, clicking, wood snapping into place."
-    },
-    {
-      "sequence": 4,
-      "timestamp": "00:06-00:08",
-      "action": "The final piece—the blue throw blanket—gracefully lands on the newly formed bed. The room is now perfectly furnished and serene. All motion ceases.",
-      "audio": "All chaotic sounds stop. A single, soft 'fwoomp' as the blanket lands. The sound of a furnished, quiet room."
-    }
-  ]
-}
-
-# Chewy Pet Supplies - Chewy box bursts open assembling pet supplies with golden retriever
-# Description: A Chewy box bursts open in a sunny kitchen, assembling pet supplies. A dog runs in and flops into the bed.
-# Source: X — https://x.com/venturetwins/status/1946582970380501122
-chewy_pet_supplies = {
-  "name": "Chewy Pet Supplies Assembly",
-  "description": "Cinematic shot of a sunlit, empty kitchen. A sealed Chewy box sits in the center. It trembles, explodes open in one burst, and pet supplies rapidly assemble into place: food and water bowls, a dog bed, toys, and a bag of food. A dog runs in and flops into the bed. No text.",
-  "style": "cinematic",
-  "camera": "fixed wide angle",
-  "lighting": "natural warm with soft shadows",
-  "room": "modern kitchen with hardwood floors",
-  "elements": [
-    "Chewy box (logo visible)",
-    "dog food and water bowls",
-    "dog bed",
-    "dog toys (rope, ball, bone)",
-    "bag of dog food",
-    "wall hook with leash",
-    "dog (golden retriever)"
-  ],
-  "motion": "box explodes open, dog items fly out and assemble rapidly and precisely",
-  "ending": "dog enters and settles happily into the bed",
-  "text": "none",
-  "keywords": [
-    "16:9",
-    "Chewy",
-    "pet supplies",
-    "fast assembly",
-    "dog",
-    "no text",
-    "warm lighting"
-  ]
-}
-
-# IKEA Prompt
-# Description: Classic IKEA box in a Scandinavian bedroom auto-assembles furniture into a calm, styled room.
-# Source: X — https://x.com/Salmaaboukarr/status/1946530151434428639
-ikea_prompt = {
-  "description": "Cinematic shot of a sunlit Scandinavian bedroom. A sealed IKEA box trembles, opens, and flat pack furniture assembles rapidly into a serene, styled room highlighted by a yellow IKEA throw on the bed. No text.",
-  "style": "cinematic",
-  "camera": "fixed wide angle",
-  "lighting": "natural warm with cool accents",
-  "room": "Scandinavian bedroom",
-  "elements": [
-    "IKEA box (logo visible)",
-    "bed with yellow throw",
-    "bedside tables",
-    "lamps",
-    "wardrobe",
-    "shelves",
-    "mirror",
-    "art",
-    "rug",
-    "curtains",
-    "reading chair",
-    "plants"
-  ],
-  "motion": "box opens, furniture assembles precisely and rapidly",
-  "ending": "calm, modern space with yellow IKEA accent",
-  "text": "none",
-  "keywords": [
-    "16:9",
-    "IKEA",
-    "Scandinavian",
-    "fast assembly",
-    "no text",
-    "warm & cool tones"
-  ]
-}
-
-# Jeep Basecamp
-# Description: In a desert canyon, a mechanical crate unfolds to reveal a rugged Jeep Rubicon surrounded by a fully assembled basecamp.
-# Source: X — https://x.com/guicastellanos1/status/1947723734338703618
-jeep_basecamp = {
-  "description": "Epic cinematic shot in a wild, remote landscape. A rugged, mechanical expedition crate splits open, its panels unfolding to reveal a fully-equipped Jeep Wrangler Rubicon at the center of an adventure-ready basecamp at sunset.",
-  "style": "cinematic, gritty, realistic, epic",
-  "camera": "medium wide shot, steady, with a slow push-in as the vehicle is revealed",
-  "lighting": "dramatic golden hour, long shadows, lens flare, warm functional light from the camp gear",
-  "location": "Moab desert canyon at sunset",
-  "elements": [
-    "Jeep Wrangler Rubicon (dirty, mud-splattered)",
-    "mechanical unfolding crate with Jeep logo",
-    "rooftop tent (already deployed)",
-    "glowing LED camp lights",
-    "a few solar panels",
-    "durable camping chairs",
-    "dust and grit in the air"
-  ],
-  "motion": "The crate's panels mechanically unlock and fold outward with audible clicks, revealing the Jeep within. Dust gently swirls from the movement.",
-  "ending": "A stunning, adventure-ready scene with the rugged Jeep as the hero, ready for exploration.",
-  "text": "none",
-  "keywords": [
-    "4k", "hyperrealistic", "Jeep", "reveal", "adventure",
-    "off-road", "basecamp", "rugged", "golden hour", "cinematic", "no people", "unfolding crate"
-  ]
-}
-
-# Lego Porsche
-# Description: A LEGO Porsche box trembles and explodes into hundreds of bricks that rapidly self-assemble into a detailed Porsche model on a sunset-lit kitchen island.
-# Source: X — https://x.com/heyrobinai/status/1947541977681002962
-lego_porsche = {
-  "description": "Photorealistic cinematic shot of a modern kitchen island at sunset. A sealed box of LEGO Porsche 911 Turbo and 911 Targa trembles, bursts open, and hundreds of glossy white, black, and orange LEGO pieces fly into the air and rapidly assemble into a sleek Porsche 911 model with detailed headlights, curved fenders, and an opening trunk. No text.",
-  "style": "photorealistic cinematic",
-  "camera": "smooth dolly shot transitioning from a close-up of the box to a wide shot of the car assembling",
-  "lighting": "warm sunset glow with soft ambient shadows",
-  "room": "modern kitchen with marble countertops, minimal appliances, and wooden bar stools",
-  "elements": [
-    "LEGO Porsche 911 Turbo and Targa box (Porsche logo visible)",
-    "white, black, and orange LEGO pieces",
-    "sleek 911 body with headlights and taillights",
-    "detailed interior with steering wheel and dashboard",
-    "removable roof panel for Targa mode",
-    "LEGO driver minifigure in racing outfit",
-    "tiny tools and tire set on the countertop"
-  ],
-  "motion": "box rattles and lid bursts open, bricks spin and lock into place mid-air to form the Porsche, headlights flicker on, and the roof panel clicks into position",
-  "ending": "a fully assembled Porsche 911 glistens under the sunset light on the countertop, angled as if ready to drive",
-  "text": "none",
-  "keywords": [
-    "16:9", "LEGO Porsche", "fast assembly", "photorealistic", "sunset lighting", "detailed car model"
-  ]
-}
-
-# Louis Vuitton Handbag Reveal
-# Description: A golden LV monogram disassembles into threads and weaves itself into a luxurious handbag on a velvet surface.
-# Source: X — https://x.com/ananasops/status/1948105568352161792
-handbag_reveal = {
-  "description": "Fixed wide-angle cinematic shot of a dark velvet surface under soft spotlight. A golden monogram LV logo shimmers midair, suspended above the surface. It begins to disassemble into thousands of tiny gold threads, which flow downward like liquid embroidery. The threads weave themselves into a detailed silhouette of a Louis Vuitton handbag. As the final stitch completes, the bag rises gently upright, its leather glowing, monogram pattern subtly embossed. A gold zipper glides open on its own, revealing a soft interior glow. No text.",
-  "style": "cinematic, luxurious, elegant",
-  "camera": "fixed wide angle",
-  "lighting": "moody spotlight with warm golden highlights and gentle falloff",
-  "environment": "black velvet tabletop with soft shadows and refined texture",
-  "elements": [
-    "gold LV monogram logo",
-    "golden embroidery threads",
-    "Louis Vuitton handbag silhouette",
-    "glowing leather texture",
-    "gold zipper movement",
-    "interior light reveal"
-  ],
-  "motion": {
-    "type": "logo-to-thread-to-object",
-    "details": "LV logo dissolves into gold threads, threads form bag, bag opens"
-  },
-  "ending": "The completed LV bag rests in the center, glowing softly. The camera holds for a moment, then fades to black. No text.",
-  "audio": {
-    "voice_over": "none",
-    "music": "subtle cinematic string swell with harp accents",
-    "sfx": "gentle thread weaving sounds, leather flexing, zipper slide"
-  },
-  "text_overlay": "none",
-  "format": "16:9",
-  "keywords": [
-    "Louis Vuitton", "luxury fashion", "handbag reveal", "embroidery transformation", "elegance", "cinematic branding"
-  ]
-}
-
-# Nike Ad
-# Description: In a misty urban court, a Nike shoebox levitates and explodes into self-assembling Air Jordans, which land onto a character’s feet mid-lip sync.
-# Source: X — https://x.com/DomainDomme/status/1947007723024928771
-nike_ad = {"description": "Hyper-stylized cinematic sequence inside a dark, misty urban basketball court at night. A closed Nike shoebox levitates, spins, and explodes into a vortex of sneaker parts. As a pair of glowing Air Jordans assembles mid-air, a character steps through smoke, lip-syncing a bold one-liner directly to camera as the shoes lock onto their feet with a kinetic blast.", "style": "stylized cinematic with light surreal VFX", "camera": { "type": "dynamic Steadicam and crane combo", "movement": "slow crane-down into rotating dolly move, then sudden handheld push-in during lip sync", "lens": "28mm for immersive wide-angle distortion during transformation" }, "lighting": { "type": "high-contrast urban night lighting", "sources": "overhead flickering halogen, bounce from wet pavement, rim lights from behind mist", "FX": "volumetric fog, sharp reflections on asphalt" }, "scene": { "location": "open-air industrial basketball court at night", "set_pieces": [ "chain-link fencing backlit by headlights", "wet pavement with puddle reflections", "floating Nike shoebox with visible swoosh", "slowly rising ambient smoke" ] }, "subject": { "character": { "description": "young adult, athletic build, platinum buzzcut, black techwear hoodie", "pose": "walks forward confidently, looking into camera, lips sync perfectly to voiceover", "lip_sync_line": "\"This ain’t style. This is power.\"" }, "shoes": { "brand": "Nike Air Jordan", "action": "shoebox explodes in slow motion, parts vortex upward, assemble in mid-air with glow FX, rotate once before flying onto character’s feet with a shockwave ripple" } }, "VFX": { "transformation": "slow-mo sneaker parts form with neon edge trails and motion blur", "shockwave": "circular distortion ripple on impact", "particles": "tiny swoosh-shaped embers drift through air post-transformation", "environment": "puddle reacts to energy with ripple sync" }, "motion": "shoes self-assemble mid-air with orbital motion; camera swings 180° as character lip-syncs; final zoom snap-in on Nike swoosh as shoes land and light flares", "sound_design": { "ambience": "distant traffic hum, echoing court reverb", "FX": [ "shoebox low-end bass hum + snap-pop explosion", "orbital shoe assembly with layered *whoosh-ping* glides", "impact blast with muffled shockwave", "shoelaces zip in with rising tension cue" ], "voiceover": { "delivery": "confident, clean baritone, slightly reverbed", "line": "\"This ain’t style. This is power.\"" }, "music": "hard-hitting trap beat with glitched snares and deep sub-bass swell during climax" }, "ending": "Character stands on lit court, Air Jordans glowing faintly. Camera orbit freeze-frames as logo tag pulses briefly onscreen.", "text": "optional logo pulse at end only", "keywords": [ "Nike", "Air Jordan", "product transformation", "stylized VFX", "lip sync", "basketball court", "power statement", "cinematic advertising", "shockwave impact", "trap beat" ] }
-
-# NYC Skyline - NYC container assembles complete New York cityscape with skyscrapers and taxis
-# Description: A sealed NYC container opens in a misty plaza and the New York skyline rapidly assembles out of it, complete with taxis, bridges, and skyscrapers.
-# Source: X — https://x.com/SearchPromptly/status/1947265849082941449
-nyc_skyline = {
-  "name": "NYC City Assembly",
-  "description": "A sealed NYC container opens in a misty plaza and the New York skyline rapidly assembles out of it, complete with taxis, bridges, and skyscrapers.",
-  "base_style": "cinematic, photorealistic, 4K",
-  "aspect_ratio": "16:9",
-  "city_description": "A vast, empty urban plaza at dawn, ground level view with concrete pavement stretching into the mist.",
-  "camera_setup": "A single, fixed, wide-angle shot. The camera holds its position for the entire 8-second duration.",
-  "key_elements": [
-    "A sealed steel shipping container stamped with 'NYC' in bold letters"
-  ],
-  "assembled_elements": [
-    "iconic Manhattan skyscrapers (e.g., Empire State Building, Chrysler Building)",
-    "Brooklyn Bridge arching into frame",
-    "yellow taxi cabs lined up along a street",
-    "hydrant and classic black street lamps",
-    "subway entrance staircase with MTA sign",
-    "Statue of Liberty's torch and crown silhouette",
-    "Central Park trees emerging in the background",
-    "water towers perched on rooftop structures",
-    "billboard frames and neon signs",
-    "sidewalk café tables and chairs full of people"
-  ],
-  "negative_prompts": ["no text overlays", "no overt graphics"],
-  "timeline": [
-    {
-      "sequence": 1,
-      "timestamp": "00:00-00:01",
-      "action": "In the center of the barren plaza sits the sealed NYC container. It begins to tremble as light fog swirls around it.",
-      "audio": "Deep, resonant rumble echoing across empty concrete."
-    },
-    {
-      "sequence": 2,
-      "timestamp": "00:01-00:02",
-      "action": "The container's steel doors burst open outward, releasing a spray of mist and loose rivets.",
-      "audio": "Sharp metallic clang, followed by hissing steam."
-    },
-    {
-      "sequence": 3,
-      "timestamp": "00:02-00:06",
-      "action": "Hyper-lapse: From the fixed vantage, city elements rocket out of the container and lock into place—steel beams rise, glass facades snap on, bridges span into view, and yellow taxis line up automatically.",
-      "audio": "A rapid sequence of ASMR city-building sounds: metal clanks, glass sliding, cables snapping, engines revving softly."
-    },
-    {
-      "sequence": 4,
-      "timestamp": "00:06-00:08",
-      "action": "The final element—a single yellow taxi—glides forward and parks beside the newfound curb. All motion freezes as morning light bathes the fully formed New York Cityscape.",
-      "audio": "A soft engine cut-off 'chug,' then the distant hum of awakening city traffic, fading into serene dawn silence."
-    }
-  ]
-}
-
-# Rimowa Suitcase
-# Description: A transparent suitcase spins and fills with yellow mist, transforming into a hard-shell Rimowa in a white cyclorama studio.
-# Source: X — https://x.com/Salmaaboukarr/status/1946929763030839573
-rimowa_suitcase = {
-  "description": "Cinematic editorial shot of an upright transparent suitcase in a plain white cyclorama studio. A burst of yellow mist fills the suitcase as it spins rapidly, transforming mid-spin into a solid yellow hard-shell suitcase. The camera pushes in smoothly before holding on the final form.",
-  "style": "editorial cinematic",
-  "camera": "precision dolly-in from 2.5m to 1.5m over 5 seconds, then static hero shot",
-  "lighting": "clean, soft, and even—no visible light sources or reflections; lighting wraps naturally with minimal shadowing",
-  "room": "plain infinite white cyclorama (no texture, no visible lights, seamless floor-to-wall transition)",
-  "elements": [
-    "transparent upright suitcase",
-    "volumetric yellow mist",
-    "solid yellow hard-shell suitcase with ribbed structure",
-    "chrome latches and telescopic handle",
-    "soft reflective white floor",
-    "faint lingering mist at base"
-  ],
-  "motion": "yellow mist violently fills the suitcase in under 2s; suitcase spins upright on vertical axis and transforms mid-spin into solid yellow shell; spin halts cleanly; camera push-in and hold",
-  "ending": "suitcase stops mid-frame in bold yellow form; mist dissipates; fade to white",
-  "text": "none",
-  "keywords": [
-    "editorial", "product transformation", "white cyclorama", "clean studio", "yellow mist", "no text", "no humans", "4K", "minimalist"
-  ]
-}
-
-# StrideX Sneaker Boutique
-# Description: In a neon-lit retail store, a StrideX shoebox explodes open, revealing self-lacing sneakers that sprint on a light treadmill before freezing in a hero pose.
-# Source: X — https://x.com/HBCoop_/status/1947362306750300362
-stridex_sneaker_boutique = {
-  "name": "StrideX Sneaker Boutique",
-  "description": "Urban sneaker boutique at night. A sealed StrideX shoe box rattles, shoots open, and neon-accented sneakers hover, self-lacing mid-air. They sprint on a treadmill of light and freeze in a hero pose.",
-  "style": "high-energy commercial",
-  "camera": "handheld whip-pan",
-  "lighting": "dynamic neon blues and magentas",
-  "room": "industrial retail space with concrete floor",
-  "elements": [
-    "StrideX box (logo glowing)",
-    "self-lacing sneakers",
-    "holographic treadmill",
-    "LED floor grid"
-  ],
-  "motion": "box explodes open, sneakers hover, tie laces, sprint, stop sharply",
-  "ending": "sneakers land on pedestal under spotlight",
-  "text": "none",
-  "keywords": [
-    "9:16",
-    "sneakers",
-    "neon",
-    "motion freeze",
-    "no text"
-  ]
-}
-
-# Tennis Spin
-# Description: A hyper-real macro tennis ball opens up and reveals a player
-# Source: X — https://x.com/Salmaaboukarr/status/1947718753417888206
-tennis_spin = {
-  "description": "A hyper-real macro tennis ball sits against a black background. It slowly cracks open like a shell to reveal a surreal spherical interior: a miniature curved clay court embedded within the felt-lined shell. A female tennis player stands centered in the middle third.",
-  "style": "editorial realism",
-  "camera": "macro static → pivot and dolly-in → lateral tracking to follow spinning ball",
-  "lighting": "soft top-down editorial lighting with curved, tactile shadows",
-  "scene": "interior of a spherical tennis ball with a warped clay court and surreal sportscape",
-  "elements": [
-    "matte neon-green tennis ball",
-    "white seam detail",
-    "shell-style lid opening upward",
-    "miniature curved clay court",
-    "floating net",
-    "curved fencing and ambient lights",
-    "female tennis player centered in middle third",
-    "green felt-lined interior shell",
-    "spinning tennis ball flying into right third",
-    "macro ball exterior reforming at end"
-  ],
-  "motion": "ball cracks open → camera glides in → player strikes ball with grunt → ball spins toward lens → rotates into original macro position",
-  "ending": "loop resolves with ball closing seamlessly into its original macro form, same angle and lighting",
-  "audio": "no text, only ambient sound and sharp player grunt on impact"
-}
-
-# Tesla Showroom
-# Description: A Tesla-branded crate unfolds to reveal a full car and a minimalist showroom around it.
-# Source: X — https://x.com/AzianMike/status/1947055581778563570
-tesla_showroom = {
-  "description": "Cinematic shot of a minimalist Tesla-branded crate magically opening to reveal a fully formed Tesla vehicle and an instantly assembled, sleek Tesla-themed showroom around it. No text.",
-  "style": "cinematic",
-  "camera": "fixed wide angle, with subtle zooms on key transformations",
-  "lighting": "controlled, high-tech, transitioning from dim to bright and clean",
-  "room": "empty futuristic space transforming into a minimalist Tesla showroom",
-  "elements": [
-    "Tesla-branded crate (glowing seams)",
-    "Tesla vehicle (e.g., Model 3/Y/Cybertruck)",
-    "charging station",
-    "minimalist display panels",
-    "sleek showroom furniture",
-    "ambient lighting elements"
-  ],
-  "motion": "crate panels retract smoothly and silently, car revealed, showroom elements rise/unfold precisely and rapidly",
-  "ending": "pristine, inviting Tesla showroom with car as centerpiece",
-  "text": "none",
-  "keywords": [
-    "16:9",
-    "Tesla",
-    "magic assembly",
-    "showroom",
-    "innovation",
-    "futuristic",
-    "no text",
-    "clean design",
-    "reveal"
-  ]
-}
\ No newline at end of file
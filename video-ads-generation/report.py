@@ -0,0 +1,203 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import JOB_LOG
+
+
+# (stage, model column, latency column) triples; stages missing from a log are skipped
+STAGES = [
+    ("ideas", "ideas_model", "ideas_latency_ms"),
+    ("prompt", "prompt_model", "prompt_latency_ms"),
+    ("storyboard", "model", "storyboard_latency_ms"),
+]
+
+REPORT_COLUMNS = {
+    "task_id", "created_at", "status", "error", "total_tokens",
+    *[column for _, model_column, latency_column in STAGES for column in (model_column, latency_column)],
+}
+
+FREQUENCIES = {"hour": "h", "day": "D"}
+PERCENTILES = [0.5, 0.9, 0.99]
+
+# Checked in order, the first matching pattern names the error type
+ERROR_TYPES = [
+    ("quota_exhausted", r"error 429|RESOURCE_EXHAUSTED|quota"),
+    ("auth", r"error 40[13]|API key"),
+    ("server_error", r"error 5\d\d"),
+    ("bad_request", r"error 4\d\d"),
+    ("network", r"request failed|timed out|Timeout"),
+    ("empty_output", r"did not include any text"),
+    ("invalid_json", r"not valid JSON"),
+]
+
+
+def load_history(path: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Load only the columns the report needs from the job log.
+    Without a path the job log partitions are read, skipping those the
+    manifest places outside [since, until]; jobs outside the range are then
+    dropped by created_at.
+    Parquet or CSV exports of the history load much faster than the xlsx log.
+    """
+    if path is None:
+        partitions = JOB_LOG.partitions(since, until)
+        frames = [_load_log_file(partition["path"]) for partition in partitions if os.path.exists(partition["path"])]
+        history = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=sorted(REPORT_COLUMNS))
+        # A job updated after its partition was sealed appears again in a later one; keep its final row
+        if "task_id" in history.columns:
+            history = history.drop_duplicates("task_id", keep="last")
+    else:
+        history = _load_log_file(path)
+
+    if (since is not None or until is not None) and "created_at" in history.columns:
+        created = pd.to_datetime(history["created_at"], errors="coerce")
+        keep = pd.Series(True, index=history.index)
+        if since is not None:
+            keep &= created >= since
+        if until is not None:
+            keep &= created <= until
+        history = history[keep]
+    return history
+
+
+def _wanted(column: str) -> bool:
+    return column in REPORT_COLUMNS
+
+
+def _load_log_file(path: str) -> pd.DataFrame:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        frame = pd.read_parquet(path)
+        return frame[[column for column in frame.columns if _wanted(column)]]
+    if extension == ".csv":
+        return pd.read_csv(path, usecols=_wanted)
+    return pd.read_excel(path, usecols=_wanted)
+
+
+def _map_uniques(values: pd.Series, func) -> pd.Series:
+    """
+    Apply a vectorised transform to the distinct values only and broadcast back.
+    Log columns such as timestamps and error messages repeat heavily, so this
+    is much cheaper than transforming every row.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    mapped = np.asarray(func(pd.Series(uniques)))
+    return pd.Series(mapped[codes], index=values.index)
+
+
+def _bucket_codes(values: pd.Series, func) -> tuple[np.ndarray, pd.Index]:
+    """
+    Like _map_uniques, but return each row's position in the sorted distinct
+    results (-1 where the result is missing) plus those results, so rows can
+    be counted per bucket with np.bincount instead of a hash groupby.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    bucket_codes, buckets = pd.factorize(pd.Series(func(pd.Series(uniques))), sort=True)
+    return bucket_codes[codes], pd.Index(buckets)
+
+
+def _classify_unique_errors(errors: pd.Series) -> np.ndarray:
+    errors = errors.fillna("").astype(str)
+    conditions = [errors.str.contains(pattern, case=False, regex=True) for _, pattern in ERROR_TYPES]
+    labels = [label for label, _ in ERROR_TYPES]
+    types = np.select(conditions, labels, default="other")
+    return np.where(errors.str.len() > 0, types, "none")
+
+
+def classify_errors(errors: pd.Series) -> pd.Series:
+    """Vectorised mapping of error messages to coarse error types."""
+    return _map_uniques(errors, _classify_unique_errors)
+
+
+def build_report(history: pd.DataFrame, freq: str = "day") -> dict[str, pd.DataFrame]:
+    """
+    Summarise a job history:
+    - jobs, success rate and tokens per job for every hour/day bucket
+    - error-type counts per bucket
+    - latency percentiles per (stage, model)
+    """
+    def column(name: str, default) -> pd.Series:
+        return history[name] if name in history.columns else pd.Series(default, index=history.index)
+
+    # Rows become integer codes into sorted periods / error types, so every table is a bincount
+    frequency = FREQUENCIES.get(freq, freq)
+    period, periods = _bucket_codes(
+        column("created_at", None),
+        lambda values: pd.to_datetime(values, errors="coerce").dt.floor(frequency),
+    )
+    periods.name = "period"
+    dated = period >= 0
+    period = period[dated]
+
+    def per_period(weights: Optional[np.ndarray] = None) -> np.ndarray:
+        return np.bincount(period, weights=None if weights is None else weights[dated], minlength=len(periods))
+
+    success = column("status", "").eq("completed").to_numpy(dtype=float)
+    tokens = pd.to_numeric(column("total_tokens", np.nan), errors="coerce").to_numpy(dtype=float)
+    has_tokens = ~np.isnan(tokens)
+    jobs = per_period()
+    total_tokens = per_period(np.where(has_tokens, tokens, 0.0))
+    token_jobs = per_period(has_tokens.astype(float))
+    summary = pd.DataFrame({
+        "jobs": jobs,
+        "success_rate": per_period(success) / jobs,
+        "tokens_per_job": total_tokens / np.where(token_jobs > 0, token_jobs, np.nan),
+        "total_tokens": total_tokens,
+    }, index=periods)
+
+    error_type, error_types = _bucket_codes(column("error", ""), _classify_unique_errors)
+    error_types.name = "error_type"
+    counts = np.bincount(
+        period * len(error_types) + error_type[dated], minlength=len(periods) * len(error_types)
+    ).reshape(len(periods), len(error_types))
+    errors = pd.DataFrame(counts, index=periods, columns=error_types).drop(columns="none", errors="ignore")
+    errors = errors.loc[errors.sum(axis=1) > 0, errors.sum() > 0]
+
+    stage_tables = []
+    for stage, model_column, latency_column in STAGES:
+        if latency_column not in history.columns:
+            continue
+        latency_ms = pd.to_numeric(history[latency_column], errors="coerce")
+        model, models = _bucket_codes(column(model_column, ""), lambda values: values.fillna("").astype(str))
+        timed = latency_ms.notna().to_numpy()
+        grouped = latency_ms[timed].groupby(model[timed])
+        table = grouped.quantile(PERCENTILES).unstack().rename(columns=lambda q: f"p{int(q * 100)}")
+        table["calls"] = grouped.size()
+        table.index = pd.MultiIndex.from_arrays(
+            [np.full(len(table), stage, dtype=object), models[table.index]], names=["stage", "model"]
+        )
+        stage_tables.append(table)
+
+    latency = pd.DataFrame()
+    if stage_tables:
+        latency = pd.concat(stage_tables).sort_index()
+
+    return {"summary": summary, "errors": errors, "latency": latency}
+
+
+def print_report(report: dict[str, pd.DataFrame]) -> None:
+    for name, table in report.items():
+        print(f"\n=== {name} ===")
+        print(table.to_string() if not table.empty else "(no data)")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run-history report over the job log")
+    parser.add_argument("--log", help="a single xlsx log or a parquet/csv export of it (default: the partitioned job log)")
+    parser.add_argument("--freq", choices=sorted(FREQUENCIES), default="day")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="first day to include, e.g. 2024-06-01")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="last day to include")
+    args = parser.parse_args(argv)
+
+    # --until names a day, so include all of it
+    until = args.until + timedelta(days=1) - timedelta(minutes=1) if args.until else None
+    print_report(build_report(load_history(args.log, args.since, until), args.freq))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from request_scheduler import HostSlots, RequestScheduler
+
+
+# Simulated Gemini call duration while a slot is held
+HOLD_SECONDS = 0.05
+HOST_SLOTS = 2
+# Threads in the competing batch process, all trying to keep the host's slots busy
+BACKFILL_THREADS = 6
+FOREGROUND_REQUESTS = 20
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def in_process_order(per_class: int = 4) -> dict[str, Any]:
+    """
+    Queue backfill requests, then interactive ones, behind a single busy slot
+    and record the order they are served in. With the default weights every
+    interactive request should go before the queued backfill ones.
+    """
+    scheduler = RequestScheduler(slots=1)
+    served: list[str] = []
+
+    def request(priority: str) -> None:
+        with scheduler.slot(priority):
+            served.append(priority)
+
+    threads = []
+    with scheduler.slot("backfill"):
+        for priority in ["backfill"] * per_class + ["interactive"] * per_class:
+            thread = threading.Thread(target=request, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            # Let each request join the queue before the next one
+            while scheduler.stats()["queued"] < len(threads):
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    expected = ["interactive"] * per_class + ["backfill"] * per_class
+    return {"served": served, "ok": served == expected}
+
+
+def _backfill_process(directory: str, threads: int, stop) -> None:
+    scheduler = RequestScheduler(slots=threads, host_slots=HostSlots(directory, HOST_SLOTS))
+
+    def loop() -> None:
+        while not stop.is_set():
+            with scheduler.slot("backfill"):
+                time.sleep(HOLD_SECONDS)
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def _foreground_waits(directory: str, priority: str, requests: int) -> list[float]:
+    scheduler = RequestScheduler(slots=1, host_slots=HostSlots(directory, HOST_SLOTS))
+    waits = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        with scheduler.slot(priority):
+            waits.append((time.perf_counter() - started) * 1000)
+            time.sleep(HOLD_SECONDS)
+        # Think time, so the next request arrives while the batch holds every slot
+        time.sleep(HOLD_SECONDS * 2)
+    return waits
+
+
+def cross_process(requests: int = FOREGROUND_REQUESTS, backfill_threads: int = BACKFILL_THREADS) -> dict[str, Any]:
+    """
+    Saturate the host slots from a separate backfill process, then time how
+    long foreground requests wait for a slot, once as interactive and once as
+    backfill (the no-priority control). Interactive waits should stay within
+    about one call duration while the control queues behind the batch.
+    """
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for priority in ("interactive", "backfill"):
+            stop = multiprocessing.Event()
+            batch = multiprocessing.Process(target=_backfill_process, args=(directory, backfill_threads, stop))
+            batch.start()
+            # Let the batch process fill every slot first
+            time.sleep(HOLD_SECONDS * 4)
+            try:
+                waits = _foreground_waits(directory, priority, requests)
+            finally:
+                stop.set()
+                batch.join()
+            results[priority] = {
+                "wait_p50_ms": round(_percentile(waits, 50), 1),
+                "wait_p95_ms": round(_percentile(waits, 95), 1),
+                "wait_max_ms": round(max(waits), 1),
+            }
+    results["ok"] = (
+        results["interactive"]["wait_p95_ms"] <= HOLD_SECONDS * 1000 * 2
+        and results["interactive"]["wait_p95_ms"] < results["backfill"]["wait_p95_ms"]
+    )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Check request priority ordering within and across processes")
+    parser.add_argument("--requests", type=int, default=FOREGROUND_REQUESTS)
+    parser.add_argument("--backfill-threads", type=int, default=BACKFILL_THREADS)
+    args = parser.parse_args(argv)
+
+    order = in_process_order()
+    print(f"In-process order: {order}")
+    host = cross_process(args.requests, args.backfill_threads)
+    print(f"Across processes ({HOST_SLOTS} host slots, {args.backfill_threads} backfill threads): {host}")
+    if not (order["ok"] and host["ok"]):
+        print("Interactive requests were not served ahead of backfill work")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import re
+import threading
+from typing import Any, Optional
+
+from tracing import span
+from utils import build_payload, generate_content, json_dumps, json_loads
+
+
+# Fields every storyboard shot must carry
+SHOT_FIELDS = ["timestamp", "visuals", "camera", "narration"]
+
+# Generated clips are at most this long, so the last shot must end by then
+MAX_STORYBOARD_SECONDS = 8.0
+
+# Repair requests allowed per storyboard before the remaining issues are accepted
+MAX_REPAIR_ROUNDS = 2
+REPAIR_TEMPERATURE = 0.4
+EDIT_TEMPERATURE = 0.5
+
+# "0s-2s", "0-2.5s", "0:01 - 0:03", "2-4 seconds", "0-2 sec"
+_TIME = r"(?:(\d+):)?(\d+(?:\.\d+)?)\s*(?:seconds?|secs?|s)?"
+_TIMESTAMP_RE = re.compile(rf"^\s*{_TIME}\s*(?:-|–|to)\s*{_TIME}\s*$", re.IGNORECASE)
+
+_INDEXED_SHOT_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {"index": {"type": "INTEGER"}, **{field: {"type": "STRING"} for field in SHOT_FIELDS}},
+    "required": ["index", *SHOT_FIELDS],
+    "propertyOrdering": ["index", *SHOT_FIELDS],
+}
+
+REPAIR_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "shots": {"type": "ARRAY", "items": _INDEXED_SHOT_SCHEMA},
+    },
+    "required": ["shots"],
+}
+
+# Edits come back as a diff: changed/added shots by index, removed indexes and
+# an overview / call to action that stay empty when unchanged
+EDIT_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "overview": {"type": "STRING"},
+        "shots": {"type": "ARRAY", "items": _INDEXED_SHOT_SCHEMA},
+        "removed": {"type": "ARRAY", "items": {"type": "INTEGER"}},
+        "call_to_action": {"type": "STRING"},
+    },
+    "required": ["shots"],
+    "propertyOrdering": ["overview", "shots", "removed", "call_to_action"],
+}
+
+_repair_stats = {"storyboards": 0, "invalid": 0, "repair_calls": 0, "shots_repaired": 0, "still_invalid": 0}
+_repair_stats_lock = threading.Lock()
+
+
+def parse_timestamp(value: Any) -> Optional[tuple[float, float]]:
+    """Parse a shot timestamp range into (start, end) seconds, or None if unreadable."""
+    match = _TIMESTAMP_RE.match(value) if isinstance(value, str) else None
+    if match is None:
+        return None
+    start_min, start_sec, end_min, end_sec = match.groups()
+    start = int(start_min or 0) * 60 + float(start_sec)
+    end = int(end_min or 0) * 60 + float(end_sec)
+    return start, end
+
+
+def validate_storyboard(storyboard: Any) -> dict[int, list[str]]:
+    """
+    Check every shot in one pass and return {shot index: [problems]}.
+    Shots must have all SHOT_FIELDS, a parseable timestamp range that starts
+    where or after the previous shot ended, and end within MAX_STORYBOARD_SECONDS.
+    A storyboard without a usable shots list is reported under index -1.
+    """
+    shots = storyboard.get("shots") if isinstance(storyboard, dict) else None
+    if not isinstance(shots, list) or not shots:
+        return {-1: ["storyboard has no shots"]}
+
+    issues: dict[int, list[str]] = {}
+    previous_end = 0.0
+    for index, shot in enumerate(shots):
+        problems = []
+        if not isinstance(shot, dict):
+            issues[index] = ["shot is not an object"]
+            continue
+
+        for field in SHOT_FIELDS:
+            value = shot.get(field)
+            if not isinstance(value, str) or not value.strip():
+                problems.append(f"missing {field}")
+
+        span = parse_timestamp(shot.get("timestamp"))
+        if span is None:
+            if "missing timestamp" not in problems:
+                problems.append(f"unreadable timestamp {shot.get('timestamp')!r}")
+        else:
+            start, end = span
+            if end <= start:
+                problems.append(f"timestamp ends before it starts ({start:g}s-{end:g}s)")
+            if start < previous_end:
+                problems.append(f"starts at {start:g}s, before the previous shot ends at {previous_end:g}s")
+            if end > MAX_STORYBOARD_SECONDS:
+                problems.append(f"ends at {end:g}s, past the {MAX_STORYBOARD_SECONDS:g}s limit")
+            previous_end = max(previous_end, end)
+
+        if problems:
+            issues[index] = problems
+    return issues
+
+
+def _numbered_shots(shots: list[Any], issues: Optional[dict[int, list[str]]] = None) -> list[str]:
+    lines = []
+    for index, shot in enumerate(shots):
+        flag = f"  <-- FIX: {'; '.join(issues[index])}" if issues and index in issues else ""
+        lines.append(f"[{index}] {json_dumps(shot).decode('utf-8')}{flag}")
+    return lines
+
+
+def _repair_message(storyboard: dict[str, Any], issues: dict[int, list[str]]) -> str:
+    lines = [
+        "A storyboard failed validation. Rewrite ONLY the flagged shots so that every shot has "
+        f"{', '.join(SHOT_FIELDS)}, timestamps are in order without overlaps (format \"0s-2s\"), "
+        f"and the last shot ends by {MAX_STORYBOARD_SECONDS:g}s. Keep the flagged shots consistent "
+        "with the shots around them and return them with their original index.",
+        "",
+        f"Overview: {storyboard.get('overview', '')}",
+        "",
+        "Shots:",
+    ]
+    lines.extend(_numbered_shots(storyboard["shots"], issues))
+    return "\n".join(lines)
+
+
+def repair_storyboard(
+    storyboard: dict[str, Any],
+    issues: dict[int, list[str]],
+    model: str,
+    api_key: str,
+    system_instruction: str,
+    budget_key: Optional[str] = None,
+) -> tuple[dict[str, Any], dict[int, list[str]]]:
+    """
+    Regenerate only the offending shots, sending the rest of the storyboard as
+    context, and merge them back in. Returns the storyboard and its remaining issues.
+    Storyboards without a usable shots list cannot be repaired shot by shot.
+    """
+    if -1 in issues:
+        return storyboard, issues
+
+    storyboard = {**storyboard, "shots": list(storyboard["shots"])}
+    label = f"{budget_key or 'storyboard'}:repair"
+    for _ in range(MAX_REPAIR_ROUNDS):
+        if not issues:
+            break
+        print(f"Repairing {len(issues)} storyboard shot(s): {sorted(issues)}")
+        payload = build_payload(
+            system_instruction, _repair_message(storyboard, issues), REPAIR_TEMPERATURE, REPAIR_SCHEMA, label=label
+        )
+        with _repair_stats_lock:
+            _repair_stats["repair_calls"] += 1
+        try:
+            result = generate_content(model, api_key, payload, label)
+            repaired = json_loads(result["text"]).get("shots", [])
+        except ValueError as exc:
+            print(f"Storyboard repair failed: {str(exc)}")
+            break
+
+        for shot in repaired:
+            index = shot.get("index") if isinstance(shot, dict) else None
+            if index in issues:
+                storyboard["shots"][index] = {field: shot.get(field, "") for field in SHOT_FIELDS}
+                with _repair_stats_lock:
+                    _repair_stats["shots_repaired"] += 1
+        issues = validate_storyboard(storyboard)
+    return storyboard, issues
+
+
+def check_and_repair(
+    storyboard: Any,
+    model: str,
+    api_key: str,
+    system_instruction: str,
+    budget_key: Optional[str] = None,
+) -> tuple[Any, dict[int, list[str]]]:
+    """Validate a parsed storyboard and repair its bad shots; returns (storyboard, remaining issues)."""
+    with span("storyboard.validate") as attrs:
+        issues = validate_storyboard(storyboard)
+        attrs["invalid_shots"] = len(issues)
+    with _repair_stats_lock:
+        _repair_stats["storyboards"] += 1
+        _repair_stats["invalid"] += bool(issues)
+    if issues:
+        with span("storyboard.repair", invalid_shots=len(issues)) as attrs:
+            storyboard, issues = repair_storyboard(storyboard, issues, model, api_key, system_instruction, budget_key)
+            attrs["still_invalid"] = len(issues)
+        if issues:
+            with _repair_stats_lock:
+                _repair_stats["still_invalid"] += 1
+    return storyboard, issues
+
+
+def _edit_message(storyboard: dict[str, Any], previous_brief: str, new_brief: str) -> str:
+    lines = [
+        "The creative brief for this storyboard was edited. Update the storyboard to match the new "
+        "brief while changing as little as possible:",
+        "- return only the shots that must change, with their index; use the next free indexes to add shots",
+        "- list the indexes of shots to drop in \"removed\"",
+        "- leave overview and call_to_action empty unless they must change",
+        f"- keep timestamps in order without overlaps and end by {MAX_STORYBOARD_SECONDS:g}s",
+        "",
+        f"Previous brief: {previous_brief}",
+        f"New brief: {new_brief}",
+        "",
+        f"Overview: {storyboard.get('overview', '')}",
+        "",
+        "Shots:",
+        *_numbered_shots(storyboard["shots"]),
+        "",
+        f"Call to action: {storyboard.get('call_to_action', '')}",
+    ]
+    return "\n".join(lines)
+
+
+def merge_storyboard_edit(storyboard: dict[str, Any], edit: dict[str, Any]) -> tuple[dict[str, Any], list[int]]:
+    """Apply an edit diff to a storyboard; returns the new storyboard and the changed shot indexes."""
+    shots = list(storyboard.get("shots", []))
+    updates = [
+        shot for shot in edit.get("shots", [])
+        if isinstance(shot, dict) and isinstance(shot.get("index"), int) and shot["index"] >= 0
+    ]
+    changed = []
+    for shot in sorted(updates, key=lambda shot: shot["index"]):
+        index = shot["index"]
+        replacement = {field: shot.get(field, "") for field in SHOT_FIELDS}
+        if index < len(shots):
+            shots[index] = replacement
+        else:
+            shots.append(replacement)
+            index = len(shots) - 1
+        changed.append(index)
+
+    removed = {index for index in edit.get("removed", []) if isinstance(index, int)} - set(changed)
+    if removed:
+        # Report changed shots by their index after the removals
+        changed = [index - sum(1 for gone in removed if gone < index) for index in changed]
+        shots = [shot for index, shot in enumerate(shots) if index not in removed]
+
+    merged = {**storyboard, "shots": shots}
+    for key in ("overview", "call_to_action"):
+        if isinstance(edit.get(key), str) and edit[key].strip():
+            merged[key] = edit[key]
+    return merged, sorted(changed)
+
+
+def edit_storyboard(
+    storyboard: dict[str, Any],
+    previous_brief: str,
+    new_brief: str,
+    model: str,
+    api_key: str,
+    system_instruction: str,
+    budget_key: Optional[str] = None,
+) -> tuple[dict[str, Any], list[int], dict[str, Any]]:
+    """
+    Update a storyboard for an edited brief with one small request that returns
+    only the affected shots, then merge and validate the result (bad shots go
+    through the usual targeted repair). Returns (storyboard, changed shot
+    indexes, generate_content result of the edit call).
+    Raises ValueError when the edit request fails or its reply is not valid JSON.
+    """
+    label = f"{budget_key or 'storyboard'}:edit"
+    payload = build_payload(
+        system_instruction, _edit_message(storyboard, previous_brief, new_brief), EDIT_TEMPERATURE, EDIT_SCHEMA, label=label
+    )
+    result = generate_content(model, api_key, payload, label)
+    edit = json_loads(result["text"])
+    if not isinstance(edit, dict):
+        raise ValueError("Storyboard edit response is not a JSON object")
+
+    merged, changed = merge_storyboard_edit(storyboard, edit)
+    print(f"Storyboard edit changed shot(s): {changed or 'none'}")
+    return merged, changed, result
+
+
+def repair_stats() -> dict[str, int]:
+    """Storyboards checked, found invalid, repair calls made and shots repaired."""
+    with _repair_stats_lock:
+        return dict(_repair_stats)
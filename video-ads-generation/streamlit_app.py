@@ -3,7 +3,8 @@ import asyncio
 import os
 from typing import Dict, Any
 from prompt_library import PROMPT_LIBRARY
-from main import run_workflow
+from prompt_search import AUTO_PICK_OPTION, auto_select_prompt, prompt_display_options
+from main import run_edit_workflow, run_workflow
 import json
 
 # Configure the Streamlit page
@@ -80,30 +81,24 @@ def main():
     st.header("🎨 Prompt Inspiration")
     st.markdown("Choose one or more prompt templates to inspire your video:")
     
-    # Create a more user-friendly prompt selection
-    prompt_options = []
-    for i, prompt in enumerate(PROMPT_LIBRARY):
-        prompt_options.append({
-            "index": i,
-            "display": f"{prompt['name']} - {prompt['description'][:100]}{'...' if len(prompt['description']) > 100 else ''}",
-            "name": prompt['name'],
-            "description": prompt['description']
-        })
+    # Labels and the label -> index lookup are built once per process
+    prompt_labels, label_to_index = prompt_display_options()
     
     # Single select for prompts
     selected_prompt_display = st.selectbox(
         "Select prompt inspiration:",
-        options=[opt["display"] for opt in prompt_options],
-        help="Choose one prompt template to inspire your video"
+        options=[AUTO_PICK_OPTION] + prompt_labels,
+        help="Choose one prompt template to inspire your video, or let the app pick the closest match"
     )
     
     # Get selected prompt
     selected_prompt = None
-    if selected_prompt_display:
-        for opt in prompt_options:
-            if opt["display"] == selected_prompt_display:
-                selected_prompt = PROMPT_LIBRARY[opt["index"]]
-                break
+    if selected_prompt_display == AUTO_PICK_OPTION:
+        if video_idea.strip():
+            selected_prompt = PROMPT_LIBRARY[auto_select_prompt(video_idea)]
+            st.info(f"🔎 Auto-picked: **{selected_prompt['name']}**")
+    elif selected_prompt_display:
+        selected_prompt = PROMPT_LIBRARY[label_to_index[selected_prompt_display]]
 
     # Display selected prompt details
     if selected_prompt:
@@ -135,6 +130,23 @@ def main():
             help="gemini-1.5-flash is faster, gemini-1.5-pro provides more detailed outputs"
         )
 
+    # Edit mode: reuse the last storyboard when only the idea was tweaked
+    previous = st.session_state.get("last_result")
+    can_edit = bool(
+        previous
+        and selected_prompt
+        and previous["inspiration"] == selected_prompt['name']
+        and previous["aspect_ratio"] == aspect_ratio
+        and previous["ad_idea"] != video_idea
+    )
+    edit_mode = False
+    if can_edit:
+        edit_mode = st.checkbox(
+            "✏️ Edit previous storyboard",
+            value=True,
+            help="Only regenerate the shots affected by your change (one small call instead of the full pipeline)"
+        )
+
     # Generate button
     st.markdown("---")
     
@@ -151,8 +163,10 @@ def main():
             inputs = {
                 "ad_idea": video_idea,
                 "inspiration_prompt": inspiration_prompt,
+                "inspiration_name": selected_prompt['name'],
                 "aspect_ratio": aspect_ratio,
-                "model": model
+                "model": model,
+                "priority": "interactive"
             }
             print(f"Inputs: {inputs}")
             
@@ -167,13 +181,25 @@ def main():
                     progress_bar.progress(10)
                     status_text.text("📝 Creating video prompt...")
                     
-                    # Run the workflow
-                    result = asyncio.run(run_workflow(inputs))
+                    # Run the workflow (or the single edit call in edit mode)
+                    if edit_mode:
+                        status_text.text("✏️ Updating the affected shots...")
+                        result = asyncio.run(run_edit_workflow(inputs, previous))
+                    else:
+                        result = asyncio.run(run_workflow(inputs))
                     
                     progress_bar.progress(100)
                     status_text.text("✅ Storyboard generation completed!")
                     
                     if result:
+                        st.session_state["last_result"] = {
+                            **result,
+                            "inspiration": selected_prompt['name'],
+                            "aspect_ratio": aspect_ratio
+                        }
+                        if edit_mode:
+                            st.info(f"✏️ Changed shots: {result.get('changed_shots') or 'none'}")
+
                         # Display the result
                         st.balloons()
                         display_storyboard(result.get("gemini_output", ""), result.get("title", "Generated Storyboard"))
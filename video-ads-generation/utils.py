@@ -1,33 +1,138 @@
 import asyncio
+import contextvars
+import hashlib
 import json
 import os
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Optional, Type
+import typing
+from typing import Any, Callable, Optional, Type
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+from cassette import CASSETTE
+from job_log import JobLog, LogRow
+from key_pool import KEY_POOL
+from model_router import MODEL_ROUTER
+from request_scheduler import MAX_CONCURRENT_REQUESTS, REQUEST_SCHEDULER
+from singleflight import SingleFlight
+from token_estimator import TOKEN_ESTIMATOR
+from tracing import span
+
+try:
+    import orjson
+except ImportError:  # Optional fast JSON backend, falls back to the stdlib
+    orjson = None
 
 
 # Excel file for logging
 EXCEL_LOG_FILE = "ad_videos.xlsx"
+# Date-partitioned job log (see job_log.py); the single-file log is read as its legacy partition
+JOB_LOG = JobLog(os.path.splitext(EXCEL_LOG_FILE)[0], legacy_file=EXCEL_LOG_FILE)
 
 DEFAULT_LLM_MODEL = "gemini-1.5-pro"
-GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta/models"
+# Override to point at a local stand-in (python gemini_standin.py) for load tests
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta/models")
+# Stands in for a real key under GEMINI_CASSETTE_MODE=replay, which never reaches the network
+REPLAY_API_KEY = "cassette-replay"
+
+# Output token budget: starts at the default and adapts per template/stage
+DEFAULT_MAX_OUTPUT_TOKENS = 2048
+MAX_OUTPUT_TOKENS_CEILING = 8192
+OUTPUT_BUDGET_HEADROOM = 1.25
+OUTPUT_BUDGET_HISTORY = 20
+
+# Follow-up requests allowed when a response stops on MAX_TOKENS
+MAX_CONTINUATIONS = 3
+CONTINUATION_PROMPT = (
+    "Your previous response was cut off. Continue exactly where it stopped, "
+    "without repeating anything and without any commentary or code fences."
+)
+# Dropped from continuation turns: under a schema Gemini starts a new, complete object instead of continuing
+SCHEMA_CONFIG_KEYS = ("responseMimeType", "responseSchema")
+
+_output_token_history: dict[str, deque] = {}
+
+# One pooled session so long-running processes reuse TLS connections to Gemini
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_CONCURRENT_REQUESTS, 10)))
+
+# Identical concurrent requests (same model, budget and payload) share one HTTP call
+_gemini_flights = SingleFlight()
+
+# Details (model used, usage, finish reason) of the last ainvoke_llm call in this task
+_last_call_info: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar("last_call_info", default={})
+
+# Structured output parse outcomes, split by whether a responseSchema was sent
+_parse_stats: dict[str, dict[str, int]] = {
+    "schema": {"calls": 0, "failures": 0},
+    "prose": {"calls": 0, "failures": 0},
+}
+
+_JSON_SCHEMA_TYPES = {
+    str: "STRING",
+    int: "INTEGER",
+    float: "NUMBER",
+    bool: "BOOLEAN",
+}
+_response_schema_cache: dict[Any, dict[str, Any]] = {}
+
+class GeminiAPIError(ValueError):
+    """Gemini request failure; status_code is None for network errors."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """Whether another attempt (or another model) could succeed."""
+        return self.status_code is None or self.status_code in (408, 429) or self.status_code >= 500
+
+
+def json_loads(data: str | bytes) -> Any:
+    """Decode JSON with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """Encode JSON to UTF-8 bytes with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
 
 def get_current_date():
     return datetime.now().strftime("%Y-%m-%d %H:%M")
 
 
-def _get_api_key() -> Optional[str]:
-    """Return the configured Gemini API key with backwards compatibility."""
-    return (
+def _configured_api_keys() -> list[str]:
+    """All configured Gemini keys: the GEMINI_API_KEYS pool plus the single-key variables."""
+    keys = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()]
+    single_key = (
         os.getenv("GEMINI_API_KEY")
         or os.getenv("KIE_API_TOKEN")
         or os.getenv("KIE_API_KEY")
     )
+    if single_key and single_key not in keys:
+        keys.append(single_key)
+    return keys
+
 
+def get_api_key() -> Optional[str]:
+    """Return the configured Gemini API key with backwards compatibility; a placeholder when replaying a cassette."""
+    keys = _configured_api_keys()
+    if keys:
+        return keys[0]
+    return REPLAY_API_KEY if CASSETTE.mode == "replay" else None
 
-def _normalise_model(model: Optional[str]) -> str:
+
+def normalise_model(model: Optional[str]) -> str:
     """Map legacy model names to Gemini equivalents."""
     if not model:
         return DEFAULT_LLM_MODEL
@@ -40,9 +145,136 @@ def _normalise_model(model: Optional[str]) -> str:
     return mapping.get(model, model)
 
 
-def _build_payload(system_prompt: str, user_message: str, temperature: float) -> dict[str, Any]:
-    """Construct the Gemini request payload."""
+def output_token_budget(budget_key: Optional[str]) -> int:
+    """Return the maxOutputTokens to request for a template/stage based on observed lengths."""
+    history = _output_token_history.get(budget_key) if budget_key else None
+    if not history:
+        return DEFAULT_MAX_OUTPUT_TOKENS
+
+    budget = int(max(history) * OUTPUT_BUDGET_HEADROOM)
+    # Round up to a multiple of 256 so small fluctuations don't change the payload
+    budget = -(-budget // 256) * 256
+    return max(DEFAULT_MAX_OUTPUT_TOKENS, min(budget, MAX_OUTPUT_TOKENS_CEILING))
+
+
+def record_output_tokens(budget_key: Optional[str], tokens: int) -> None:
+    """Remember how many output tokens a template/stage needed."""
+    if not budget_key or tokens <= 0:
+        return
+    history = _output_token_history.setdefault(budget_key, deque(maxlen=OUTPUT_BUDGET_HISTORY))
+    history.append(tokens)
+
+
+def record_parse_result(mode: str, success: bool) -> None:
+    """Count a structured-output parse attempt ("schema" or "prose" mode)."""
+    stats = _parse_stats.setdefault(mode, {"calls": 0, "failures": 0})
+    stats["calls"] += 1
+    if not success:
+        stats["failures"] += 1
+
+
+def parse_failure_stats() -> dict[str, dict[str, float]]:
+    """Return parse attempts, failures and failure rate per mode."""
     return {
+        mode: {
+            **stats,
+            "failure_rate": (stats["failures"] / stats["calls"]) if stats["calls"] else 0.0,
+        }
+        for mode, stats in _parse_stats.items()
+    }
+
+
+def _schema_for_annotation(annotation: Any) -> dict[str, Any]:
+    """Translate a Python type annotation into a Gemini (OpenAPI subset) schema."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Annotated:
+        return _schema_for_annotation(args[0])
+
+    if origin is typing.Union:
+        non_null = [arg for arg in args if arg is not type(None)]
+        schema = _schema_for_annotation(non_null[0]) if len(non_null) == 1 else {"type": "STRING"}
+        if len(non_null) < len(args):
+            schema = {**schema, "nullable": True}
+        return schema
+
+    if origin in (list, tuple, set, frozenset):
+        item = args[0] if args else str
+        return {"type": "ARRAY", "items": _schema_for_annotation(item)}
+
+    if origin is dict or annotation is dict:
+        return {"type": "OBJECT"}
+
+    if annotation in _JSON_SCHEMA_TYPES:
+        return {"type": _JSON_SCHEMA_TYPES[annotation]}
+
+    if isinstance(annotation, type):
+        return response_schema(annotation)
+
+    return {"type": "STRING"}
+
+
+def _required_fields(response_format: Type[Any], fields: list[str]) -> list[str]:
+    # TypedDict
+    if hasattr(response_format, "__required_keys__"):
+        return [name for name in fields if name in response_format.__required_keys__]
+
+    # Pydantic v2
+    model_fields = getattr(response_format, "model_fields", None)
+    if isinstance(model_fields, dict):
+        return [name for name in fields if model_fields[name].is_required()]
+
+    # Pydantic v1 compatibility
+    v1_fields = getattr(response_format, "__fields__", None)
+    if isinstance(v1_fields, dict):
+        return [name for name in fields if getattr(v1_fields[name], "required", True)]
+
+    return fields
+
+
+def response_schema(response_format: Any) -> dict[str, Any]:
+    """
+    Build a Gemini responseSchema from a pydantic model or TypedDict.
+    Plain dicts are treated as ready-made schemas and returned unchanged.
+    """
+    if isinstance(response_format, dict):
+        return response_format
+
+    cached = _response_schema_cache.get(response_format)
+    if cached is not None:
+        return cached
+
+    hints = typing.get_type_hints(response_format, include_extras=True)
+    # Pydantic models carry their own ClassVars/private attrs, so prefer the declared fields
+    declared = getattr(response_format, "model_fields", None) or getattr(response_format, "__fields__", None)
+    if isinstance(declared, dict):
+        fields = [name for name in declared if name in hints]
+    else:
+        fields = [name for name in hints if not name.startswith("_")]
+    schema = {
+        "type": "OBJECT",
+        "properties": {name: _schema_for_annotation(hints[name]) for name in fields},
+        "required": _required_fields(response_format, fields),
+        "propertyOrdering": fields,
+    }
+    _response_schema_cache[response_format] = schema
+    return schema
+
+
+def build_payload(
+    system_prompt: str,
+    user_message: str,
+    temperature: float,
+    response_format: Optional[Any] = None,
+    label: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Construct the Gemini request payload and preflight its size: oversized
+    requests are warned about or rejected (PayloadTooLargeError) before sending.
+    label names the template/stage in the per-label token estimates.
+    """
+    payload = {
         "systemInstruction": {
             "role": "system",
             "parts": [{"text": system_prompt}],
@@ -57,35 +289,264 @@ def _build_payload(system_prompt: str, user_message: str, temperature: float) ->
             "temperature": temperature,
             "topP": 0.95,
             "topK": 40,
-            "maxOutputTokens": 2048,
+            "maxOutputTokens": DEFAULT_MAX_OUTPUT_TOKENS,
         },
     }
+    if response_format is not None:
+        # Constrain decoding to the schema instead of asking for JSON in prose
+        payload["generationConfig"]["responseMimeType"] = "application/json"
+        payload["generationConfig"]["responseSchema"] = response_schema(response_format)
+    TOKEN_ESTIMATOR.preflight(payload, label)
+    return payload
 
 
-def _make_gemini_request(model: str, api_key: str, payload: dict[str, Any]) -> str:
-    endpoint = f"{GEMINI_API_BASE}/{model}:generateContent"
+def http_request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Send a request over the pooled session Gemini calls use (Files API uploads, batch jobs)."""
+    return _http.request(method, url, **kwargs)
+
+
+def _post_gemini(model: str, api_key: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    Send a single generateContent request and return the decoded response.
+    In cassette mode (GEMINI_CASSETTE_MODE, see cassette.py) exchanges are
+    recorded, or replayed without touching the network.
+    """
+    if CASSETTE.mode == "replay":
+        with span("cassette.replay", model=model):
+            entry = CASSETTE.next_entry(model, payload)
+        if entry["error"] is not None:
+            raise GeminiAPIError(entry["error"], entry["status_code"])
+        return entry["response"]
+
+    started = time.perf_counter()
     try:
-        response = requests.post(
-            endpoint,
-            params={"key": api_key},
-            json=payload,
-            timeout=60,
-        )
-    except requests.RequestException as exc:
-        raise ValueError(f"Gemini request failed: {exc}") from exc
-
-    if response.status_code != 200:
-        raise ValueError(f"Gemini API error {response.status_code}: {response.text}")
-
-    data = response.json()
-    text_output = _extract_text_from_response(data)
-    if not text_output:
+        data = _send_gemini(model, api_key, payload)
+    except GeminiAPIError as exc:
+        CASSETTE.record(model, payload, (time.perf_counter() - started) * 1000, error=str(exc), status_code=exc.status_code)
+        raise
+    CASSETTE.record(model, payload, (time.perf_counter() - started) * 1000, data, status_code=200)
+    return data
+
+
+def _sync_key_pool(api_key: str) -> None:
+    # api_key is only used when no keys are configured in the environment
+    KEY_POOL.sync(_configured_api_keys() or [api_key])
+
+
+def _send_gemini(model: str, api_key: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    POST the request to the Gemini API. The request is made with whichever pooled key has the most quota left and
+    moves on to the next key if that one is rate limited or rejected;
+    api_key is only used when no keys are configured in the environment.
+    """
+    endpoint = f"{GEMINI_API_BASE}/{model}:generateContent"
+    _sync_key_pool(api_key)
+    body = json_dumps(payload)
+
+    attempts = max(1, len(KEY_POOL))
+    for attempt in range(attempts):
+        pooled_key = KEY_POOL.acquire()
+        if pooled_key is None:
+            raise GeminiAPIError("All Gemini API keys are parked or out of quota", 429)
+
+        try:
+            with span("http.generateContent", model=model, attempt=attempt, request_bytes=len(body)) as attrs:
+                response = _http.post(
+                    endpoint,
+                    params={"key": pooled_key},
+                    data=body,
+                    headers={"Content-Type": "application/json"},
+                    timeout=60,
+                )
+                attrs["status"] = response.status_code
+                attrs["response_bytes"] = len(response.content)
+        except requests.RequestException as exc:
+            KEY_POOL.report(pooled_key, None)
+            raise GeminiAPIError(f"Gemini request failed: {exc}") from exc
+
+        retry_after = response.headers.get("Retry-After", "")
+        KEY_POOL.report(pooled_key, response.status_code, float(retry_after) if retry_after.isdigit() else None)
+        if response.status_code in (403, 429) and attempt < attempts - 1:
+            continue
+        if response.status_code != 200:
+            raise GeminiAPIError(
+                f"Gemini API error {response.status_code}: {response.text}",
+                response.status_code,
+            )
+
+        with span("parse.response", bytes=len(response.content)):
+            return json_loads(response.content)
+
+
+def generate_content(
+    model: str,
+    api_key: str,
+    payload: dict[str, Any],
+    budget_key: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Call Gemini and transparently continue responses that stop on MAX_TOKENS.
+    The partial output is sent back as a model turn and follow-up requests are
+    appended until the model finishes or MAX_CONTINUATIONS is reached.
+    Continuation turns go out without the response schema so the pieces
+    join into one document.
+    Returns the combined text, the last raw response, the finish reason,
+    the summed usage metadata and the model that served the request, which
+    may be a fallback chosen by the model router.
+    Concurrent calls with the same API key, model, budget key and payload are
+    coalesced into a single request whose result (or error) every caller receives.
+    The request then waits its turn in the priority scheduler (see
+    request_scheduler.set_request_priority) before it is sent.
+    """
+    # Callers with different keys never share a result, error or quota charge
+    key_fingerprint = hashlib.sha256(str(api_key).encode("utf-8")).digest()
+    key = hashlib.sha256(
+        key_fingerprint + b"\0" + model.encode("utf-8") + b"\0" + str(budget_key).encode("utf-8") + b"\0" + json_dumps(payload)
+    ).hexdigest()
+    result = _gemini_flights.do(key, lambda: _scheduled_generate(model, api_key, payload, budget_key))
+    # Each caller gets its own top-level dict
+    return dict(result)
+
+
+def _scheduled_generate(
+    model: str,
+    api_key: str,
+    payload: dict[str, Any],
+    budget_key: Optional[str],
+) -> dict[str, Any]:
+    # Book the estimated input plus the output budget against the scheduler's token-per-minute cap
+    output_budget = output_token_budget(budget_key) if budget_key else payload.get("generationConfig", {}).get(
+        "maxOutputTokens", DEFAULT_MAX_OUTPUT_TOKENS
+    )
+    tokens = TOKEN_ESTIMATOR.estimate_payload(payload) + output_budget
+    with span("gemini.request", model=model, label=budget_key, estimated_tokens=tokens) as attrs:
+        if CASSETTE.mode != "replay":
+            # Wait out parked or exhausted keys before taking a slot, so the wait does not hold one
+            waiting = time.perf_counter()
+            _sync_key_pool(api_key)
+            if not KEY_POOL.wait_available():
+                raise GeminiAPIError("All Gemini API keys are parked or out of quota", 429)
+            attrs["key_wait_ms"] = round((time.perf_counter() - waiting) * 1000, 1)
+        queued = time.perf_counter()
+        with REQUEST_SCHEDULER.slot(cost=tokens / 1000, tokens=tokens) as grant:
+            attrs["queue_ms"] = round((time.perf_counter() - queued) * 1000, 1)
+            result = MODEL_ROUTER.call(
+                model,
+                lambda target: _generate_with_continuations(target, api_key, payload, budget_key),
+            )
+            grant.tokens = result["usage"].get("totalTokenCount", tokens)
+            attrs["model_used"] = result["model"]
+            attrs["total_tokens"] = grant.tokens
+            return result
+
+
+def _generate_with_continuations(
+    model: str,
+    api_key: str,
+    payload: dict[str, Any],
+    budget_key: Optional[str],
+) -> dict[str, Any]:
+    generation_config = payload.setdefault("generationConfig", {})
+    if budget_key:
+        generation_config["maxOutputTokens"] = output_token_budget(budget_key)
+
+    contents = list(payload.get("contents", []))
+    continuation_payload = {
+        **payload,
+        "generationConfig": {key: value for key, value in generation_config.items() if key not in SCHEMA_CONFIG_KEYS},
+    }
+    raw_input_tokens = TOKEN_ESTIMATOR.raw_payload_tokens(payload)
+    pieces: list[str] = []
+    usage: dict[str, int] = {}
+    continuations = 0
+
+    while True:
+        data = _post_gemini(model, api_key, {**(continuation_payload if continuations else payload), "contents": contents})
+        piece, finish_reason = _extract_candidate(data)
+        pieces.append(piece)
+        if not continuations:
+            # Keep the offline estimator in line with Gemini's own token counts
+            TOKEN_ESTIMATOR.calibrate(raw_input_tokens, data.get("usageMetadata", {}).get("promptTokenCount"))
+        for key, value in data.get("usageMetadata", {}).items():
+            if isinstance(value, int):
+                usage[key] = usage.get(key, 0) + value
+
+        if finish_reason != "MAX_TOKENS" or not piece or continuations >= MAX_CONTINUATIONS:
+            break
+
+        continuations += 1
+        print(f"Gemini output truncated, requesting continuation {continuations}/{MAX_CONTINUATIONS}...")
+        contents = contents + [
+            {"role": "model", "parts": [{"text": piece}]},
+            {"role": "user", "parts": [{"text": CONTINUATION_PROMPT}]},
+        ]
+
+    record_output_tokens(budget_key, usage.get("candidatesTokenCount", 0))
+
+    return {
+        "text": "".join(pieces).strip(),
+        "raw": data,
+        "finish_reason": finish_reason,
+        "usage": usage,
+        "continuations": continuations,
+    }
+
+
+def _make_gemini_request(
+    model: str,
+    api_key: str,
+    payload: dict[str, Any],
+    budget_key: Optional[str] = None,
+) -> dict[str, Any]:
+    result = generate_content(model, api_key, payload, budget_key)
+    if not result["text"]:
         raise ValueError("Gemini response did not include any text output.")
 
-    return text_output
+    return result
 
 
-def _extract_text_from_response(data: dict[str, Any]) -> str:
+def last_call_info() -> dict[str, Any]:
+    """Model used, usage and finish reason of the last ainvoke_llm call awaited in this task."""
+    return _last_call_info.get()
+
+
+def coalescing_stats() -> dict[str, int]:
+    """Gemini calls made, executed and saved by request coalescing."""
+    return _gemini_flights.stats()
+
+
+def key_pool_stats() -> dict[str, dict[str, Any]]:
+    """Per-key request counts, errors, remaining budget and parking state."""
+    return KEY_POOL.stats()
+
+
+def scheduler_stats() -> dict[str, Any]:
+    """Queue depth and per-priority wait percentiles of the request scheduler."""
+    return REQUEST_SCHEDULER.stats()
+
+
+def token_estimate_stats() -> dict[str, Any]:
+    """Estimator calibration and estimated input tokens per template/stage."""
+    return TOKEN_ESTIMATOR.stats()
+
+
+def cassette_stats() -> dict[str, Any]:
+    """Cassette mode and how many exchanges were recorded, replayed or missed."""
+    return CASSETTE.stats()
+
+
+def job_log_stats() -> dict[str, Any]:
+    """Active job log partition and how many partitions exist / are sealed."""
+    return JOB_LOG.stats()
+
+
+def router_stats() -> dict[str, dict[str, Any]]:
+    """Breaker state and rolling latency/error stats per model."""
+    return MODEL_ROUTER.stats()
+
+
+def _extract_candidate(data: dict[str, Any]) -> tuple[str, Optional[str]]:
+    """Return the unstripped text and finish reason of the first candidate with text."""
     candidates = data.get("candidates", [])
     for candidate in candidates:
         content = candidate.get("content", {})
@@ -96,22 +557,51 @@ def _extract_text_from_response(data: dict[str, Any]) -> str:
             if text:
                 lines.append(text)
         if lines:
-            return "\n".join(lines).strip()
-    return ""
+            return "\n".join(lines), candidate.get("finishReason")
+    return "", (candidates[0].get("finishReason") if candidates else None)
 
 
-def _coerce_structured_output(raw_text: str, response_format: Type[Any]):
+def _extract_text_from_response(data: dict[str, Any]) -> str:
+    return _extract_candidate(data)[0].strip()
+
+
+def batch_response_result(model: str, data: dict[str, Any], budget_key: Optional[str] = None) -> dict[str, Any]:
+    """
+    Shape a generateContent response that arrived outside generate_content
+    (an offline batch job) like a generate_content result. Truncated output
+    is not continued.
+    """
+    text, finish_reason = _extract_candidate(data)
+    usage = {key: value for key, value in data.get("usageMetadata", {}).items() if isinstance(value, int)}
+    record_output_tokens(budget_key, usage.get("candidatesTokenCount", 0))
+    return {
+        "text": text.strip(),
+        "raw": data,
+        "finish_reason": finish_reason,
+        "usage": usage,
+        "continuations": 0,
+        "model": model,
+    }
+
+
+def _coerce_structured_output(raw_text: str, response_format: Type[Any], mode: str = "prose"):
     """Attempt to parse Gemini text into the requested structured type."""
-    cleaned = _strip_code_fence(raw_text)
+    with span("parse.structured", mode=mode, chars=len(raw_text)):
+        return _parse_structured(_strip_code_fence(raw_text), response_format, mode)
+
 
+def _parse_structured(cleaned: str, response_format: Type[Any], mode: str, loads: Callable[[str], Any] = json_loads):
+    # Decode once; pydantic validates the already-parsed object
     try:
-        payload = json.loads(cleaned)
-    except json.JSONDecodeError as exc:
+        payload = loads(cleaned)
+    except ValueError as exc:
+        record_parse_result(mode, False)
         raise ValueError("Gemini response was not valid JSON for the requested structure") from exc
+    record_parse_result(mode, True)
 
     # Pydantic v2
-    if hasattr(response_format, "model_validate_json"):
-        return response_format.model_validate_json(cleaned)
+    if hasattr(response_format, "model_validate"):
+        return response_format.model_validate(payload)
 
     # Pydantic v1 compatibility
     if hasattr(response_format, "parse_obj"):
@@ -129,18 +619,18 @@ def _strip_code_fence(text: str) -> str:
     if not stripped.startswith("```"):
         return stripped
 
-    lines = stripped.splitlines()
-    if not lines:
-        return stripped
+    # Slice off the opening fence line and, if present, the closing fence line
+    first_newline = stripped.find("\n")
+    if first_newline == -1:
+        return ""
+    body = stripped[first_newline + 1:]
 
-    if lines[0].startswith("```"):
-        lines = lines[1:]
+    last_newline = body.rfind("\n")
+    if body[last_newline + 1:].startswith("```"):
+        body = body[:last_newline] if last_newline != -1 else ""
 
-    # Drop closing fence if present
-    if lines and lines[-1].startswith("```"):
-        lines = lines[:-1]
+    return body.strip()
 
-    return "\n".join(lines).strip()
 
 async def ainvoke_llm(
     model,
@@ -148,57 +638,164 @@ async def ainvoke_llm(
     user_message,
     response_format=None,
     temperature=0.1,
+    budget_key=None,
+    use_schema=True,
 ):
     """Invoke Gemini asynchronously and optionally coerce to structured output."""
 
-    api_key = _get_api_key()
+    api_key = get_api_key()
     if not api_key:
         raise ValueError("Missing Gemini API key. Set GEMINI_API_KEY or KIE_API_TOKEN.")
 
-    target_model = _normalise_model(model)
-    payload = _build_payload(system_prompt, user_message, temperature)
+    target_model = normalise_model(model)
+    schema_format = response_format if use_schema else None
+    if budget_key is None:
+        # Without an explicit template key, adapt the budget per model + system prompt; a stable
+        # digest rather than hash() so the key is the same in every process
+        budget_key = f"{target_model}:{hashlib.blake2b(system_prompt.encode('utf-8'), digest_size=6).hexdigest()}"
+    payload = build_payload(system_prompt, user_message, temperature, schema_format, label=budget_key)
 
-    response_text = await asyncio.to_thread(
+    result = await asyncio.to_thread(
         _make_gemini_request,
         target_model,
         api_key,
         payload,
+        budget_key,
     )
+    _last_call_info.set({
+        "model": result["model"],
+        "usage": result["usage"],
+        "finish_reason": result["finish_reason"],
+    })
+    response_text = result["text"]
 
     if response_format is None:
         return response_text
 
-    return _coerce_structured_output(response_text, response_format)
+    mode = "schema" if schema_format is not None else "prose"
+    return _coerce_structured_output(response_text, response_format, mode)
+
+def generation_log_fields(generation_result: dict[str, Any], latency_ms: float) -> dict[str, Any]:
+    """Model, latency and token usage columns for a start_video_generation result."""
+    usage = generation_result.get("response", {}).get("usage", {})
+    return {
+        'model': generation_result.get("model", ""),
+        'storyboard_latency_ms': round(latency_ms, 1),
+        'prompt_tokens': usage.get("promptTokenCount", 0),
+        'output_tokens': usage.get("candidatesTokenCount", 0),
+        'total_tokens': usage.get("totalTokenCount", 0),
+    }
 
 def log_to_excel(data, row_index=None):
     """
-    Log video generation data to Excel file.
-    If row_index is provided, updates an existing row instead of creating a new one.
-    Returns the DataFrame index of the entry (new or updated).
+    Log video generation data to the active job log partition.
+    If row_index (a LogRow returned by an earlier call) is provided, updates
+    that row instead of creating a new one. Returns the entry's LogRow.
+    """
+    with span("log.xlsx", update=row_index is not None) as attrs:
+        waited = time.perf_counter()
+        # Serialises writers across threads and worker processes on this host
+        with JOB_LOG.locked():
+            attrs["lock_wait_ms"] = round((time.perf_counter() - waited) * 1000, 1)
+            partition, index = JOB_LOG.target(row_index)
+            attrs["partition"] = partition
+            written, appended = _write_log_entry(JOB_LOG.path(partition), data, index)
+            return JOB_LOG.committed(partition, written, appended)
+
+
+async def log_to_excel_async(data, row_index=None):
     """
+    Awaitable log_to_excel for use inside coroutines.
+    The workbook round-trip runs in a worker thread so the event loop keeps
+    serving other in-flight requests; a snapshot of data is taken up front
+    so the caller can keep mutating its entry.
+    """
+    return await asyncio.to_thread(log_to_excel, dict(data), row_index)
+
+
+def log_rows_to_excel(entries):
+    """
+    Append many new rows to the active job log partition with a single
+    workbook write (offline batch fan-back). Returns their LogRows.
+    """
+    with span("log.xlsx", rows=len(entries)) as attrs:
+        waited = time.perf_counter()
+        with JOB_LOG.locked():
+            attrs["lock_wait_ms"] = round((time.perf_counter() - waited) * 1000, 1)
+            partition, _ = JOB_LOG.target()
+            attrs["partition"] = partition
+            first = _append_log_entries(JOB_LOG.path(partition), entries)
+            JOB_LOG.committed(partition, first + len(entries) - 1, True, rows=len(entries))
+            return [LogRow(partition, first + offset) for offset in range(len(entries))]
+
+
+def _locate_row(df, task_id, hint):
+    """Row of task_id, checking the hinted index first; None if the job is not in this partition."""
+    if task_id is None or 'task_id' not in df.columns:
+        return hint if hint is not None and 0 <= hint < len(df) else None
+    if hint is not None and 0 <= hint < len(df) and df.at[hint, 'task_id'] == task_id:
+        return hint
+    matches = df.index[df['task_id'] == task_id]
+    return int(matches[-1]) if len(matches) else None
+
+
+def _write_log_entry(path, data, row_index=None):
+    """
+    Insert or update one row of a log partition; returns (row index, appended).
+    Rows are matched by task_id (row_index is only a hint), and the workbook
+    is written to a temp file and renamed into place so readers never see a
+    half-written file. Callers hold JOB_LOG.locked().
+    """
+    df = _read_log_partition(path)
+    row_index = _locate_row(df, data.get('task_id'), row_index) if row_index is not None else None
+    appended = row_index is None
+    if not appended:
+        # Update existing row
+        for key, value in data.items():
+            df.loc[row_index, key] = value
+    else:
+        # Create new row
+        df = pd.concat([df, pd.DataFrame([data])], ignore_index=True)
+        row_index = len(df) - 1  # Get the index of the newly added row
+    
+    _save_log_partition(path, df)
+    return row_index, appended
+
+
+def _append_log_entries(path, entries):
+    """Append rows to a log partition; returns the index of the first one. Callers hold JOB_LOG.locked()."""
+    df = _read_log_partition(path)
+    first = len(df)
+    df = pd.concat([df, pd.DataFrame(entries)], ignore_index=True)
+    _save_log_partition(path, df)
+    return first
+
+
+def _read_log_partition(path):
+    """Load a log partition (or an empty frame), with every expected column present."""
     expected_columns = [
         'title', 'prompt',
-        'status', 'task_id', 'video_url', 'gemini_output', 'error', 'created_at'
+        'status', 'task_id', 'video_url', 'gemini_output', 'error', 'created_at',
+        'prompt_model', 'prompt_latency_ms', 'model', 'storyboard_latency_ms',
+        'prompt_tokens', 'output_tokens', 'total_tokens', 'aspect_ratio'
     ]
 
-    if os.path.exists(EXCEL_LOG_FILE):
-        df = pd.read_excel(EXCEL_LOG_FILE)
+    if os.path.exists(path):
+        # Keep every column as object: empty columns would otherwise read back as float64 and reject strings
+        df = pd.read_excel(path, dtype=object)
         # Ensure all expected columns are present for backwards compatibility
         for column in expected_columns:
             if column not in df.columns:
                 df[column] = ""
     else:
         df = pd.DataFrame(columns=expected_columns)
-    
-    if row_index is not None and 0 <= row_index < len(df):
-        # Update existing row
-        for key, value in data.items():
-            df.loc[row_index, key] = value
-    else:
-        # Create new row
-        df = pd.concat([df, pd.DataFrame([data])], ignore_index=True)
-        row_index = len(df) - 1  # Get the index of the newly added row
-    
+    return df
+
+
+def _save_log_partition(path, df):
+    """Write a partition via a temp file and rename, so readers never see a half-written workbook."""
     # Save to Excel
-    df.to_excel(EXCEL_LOG_FILE, index=False)
-    return row_index
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{os.path.splitext(path)[0]}.{os.getpid()}.tmp.xlsx"
+    df.to_excel(temp_path, index=False)
+    os.replace(temp_path, path)
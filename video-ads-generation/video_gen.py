@@ -1,22 +1,46 @@
-import os
 from typing import Any, Dict, Optional
 
-import requests
+from storyboard import MAX_STORYBOARD_SECONDS, SHOT_FIELDS, check_and_repair, edit_storyboard
+from tracing import span
+from utils import build_payload, get_api_key, generate_content, json_dumps, json_loads, record_parse_result
 
 
 DEFAULT_GEMINI_MODEL = "gemini-1.5-flash"
 
+# responseSchema sent with every storyboard request so the output is always valid JSON
+STORYBOARD_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "overview": {"type": "STRING"},
+        "shots": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    **{field: {"type": "STRING"} for field in SHOT_FIELDS},
+                    "timestamp": {"type": "STRING", "description": 'Shot time range written as "Ns-Ms", e.g. "0s-2s"'},
+                },
+                "required": SHOT_FIELDS,
+                "propertyOrdering": SHOT_FIELDS,
+            },
+        },
+        "call_to_action": {"type": "STRING"},
+    },
+    "required": ["overview", "shots", "call_to_action"],
+    "propertyOrdering": ["overview", "shots", "call_to_action"],
+}
 
-def _get_api_key() -> Optional[str]:
-    """Return the configured Gemini API key with backwards compatibility."""
-    return (
-        os.getenv("GEMINI_API_KEY")
-        or os.getenv("KIE_API_TOKEN")
-        or os.getenv("KIE_API_KEY")
-    )
+
+STORYBOARD_SYSTEM_INSTRUCTION = (
+    "You are an award-winning video director. Given a creative brief, craft a detailed "
+    "storyboard for an AI-generated marketing video. Include shot structure, camera "
+    "movement, visual details, and narration so another model can later render the video. "
+    "Shots run in order without overlaps, the last shot ends by "
+    f"{MAX_STORYBOARD_SECONDS:g}s, and every timestamp is written as \"Ns-Ms\" (e.g. \"0s-2s\")."
+)
 
 
-def _normalise_model(model: Optional[str]) -> str:
+def normalise_model(model: Optional[str]) -> str:
     """Map legacy model names to Gemini equivalents."""
     if not model:
         return DEFAULT_GEMINI_MODEL
@@ -28,24 +52,40 @@ def _normalise_model(model: Optional[str]) -> str:
     return mapping.get(model, model)
 
 
-def start_video_generation(prompt: str, aspect_ratio: str, model: Optional[str] = None) -> Dict[str, Any]:
-    """Generate a video storyboard using Gemini."""
-    api_key = _get_api_key()
+def start_video_generation(
+    prompt: str,
+    aspect_ratio: str,
+    model: Optional[str] = None,
+    budget_key: Optional[str] = None,
+    keep_raw: bool = True,
+) -> Dict[str, Any]:
+    """
+    Generate a video storyboard using Gemini.
+    With keep_raw=False the raw API response is dropped from the result.
+    """
+    api_key = get_api_key()
     if not api_key:
         return {
             "status": "failed",
             "error": "Missing Gemini API key. Set GEMINI_API_KEY or KIE_API_TOKEN.",
         }
 
-    target_model = _normalise_model(model)
-    endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{target_model}:generateContent"
+    target_model = normalise_model(model)
 
-    system_instruction = (
-        "You are an award-winning video director. Given a creative brief, craft a detailed "
-        "storyboard for an AI-generated marketing video. Include shot structure, camera "
-        "movement, visual details, and narration so another model can later render the video."
-    )
+    try:
+        payload = storyboard_payload(prompt, aspect_ratio, budget_key)
+        result = generate_content(target_model, api_key, payload, budget_key or "storyboard")
+    except ValueError as exc:
+        return {
+            "status": "failed",
+            "model": target_model,
+            "error": str(exc),
+        }
+    return storyboard_result(result, api_key, budget_key, keep_raw)
 
+
+def storyboard_payload(prompt: str, aspect_ratio: str, budget_key: Optional[str] = None) -> Dict[str, Any]:
+    """The generateContent payload for a storyboard request (also packed into offline batch jobs)."""
     user_prompt = (
         "Create a cinematic marketing video plan using the following prompt inspiration.\n\n"
         f"Aspect ratio: {aspect_ratio}\n"
@@ -66,73 +106,101 @@ def start_video_generation(prompt: str, aspect_ratio: str, model: Optional[str]
         f"{prompt}"
     )
 
-    payload: Dict[str, Any] = {
-        "systemInstruction": {
-            "role": "system",
-            "parts": [{"text": system_instruction}],
-        },
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": user_prompt}],
-            }
-        ],
-        "generationConfig": {
-            "temperature": 0.7,
-            "topP": 0.95,
-            "topK": 40,
-            "maxOutputTokens": 2048,
-        },
-    }
+    # build_payload also preflights the request size against the token limits
+    return build_payload(
+        STORYBOARD_SYSTEM_INSTRUCTION, user_prompt, 0.7, STORYBOARD_SCHEMA, label=budget_key or "storyboard"
+    )
 
-    try:
-        response = requests.post(
-            endpoint,
-            params={"key": api_key},
-            json=payload,
-            timeout=60,
-        )
-    except requests.RequestException as exc:
+
+def storyboard_result(
+    result: Dict[str, Any],
+    api_key: Optional[str],
+    budget_key: Optional[str] = None,
+    keep_raw: bool = True,
+) -> Dict[str, Any]:
+    """Turn a generate_content result into a start_video_generation result, repairing invalid shots."""
+    text_response = result["text"]
+    if not text_response:
         return {
             "status": "failed",
-            "error": f"Gemini request failed: {exc}",
+            "model": result["model"],
+            "error": "Gemini response did not include any text output.",
+            "details": result["raw"] if keep_raw else None,
         }
 
-    if response.status_code != 200:
+    shot_issues: dict[int, list[str]] = {}
+    try:
+        with span("parse.storyboard", chars=len(text_response)):
+            parsed = json_loads(text_response)
+        record_parse_result("storyboard", True)
+    except ValueError:
+        record_parse_result("storyboard", False)
+    else:
+        # Fix bad shots with a targeted repair call instead of regenerating the whole storyboard
+        repaired, shot_issues = check_and_repair(parsed, result["model"], api_key, STORYBOARD_SYSTEM_INSTRUCTION, budget_key)
+        if repaired is not parsed:
+            text_response = json_dumps(repaired).decode("utf-8")
+        if shot_issues:
+            print(f"Storyboard still has invalid shots after repair: {shot_issues}")
+
+    return {
+        "status": "completed",
+        "model": result["model"],
+        "response": {
+            "text": text_response,
+            "raw": result["raw"] if keep_raw else None,
+            "finish_reason": result["finish_reason"],
+            "usage": result["usage"],
+            "shot_issues": shot_issues,
+        },
+    }
+
+
+def edit_video_generation(
+    previous_output: str,
+    previous_brief: str,
+    new_brief: str,
+    model: Optional[str] = None,
+    budget_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Update a previously generated storyboard for an edited brief. Only the
+    shots affected by the edit are regenerated (one small Gemini call) and
+    merged into the prior storyboard; the result has the same shape as
+    start_video_generation plus the changed shot indexes.
+    """
+    api_key = get_api_key()
+    if not api_key:
         return {
             "status": "failed",
-            "error": f"Gemini API error {response.status_code}",
-            "details": response.text,
+            "error": "Missing Gemini API key. Set GEMINI_API_KEY or KIE_API_TOKEN.",
         }
 
-    data = response.json()
-    text_response = _extract_text_from_response(data)
-    if not text_response:
+    target_model = normalise_model(model)
+    try:
+        previous = json_loads(previous_output)
+        if not isinstance(previous, dict) or not isinstance(previous.get("shots"), list):
+            raise ValueError("Previous storyboard has no shots to edit")
+        edited, changed, result = edit_storyboard(
+            previous, previous_brief, new_brief, target_model, api_key, STORYBOARD_SYSTEM_INSTRUCTION, budget_key
+        )
+    except ValueError as exc:
         return {
             "status": "failed",
-            "error": "Gemini response did not include any text output.",
-            "details": data,
+            "model": target_model,
+            "error": str(exc),
         }
 
+    edited, shot_issues = check_and_repair(edited, result["model"], api_key, STORYBOARD_SYSTEM_INSTRUCTION, budget_key)
     return {
         "status": "completed",
+        "model": result["model"],
         "response": {
-            "text": text_response,
-            "raw": data,
+            "text": json_dumps(edited).decode("utf-8"),
+            "raw": result["raw"],
+            "finish_reason": result["finish_reason"],
+            "usage": result["usage"],
+            "shot_issues": shot_issues,
+            "changed_shots": changed,
         },
     }
-
-
-def _extract_text_from_response(data: Dict[str, Any]) -> str:
-    candidates = data.get("candidates", [])
-    for candidate in candidates:
-        content = candidate.get("content", {})
-        parts = content.get("parts", [])
-        lines = []
-        for part in parts:
-            text = part.get("text")
-            if text:
-                lines.append(text)
-        if lines:
-            return "\n".join(lines).strip()
-    return ""
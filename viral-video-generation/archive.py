@@ -0,0 +1,213 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from utils import json_dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency, archiving is skipped without it
+    pa = None
+
+
+# Root folder of the Parquet archive, partitioned as date=YYYY-MM-DD/
+ARCHIVE_DIR = "archive"
+
+# Buffered rows are written as one zstd-compressed row group once either limit is hit
+ARCHIVE_FLUSH_ROWS = 64
+ARCHIVE_FLUSH_SECONDS = 60
+
+# Cheap metadata columns first; the large text columns are only read when asked for
+ARCHIVE_COLUMNS = [
+    ("job_id", "string"),
+    ("created_at", "timestamp"),
+    ("stage", "string"),
+    ("model", "string"),
+    ("status", "string"),
+    ("finish_reason", "string"),
+    ("prompt_tokens", "int64"),
+    ("output_tokens", "int64"),
+    ("total_tokens", "int64"),
+    ("latency_ms", "float64"),
+    ("error", "string"),
+    ("title", "string"),
+    ("prompt", "string"),
+    ("storyboard", "string"),
+    ("raw_response", "string"),
+]
+
+
+def archive_available() -> bool:
+    return pa is not None
+
+
+def _arrow_schema():
+    types = {
+        "string": pa.string(),
+        "timestamp": pa.timestamp("ms"),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in ARCHIVE_COLUMNS])
+
+
+def _normalise_record(record: dict[str, Any]) -> dict[str, Any]:
+    row = {name: record.get(name) for name, _ in ARCHIVE_COLUMNS}
+    if row["created_at"] is None:
+        row["created_at"] = datetime.now()
+    elif isinstance(row["created_at"], str):
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+
+    raw = row["raw_response"]
+    if raw is not None and not isinstance(raw, str):
+        row["raw_response"] = json_dumps(raw).decode("utf-8")
+    return row
+
+
+class ArchiveWriter:
+    """
+    Append-only Parquet archive for raw Gemini responses and storyboards.
+    Rows are buffered and written as zstd-compressed files (one row group each)
+    under a date=YYYY-MM-DD partition, so readers can prune by date and
+    load only the columns they need.
+    """
+
+    def __init__(
+        self,
+        root: str = ARCHIVE_DIR,
+        flush_rows: int = ARCHIVE_FLUSH_ROWS,
+        flush_seconds: float = ARCHIVE_FLUSH_SECONDS,
+    ):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._rows: list[dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def append(self, record: dict[str, Any]) -> None:
+        row = _normalise_record(record)
+        with self._lock:
+            self._rows.append(row)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = (
+                len(self._rows) >= self.flush_rows
+                or time.monotonic() - self._oldest >= self.flush_seconds
+            )
+            if due:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._rows:
+            return
+
+        rows, self._rows, self._oldest = self._rows, [], None
+        partitions: dict[str, list[dict[str, Any]]] = {}
+        for row in rows:
+            partitions.setdefault(row["created_at"].strftime("%Y-%m-%d"), []).append(row)
+
+        schema = _arrow_schema()
+        for day, day_rows in partitions.items():
+            directory = os.path.join(self.root, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pylist(day_rows, schema=schema)
+            filename = f"part-{datetime.now():%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+            pq.write_table(
+                table,
+                os.path.join(directory, filename),
+                compression="zstd",
+                row_group_size=len(day_rows),
+            )
+
+
+_archive: Optional[ArchiveWriter] = None
+_archive_lock = threading.Lock()
+_warned_missing = False
+
+
+def get_archive() -> Optional[ArchiveWriter]:
+    """Return the process-wide archive writer, or None when pyarrow is not installed."""
+    global _archive, _warned_missing
+    if not archive_available():
+        if not _warned_missing:
+            print("pyarrow is not installed, skipping the response archive")
+            _warned_missing = True
+        return None
+
+    with _archive_lock:
+        if _archive is None:
+            _archive = ArchiveWriter()
+            atexit.register(_archive.flush)
+    return _archive
+
+
+def archive_job(record: dict[str, Any]) -> None:
+    """Append one job record (metadata, storyboard and raw response) to the archive."""
+    archive = get_archive()
+    if archive is not None:
+        archive.append(record)
+
+
+def scan_archive(
+    columns: Iterable[str] = ("created_at", "status", "prompt_tokens", "output_tokens", "total_tokens"),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    root: str = ARCHIVE_DIR,
+):
+    """
+    Load selected archive columns into a DataFrame.
+    Only the requested column chunks are read, and partitions outside the
+    optional [start, end] date range (YYYY-MM-DD) are skipped entirely.
+    """
+    if not archive_available():
+        raise ImportError("pyarrow is required to read the archive")
+
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning)
+    condition = None
+    if start is not None:
+        condition = ds.field("date") >= start
+    if end is not None:
+        upper = ds.field("date") <= end
+        condition = upper if condition is None else condition & upper
+
+    return dataset.to_table(columns=list(columns), filter=condition).to_pandas()
+
+
+def archive_generation(
+    job_id: str,
+    log_entry: dict[str, Any],
+    generation_result: dict[str, Any],
+    latency_ms: Optional[float] = None,
+) -> None:
+    """Archive the storyboard stage of a job from its start_video_generation result."""
+    response = generation_result.get("response", {})
+    usage = response.get("usage", {})
+    archive_job({
+        "job_id": job_id,
+        "created_at": log_entry.get("created_at"),
+        "stage": "storyboard",
+        "model": generation_result.get("model"),
+        "status": generation_result.get("status"),
+        "finish_reason": response.get("finish_reason"),
+        "prompt_tokens": usage.get("promptTokenCount"),
+        "output_tokens": usage.get("candidatesTokenCount"),
+        "total_tokens": usage.get("totalTokenCount"),
+        "latency_ms": latency_ms,
+        "error": generation_result.get("error"),
+        "title": log_entry.get("title") or log_entry.get("idea"),
+        "prompt": log_entry.get("prompt"),
+        "storyboard": response.get("text"),
+        "raw_response": response.get("raw") or generation_result.get("details"),
+    })
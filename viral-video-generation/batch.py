@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Any, Iterable, Iterator, Optional
+
+import utils
+from archive import archive_generation, get_archive
+from request_scheduler import set_request_priority
+from utils import get_current_date, json_dumps, json_loads
+from video_gen import start_video_generation
+
+
+# Briefs in flight at once; the request scheduler still caps concurrent Gemini calls
+BATCH_CONCURRENCY = 8
+BATCH_RESULTS_FILE = "batch_results.jsonl"
+
+# What happens to raw API responses: "archive" spills them to the Parquet archive, "drop" discards them
+RAW_MODES = ("archive", "drop")
+
+
+def iter_briefs(path: str) -> Iterator[dict[str, Any]]:
+    """
+    Stream briefs from a JSONL file, one {"prompt": ..., "model"?, "budget_key"?,
+    "job_id"?, "title"?} object per line. Plain-text lines are taken as the prompt.
+    """
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            yield json_loads(line) if line.startswith("{") else {"prompt": line}
+
+
+def _failed_record(job_id: str, error: BaseException) -> dict[str, Any]:
+    """Result record for a brief that raised instead of returning a generation result."""
+    return {
+        "job_id": job_id,
+        "created_at": get_current_date(),
+        "status": "failed",
+        "model": "",
+        "error": f"{type(error).__name__}: {error}",
+        "storyboard": "",
+        "latency_ms": None,
+        "prompt_tokens": None,
+        "output_tokens": None,
+        "total_tokens": None,
+    }
+
+
+def _run_brief(brief: dict[str, Any], raw_mode: str) -> dict[str, Any]:
+    """
+    Generate one storyboard and reduce it to a compact result record.
+    A malformed brief or an unexpected error fails this brief only.
+    """
+    job_id = (brief.get("job_id") if isinstance(brief, dict) else None) or uuid.uuid4().hex
+    try:
+        return _generate_record(brief, raw_mode, job_id)
+    except Exception as e:
+        return _failed_record(job_id, e)
+
+
+def _generate_record(brief: dict[str, Any], raw_mode: str, job_id: str) -> dict[str, Any]:
+    started = time.perf_counter()
+    generation_result = start_video_generation(
+        brief["prompt"],
+        brief.get("model"),
+        budget_key=brief.get("budget_key"),
+        keep_raw=raw_mode == "archive",
+    )
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    created_at = get_current_date()
+    if raw_mode == "archive":
+        archive_generation(
+            job_id,
+            {"created_at": created_at, "title": brief.get("title"), "prompt": brief["prompt"]},
+            generation_result,
+            latency_ms,
+        )
+
+    response = generation_result.get("response", {})
+    usage = response.get("usage", {})
+    return {
+        "job_id": job_id,
+        "created_at": created_at,
+        "status": generation_result.get("status"),
+        "model": generation_result.get("model", ""),
+        "error": generation_result.get("error", ""),
+        "storyboard": response.get("text", ""),
+        "latency_ms": round(latency_ms, 1),
+        "prompt_tokens": usage.get("promptTokenCount"),
+        "output_tokens": usage.get("candidatesTokenCount"),
+        "total_tokens": usage.get("totalTokenCount"),
+    }
+
+
+async def run_batch(
+    briefs: Iterable[dict[str, Any]],
+    output_path: str = BATCH_RESULTS_FILE,
+    concurrency: int = BATCH_CONCURRENCY,
+    raw_mode: str = "archive",
+    priority: str = "backfill",
+    on_progress=None,
+) -> dict[str, int]:
+    """
+    Run storyboard generation over a stream of briefs with bounded memory.
+    At most `concurrency` briefs are in flight; each result is appended to
+    output_path as a JSONL record the moment it completes and nothing else is
+    kept, so memory does not grow with the number of jobs. Raw responses are
+    spilled to the archive or dropped (raw_mode). on_progress(done) is called
+    after every completed job.
+    """
+    if raw_mode not in RAW_MODES:
+        raise ValueError(f"Unknown raw mode '{raw_mode}', expected one of {RAW_MODES}")
+    set_request_priority(priority)
+
+    counts = {"jobs": 0, "completed": 0, "failed": 0}
+    pending: set[asyncio.Task] = set()
+
+    def write_done(done: set[asyncio.Task]) -> None:
+        for task in done:
+            try:
+                record = task.result()
+            except Exception as e:
+                record = _failed_record(uuid.uuid4().hex, e)
+            output.write(json_dumps(record) + b"\n")
+            counts["jobs"] += 1
+            counts["completed" if record["status"] == "completed" else "failed"] += 1
+            if on_progress is not None:
+                on_progress(counts["jobs"])
+        output.flush()
+
+    with open(output_path, "ab") as output:
+        for brief in briefs:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                write_done(done)
+            pending.add(asyncio.create_task(asyncio.to_thread(_run_brief, brief, raw_mode)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write_done(done)
+
+    archive = get_archive() if raw_mode == "archive" else None
+    if archive is not None:
+        archive.flush()
+    return counts
+
+
+def _synthetic_gemini(response_kb: int):
+    """Stand-in for utils._post_gemini that returns a storyboard plus response_kb of raw payload."""
+    padding = "x" * (response_kb * 1024)
+    storyboard = json_dumps({
+        "overview": "Benchmark storyboard",
+        "shots": [
+            {"timestamp": f"{i * 2}s-{i * 2 + 2}s", "visuals": "Storm on the horizon", "camera": "Handheld tracking", "narration": "Line"}
+            for i in range(4)
+        ],
+        "call_to_action": "Follow for more",
+    }).decode("utf-8")
+
+    def post(model: str, api_key: str, payload: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "candidates": [{"content": {"parts": [{"text": storyboard}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 400, "candidatesTokenCount": 120, "totalTokenCount": 520},
+            "debug": padding,
+        }
+
+    return post
+
+
+def benchmark_memory(jobs: int = 2000, response_kb: int = 64, raw_mode: str = "archive", checkpoints: int = 10) -> list[dict[str, float]]:
+    """
+    Run a synthetic batch (no network) in a scratch directory and sample traced
+    Python memory and peak RSS as jobs complete. Flat numbers across the
+    checkpoints mean memory does not grow with the job count.
+    """
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    original_post = utils._post_gemini
+    utils._post_gemini = _synthetic_gemini(response_kb)
+    samples: list[dict[str, float]] = []
+    step = max(1, jobs // checkpoints)
+
+    def sample(done: int) -> None:
+        if done % step == 0 or done == jobs:
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({
+                "jobs": done,
+                "traced_mb": round(current / 2**20, 2),
+                "traced_peak_mb": round(peak / 2**20, 2),
+                "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            })
+
+    briefs = ({"prompt": f"Benchmark brief {i}", "budget_key": "benchmark"} for i in range(jobs))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        tracemalloc.start()
+        try:
+            asyncio.run(run_batch(briefs, raw_mode=raw_mode, on_progress=sample))
+        finally:
+            tracemalloc.stop()
+            os.chdir(cwd)
+            utils._post_gemini = original_post
+    return samples
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Memory-bounded batch storyboard generation")
+    parser.add_argument("briefs", nargs="?", help="JSONL file of briefs (or one prompt per line)")
+    parser.add_argument("--out", default=BATCH_RESULTS_FILE)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--raw", choices=RAW_MODES, default="archive", help="spill raw responses to the archive or drop them")
+    parser.add_argument("--benchmark", type=int, metavar="JOBS", help="run a synthetic memory benchmark instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for sample in benchmark_memory(args.benchmark, raw_mode=args.raw):
+            print(sample)
+        return
+    if not args.briefs:
+        parser.error("a briefs file is required unless --benchmark is given")
+
+    counts = asyncio.run(run_batch(iter_briefs(args.briefs), args.out, args.concurrency, args.raw))
+    print(f"Batch finished: {counts}, results in {args.out}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    main()
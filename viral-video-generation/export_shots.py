@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Iterator, Optional
+
+from storyboard import SHOT_FIELDS, parse_timestamp
+from utils import JOB_LOG, json_dumps, json_loads
+
+
+# Render-ready shot list and the bookkeeping for incremental exports
+SHOTS_EXPORT_FILE = "shots.jsonl"
+EXPORT_STATE_FILE = "export_state.json"
+
+# Viral storyboards are vertical short-form videos
+DEFAULT_ASPECT_RATIO = "9:16"
+
+# Jobs in these states will not change any more
+FINAL_STATUSES = {"completed", "failed"}
+
+# Rows still in flight this long after created_at were abandoned by a crashed run and count as failed
+STALE_AFTER_HOURS = 6
+
+
+def iter_log_rows(path: str, start_row: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Stream (row number, row) pairs from one job log file without loading it whole.
+    Row numbers match the DataFrame index used by log_to_excel. CSV exports of
+    the log are read the same way.
+    """
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as handle:
+            for row_number, row in enumerate(csv.DictReader(handle)):
+                if row_number >= start_row:
+                    yield row_number, row
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+        if header is None:
+            return
+        # Sheet row 1 is the header, so log row n is sheet row n + 2
+        rows = sheet.iter_rows(min_row=start_row + 2, values_only=True)
+        for row_number, values in enumerate(rows, start=start_row):
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def shot_records(row: dict[str, Any], default_aspect_ratio: str = DEFAULT_ASPECT_RATIO) -> Iterator[dict[str, Any]]:
+    """Normalised per-shot records for one completed job; nothing if its storyboard is unusable."""
+    try:
+        storyboard = json_loads(row.get("gemini_output") or "")
+    except ValueError:
+        return
+    shots = storyboard.get("shots") if isinstance(storyboard, dict) else None
+    if not isinstance(shots, list):
+        return
+
+    aspect_ratio = row.get("aspect_ratio") or default_aspect_ratio
+    for index, shot in enumerate(shots):
+        if not isinstance(shot, dict):
+            continue
+        span = parse_timestamp(shot.get("timestamp"))
+        yield {
+            "job_id": row.get("task_id"),
+            "shot_index": index,
+            "start_s": span[0] if span else None,
+            "end_s": span[1] if span else None,
+            **{field: shot.get(field, "") for field in SHOT_FIELDS},
+            "aspect_ratio": aspect_ratio,
+        }
+
+
+def _is_stale(row: dict[str, Any], stale_before: Optional[datetime]) -> bool:
+    """Whether an unfinished row was created before the cutoff; rows without a readable created_at never are."""
+    if stale_before is None:
+        return False
+    created_at = row.get("created_at")
+    if not isinstance(created_at, datetime):
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            return False
+    return created_at < stale_before
+
+
+def _load_state(path: str, legacy_name: str) -> dict[str, Any]:
+    if not os.path.exists(path):
+        return {"partitions": {}}
+    with open(path, "r", encoding="utf-8") as handle:
+        state = json.load(handle)
+    if "partitions" not in state:
+        # State from before the log was partitioned describes the single-file log
+        state = {"partitions": {legacy_name: state}}
+    return state
+
+
+def _save_state(path: str, state: dict[str, Any]) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    os.replace(temp_path, path)
+
+
+def _export_log_file(
+    path: str,
+    state: dict[str, Any],
+    output,
+    counts: dict[str, int],
+    default_aspect_ratio: str,
+    stale_before: Optional[datetime] = None,
+) -> dict[str, Any]:
+    """Export one log file from its resume point; returns its new state."""
+    already_exported = set(state["exported"])
+    resume_row: Optional[int] = None
+    exported_after: list[str] = []
+    next_row = state["resume_row"]
+
+    for row_number, row in iter_log_rows(path, state["resume_row"]):
+        next_row = row_number + 1
+        status = row.get("status")
+        if status not in FINAL_STATUSES and _is_stale(row, stale_before):
+            # Abandoned mid-run: final as far as the export is concerned, so the resume point can move past it
+            counts["abandoned"] += 1
+            status = "failed"
+        if status not in FINAL_STATUSES:
+            # Still running: export it on a later pass once it has finished
+            if resume_row is None:
+                resume_row = row_number
+            continue
+
+        job_id = str(row.get("task_id"))
+        if resume_row is not None:
+            exported_after.append(job_id)
+        if status != "completed" or job_id in already_exported:
+            continue
+
+        counts["jobs"] += 1
+        for record in shot_records(row, default_aspect_ratio):
+            output.write(json_dumps(record) + b"\n")
+            counts["shots"] += 1
+
+    return {
+        "resume_row": next_row if resume_row is None else resume_row,
+        "exported": exported_after if resume_row is not None else [],
+    }
+
+
+def export_shots(
+    log_path: Optional[str] = None,
+    output_path: str = SHOTS_EXPORT_FILE,
+    state_path: Optional[str] = EXPORT_STATE_FILE,
+    default_aspect_ratio: str = DEFAULT_ASPECT_RATIO,
+    stale_after_hours: Optional[float] = STALE_AFTER_HOURS,
+) -> dict[str, int]:
+    """
+    Append one JSONL record per shot of every completed job not exported yet.
+    Rows stream from the log straight to the output file, so memory stays flat
+    whatever the history size. Without log_path every partition of the job log
+    is exported; a log_path exports just that xlsx/csv file.
+    Per log file the state remembers the first row that was still in flight
+    (everything before it is final and exported) plus the jobs exported after
+    it. Sealed partitions are marked done after one pass and never reopened.
+    Rows still in flight stale_after_hours after created_at are treated as
+    failed so one crashed job cannot pin the resume point forever (None
+    waits for them indefinitely).
+    With state_path=None everything is exported and output_path is overwritten.
+    """
+    partitions = JOB_LOG.partitions()
+    if log_path is None:
+        sources = [(partition["file"], partition["path"], partition["sealed"]) for partition in partitions]
+        legacy_name = next((partition["file"] for partition in partitions if partition["period"] == "legacy"), "")
+    else:
+        sources = [(log_path, log_path, False)]
+        legacy_name = log_path
+    state = _load_state(state_path, legacy_name) if state_path else {"partitions": {}}
+    counts = {"jobs": 0, "shots": 0, "abandoned": 0}
+    stale_before = datetime.now() - timedelta(hours=stale_after_hours) if stale_after_hours is not None else None
+
+    with open(output_path, "ab" if state_path else "wb") as output:
+        for name, path, sealed in sources:
+            partition_state = state["partitions"].get(name, {"resume_row": 0, "exported": []})
+            if partition_state.get("done"):
+                continue
+            partition_state = _export_log_file(path, partition_state, output, counts, default_aspect_ratio, stale_before)
+            # Nothing changes in a sealed partition after this pass
+            partition_state["done"] = sealed
+            state["partitions"][name] = partition_state
+
+    if state_path:
+        _save_state(state_path, state)
+    return counts
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export completed storyboards as a JSONL shot list")
+    parser.add_argument("--log", help="a single xlsx log file or csv export (default: every job log partition)")
+    parser.add_argument("--out", default=SHOTS_EXPORT_FILE)
+    parser.add_argument("--state", default=EXPORT_STATE_FILE, help="incremental export bookkeeping")
+    parser.add_argument("--full", action="store_true", help="rewrite the export from the whole log")
+    parser.add_argument("--aspect-ratio", default=DEFAULT_ASPECT_RATIO, help="aspect ratio written on every shot")
+    parser.add_argument(
+        "--stale-hours", type=float, default=STALE_AFTER_HOURS, help="treat jobs still in flight after this many hours as failed"
+    )
+    args = parser.parse_args(argv)
+
+    if args.full:
+        # Forget what was exported and start the shot list over
+        for path in (args.state, args.out):
+            if os.path.exists(path):
+                os.remove(path)
+    counts = export_shots(args.log, args.out, args.state, args.aspect_ratio, args.stale_hours)
+    print(f"Exported {counts['shots']} shots from {counts['jobs']} new jobs to {args.out}")
+    if counts["abandoned"]:
+        print(f"Skipped {counts['abandoned']} jobs still in flight after {args.stale_hours:g} hours")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import base64
+import json
+import os
+import re
+import zlib
+from array import array
+from datetime import datetime
+from typing import Optional
+
+
+# Append-only file holding every idea we have already produced
+IDEA_INDEX_FILE = "idea_index.jsonl"
+
+# Estimated Jaccard similarity above which two ideas count as duplicates
+IDEA_SIMILARITY_THRESHOLD = 0.8
+
+# 64 permutations split into 8 bands of 8 rows puts the LSH "S-curve"
+# midpoint at ~0.77, just under the duplicate threshold above.
+NUM_PERM = 64
+NUM_BANDS = 8
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _permutations(seed: int = 1) -> list[tuple[int, int]]:
+    """Deterministic (a, b) pairs for the universal hash family."""
+    state = seed
+    pairs = []
+    for _ in range(NUM_PERM):
+        # Small LCG so signatures are stable across processes and Python versions
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        a = (state >> 3) % _MERSENNE_PRIME or 1
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        b = (state >> 3) % _MERSENNE_PRIME
+        pairs.append((a, b))
+    return pairs
+
+
+_PERMUTATIONS = _permutations()
+
+
+def _shingles(text: str) -> set[int]:
+    """Hash word unigrams and bigrams of the normalised text."""
+    words = _WORD_RE.findall(text.lower())
+    grams = set(words)
+    grams.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+def minhash_signature(text: str) -> array:
+    """Compute the MinHash signature of a piece of text."""
+    hashes = _shingles(text)
+    if not hashes:
+        return array("I", [_MAX_HASH] * NUM_PERM)
+
+    return array(
+        "I",
+        [
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+            for a, b in _PERMUTATIONS
+        ],
+    )
+
+
+def estimate_similarity(first: array, second: array) -> float:
+    """Estimate the Jaccard similarity of two signatures."""
+    matches = sum(1 for x, y in zip(first, second) if x == y)
+    return matches / NUM_PERM
+
+
+def idea_text(idea: str, environment: str) -> str:
+    """Text used to fingerprint an Idea/Environment pair."""
+    return f"{idea} {environment}"
+
+
+class IdeaIndex:
+    """
+    Persistent MinHash/LSH index over previously generated ideas.
+    Signatures are bucketed per band so a lookup only compares against
+    the handful of stored ideas that share at least one band.
+    """
+
+    def __init__(self, path: Optional[str] = IDEA_INDEX_FILE, threshold: float = IDEA_SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._signatures: list[array] = []
+        self._texts: list[str] = []
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(NUM_BANDS)]
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _bands(self, signature: array) -> list[bytes]:
+        return [
+            signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+            for band in range(NUM_BANDS)
+        ]
+
+    def _insert(self, text: str, signature: array) -> None:
+        entry_id = len(self._signatures)
+        self._signatures.append(signature)
+        self._texts.append(text)
+        for bucket, key in zip(self._buckets, self._bands(signature)):
+            bucket.setdefault(key, []).append(entry_id)
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                signature = array("I")
+                signature.frombytes(base64.b64decode(record["sig"]))
+                if len(signature) != NUM_PERM:
+                    continue
+                self._insert(record["text"], signature)
+
+    def find_similar(self, text: str, signature: Optional[array] = None) -> Optional[tuple[str, float]]:
+        """
+        Return the most similar stored idea and its estimated similarity,
+        or None if nothing crosses the duplicate threshold.
+        """
+        if signature is None:
+            signature = minhash_signature(text)
+
+        candidates: set[int] = set()
+        for bucket, key in zip(self._buckets, self._bands(signature)):
+            candidates.update(bucket.get(key, ()))
+
+        best = None
+        for entry_id in candidates:
+            score = estimate_similarity(signature, self._signatures[entry_id])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (self._texts[entry_id], score)
+        return best
+
+    def is_duplicate(self, text: str) -> bool:
+        return self.find_similar(text) is not None
+
+    def add(self, text: str, signature: Optional[array] = None) -> None:
+        """Add an idea to the index and append it to the backing file."""
+        if signature is None:
+            signature = minhash_signature(text)
+        self._insert(text, signature)
+
+        if not self.path:
+            return
+        record = {
+            "text": text,
+            "sig": base64.b64encode(signature.tobytes()).decode("ascii"),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        }
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
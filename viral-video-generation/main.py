@@ -1,10 +1,28 @@
-import os
+import time
+import uuid
 import asyncio
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from video_gen import start_video_generation
-from utils import log_to_excel, ainvoke_llm, get_current_date
+from utils import (
+    log_to_excel_async, ainvoke_llm, get_current_date, generation_log_fields,
+    last_call_info, parse_failure_stats, router_stats, coalescing_stats, key_pool_stats,
+    scheduler_stats, token_estimate_stats, cassette_stats, job_log_stats, get_api_key
+)
 from prompts import GENERATE_IDEAS_PROMPT, GENERATE_VIDEO_SCRIPT_PROMPT
+from idea_index import IdeaIndex, idea_text, minhash_signature
+from archive import archive_generation
+from storyboard import repair_stats
+from request_scheduler import DEFAULT_PRIORITY, set_request_priority
+from tracing import span, trace_run
+
+
+# How many extra idea calls to make when duplicates were dropped
+MAX_IDEA_REGENERATIONS = 2
+
+# Models used for the idea and prompt stages
+IDEAS_MODEL = "gemini-1.5-flash"
+PROMPT_MODEL = "gemini-1.5-pro"
 
 
 # Models for structured outputs
@@ -16,17 +34,22 @@ class IdeaItem(BaseModel):
 class IdeasList(BaseModel):
     ideas: list[IdeaItem]
 
-async def generate_video_ideas(topic: str, count: int = 1):
+async def generate_video_ideas(topic: str, count: int = 1, avoid: list[str] | None = None):
     """
     Generate a creative idea for video content based on the given topic.
     Similar to the Ideas AI Agent in N8N workflow.
+    avoid lists ideas already rejected as duplicates, so a regeneration asks for something new.
     """
     print(f"Generating ideas for topic: '{topic}'...")
     user_message = f"Generate {count} creative video ideas about: {topic}"
+    if avoid:
+        user_message += "\nThese ideas were already used; suggest clearly different ones:\n" + "\n".join(
+            f"- {idea}" for idea in avoid
+        )
     
     # Use the AI invocation function with structured output
     result = await ainvoke_llm(
-        model="gemini-1.5-flash",
+        model=IDEAS_MODEL,
         system_prompt=GENERATE_IDEAS_PROMPT,
         user_message=user_message,
         response_format=IdeasList,
@@ -35,6 +58,42 @@ async def generate_video_ideas(topic: str, count: int = 1):
     return result.ideas
 
 
+async def generate_unique_video_ideas(topic: str, count: int = 1, index: IdeaIndex | None = None):
+    """
+    Generate ideas and drop near-duplicates of ideas produced by earlier runs
+    (or earlier in this batch) before any prompt/storyboard calls are made.
+    Dropped ideas are regenerated up to MAX_IDEA_REGENERATIONS times, with the
+    rejected ideas named in the request. Nothing is added to the index here:
+    the workflow commits each idea once its storyboard is done.
+    """
+    if index is None:
+        index = IdeaIndex()
+    # Ideas accepted in this batch, held in memory only until their jobs complete
+    pending = IdeaIndex(path=None, threshold=index.threshold)
+
+    unique_ideas = []
+    rejected: list[str] = []
+    attempts = 0
+    while len(unique_ideas) < count and attempts <= MAX_IDEA_REGENERATIONS:
+        missing = count - len(unique_ideas)
+        for idea in await generate_video_ideas(topic, missing, rejected):
+            text = idea_text(idea.Idea, idea.Environment)
+            signature = minhash_signature(text)
+            match = index.find_similar(text, signature) or pending.find_similar(text, signature)
+            if match is not None:
+                print(f"Skipping duplicate idea ({match[1]:.0%} similar): '{idea.Idea}'")
+                rejected.append(idea.Idea)
+                continue
+
+            pending.add(text, signature)
+            unique_ideas.append(idea)
+            if len(unique_ideas) == count:
+                break
+        attempts += 1
+
+    return unique_ideas
+
+
 async def generate_veo3_video_prompt(idea: str, environment: str):
     """
     Generate a V3-compatible prompt based on the idea and environment.
@@ -49,7 +108,7 @@ async def generate_veo3_video_prompt(idea: str, environment: str):
     
     # Use the AI invocation function
     result = await ainvoke_llm(
-        model="gemini-1.5-pro",
+        model=PROMPT_MODEL,
         system_prompt=GENERATE_VIDEO_SCRIPT_PROMPT,
         user_message=user_message,
         temperature=0.7
@@ -57,19 +116,37 @@ async def generate_veo3_video_prompt(idea: str, environment: str):
     return result
 
 
-async def run_workflow(topic: str, count: int = 1):
+async def run_workflow(topic: str, count: int = 1, priority: str = DEFAULT_PRIORITY, index: IdeaIndex | None = None):
     """
     Run the complete workflow from idea generation to storyboard creation.
+    priority is the scheduler class (interactive, scheduled or backfill) for its Gemini calls.
+    index is the idea index to dedupe against; long-lived callers pass one so it is loaded once.
+    Returns the number of storyboards completed; errors are logged, not raised.
+    Set PIPELINE_TRACE_DIR to get a span trace of the run (see tracing.py).
     """
+    with trace_run("run_workflow", topic=topic, count=count, priority=priority):
+        return await _run_workflow(topic, count, priority, index if index is not None else IdeaIndex())
+
+
+async def _run_workflow(topic: str, count: int, priority: str, index: IdeaIndex):
+    set_request_priority(priority)
+    completed = 0
     try:
-        # Step 1: Generate idea
-        ideas = await generate_video_ideas(topic, count)
+        # Step 1: Generate ideas, skipping ones we already produced in past runs
+        started = time.perf_counter()
+        with span("stage.ideas", count=count) as attrs:
+            ideas = await generate_unique_video_ideas(topic, count, index)
+            attrs['ideas'] = len(ideas)
+        ideas_latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        ideas_model = last_call_info().get('model', IDEAS_MODEL)
         print(f"Generated ideas:\n\n{ideas}")
         
         # Process each idea sequentially for simplicity - can be upgraded to parallel processing for better efficiency later
         for idea in ideas:
             # Create a log entry for excel
+            job_id = uuid.uuid4().hex
             log_entry = {
+                'task_id': job_id,
                 'idea': idea.Idea,
                 'caption': idea.Caption,
                 'environment': idea.Environment,
@@ -78,25 +155,40 @@ async def run_workflow(topic: str, count: int = 1):
                 'created_at': get_current_date(),
                 'video_url': "",
                 'gemini_output': "",
-                'error': ""
+                'error': "",
+                'ideas_model': ideas_model,
+                'ideas_latency_ms': ideas_latency_ms
             }
         
             # Step 2: Generate V3 prompt
-            prompt = await generate_veo3_video_prompt(idea.Idea, idea.Environment)
+            started = time.perf_counter()
+            with span("stage.prompt"):
+                prompt = await generate_veo3_video_prompt(idea.Idea, idea.Environment)
             log_entry['prompt'] = prompt
+            # The router may have served the prompt stage from a fallback model
+            log_entry['prompt_model'] = last_call_info().get('model', PROMPT_MODEL)
+            log_entry['prompt_latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
             
             # Log the initial entry and get the row index
-            row_index = log_to_excel(log_entry)
-            print(f"Log entry created with index: {row_index}")
+            row_index = await log_to_excel_async(log_entry)
+            print(f"Log entry created: {row_index.partition} row {row_index.index}")
             
             # Step 3: Submit to Gemini for storyboard generation
-            generation_result = start_video_generation(prompt)
+            started = time.perf_counter()
+            with span("stage.storyboard"):
+                generation_result = await asyncio.to_thread(start_video_generation, prompt)
+            latency_ms = (time.perf_counter() - started) * 1000
+            log_entry.update(generation_log_fields(generation_result, latency_ms))
+
+            # Keep the full raw response and storyboard in the columnar archive
+            with span("archive.write"):
+                await asyncio.to_thread(archive_generation, job_id, log_entry, generation_result, latency_ms)
 
             if generation_result.get("status") != "completed":
                 log_entry['status'] = "failed"
                 log_entry['error'] = generation_result.get("error", "Unknown error")
-                log_to_excel(log_entry, row_index)
-                return None
+                await log_to_excel_async(log_entry, row_index)
+                return completed
 
             storyboard_text = generation_result.get("response", {}).get("text", "")
             log_entry['status'] = "completed"
@@ -104,14 +196,18 @@ async def run_workflow(topic: str, count: int = 1):
             print(f"Gemini output generated (truncated): {storyboard_text[:120]}...")
             
             # Step 4: Update the Excel log with final results
-            log_to_excel(log_entry, row_index)
+            await log_to_excel_async(log_entry, row_index)
+
+            # Only finished ideas count as used, so a failed one can come up again
+            index.add(idea_text(idea.Idea, idea.Environment))
+            completed += 1
     except Exception as e:
         print(f"Error in workflow: {str(e)}")
-        return None
+    return completed
 
 
 async def main():
-    # You can configure this to run on a schedule
+    # For recurring runs use the scheduler daemon: python topic_scheduler.py
     topic = "meteorologist woman chasing tornado live on air"  # Example topic
     
     # Number of ideas/storyboards to generate
@@ -119,18 +215,23 @@ async def main():
     
     # Run main function
     await run_workflow(topic, count)
+    print(f"Structured output parse stats: {parse_failure_stats()}")
+    print(f"Model router stats: {router_stats()}")
+    print(f"Request coalescing stats: {coalescing_stats()}")
+    print(f"API key pool stats: {key_pool_stats()}")
+    print(f"Request scheduler stats: {scheduler_stats()}")
+    print(f"Input token estimates: {token_estimate_stats()}")
+    print(f"Storyboard shot repair stats: {repair_stats()}")
+    print(f"Gemini cassette stats: {cassette_stats()}")
+    print(f"Job log partitions: {job_log_stats()}")
     
 
 if __name__ == "__main__":
     # Load environment variables from .env file
     load_dotenv()
     
-    # Check if Gemini API key environment variable is set
-    if not (
-        os.environ.get("GEMINI_API_KEY")
-        or os.environ.get("KIE_API_TOKEN")
-        or os.environ.get("KIE_API_KEY")
-    ):
+    # Check if Gemini API key environment variable is set (not needed when replaying a cassette)
+    if not get_api_key():
         print("Warning: GEMINI_API_KEY (or legacy KIE_API_TOKEN) environment variable not set")
         raise ValueError("GEMINI_API_KEY environment variable not set")
     
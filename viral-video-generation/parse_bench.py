@@ -0,0 +1,115 @@
+import argparse
+import json
+import time
+from typing import Any, Callable, Optional, Type
+
+from utils import _parse_structured, _strip_code_fence
+
+try:
+    import orjson
+except ImportError:  # Optional fast JSON backend, timed only when installed
+    orjson = None
+
+
+# Storyboard sizes (shots) timed by default, and the runs per timing; the best run is reported
+BENCH_SHOT_COUNTS = (50, 500, 5000)
+BENCH_REPEATS = 5
+
+
+def _benchmark_storyboard(shots: int) -> str:
+    """A fenced, pretty-printed storyboard reply of the given length, as prose-mode replies arrive."""
+    storyboard = {
+        "overview": "A benchmark storyboard overview. " * 20,
+        "shots": [
+            {
+                "timestamp": f"{i * 2}s-{i * 2 + 2}s",
+                "visuals": "Close-up on a glass bottle turning on a marble counter, soft rim light. " * 3,
+                "camera": "Slow dolly in, shallow depth of field",
+                "narration": "A short line of narration for this shot. " * 2,
+            }
+            for i in range(shots)
+        ],
+        "call_to_action": "Shop now",
+    }
+    return "```json\n" + json.dumps(storyboard, indent=2, ensure_ascii=False) + "\n```"
+
+
+def _legacy_parse_structured(raw_text: str, response_format: Type[Any]):
+    """The parse path before the single-decode change: line split fence strip, stdlib decode, pydantic re-parse."""
+    lines = raw_text.strip().splitlines()
+    if lines and lines[0].startswith("```"):
+        lines = lines[1:]
+    if lines and lines[-1].startswith("```"):
+        lines = lines[:-1]
+    cleaned = "\n".join(lines).strip()
+    payload = json.loads(cleaned)
+    if hasattr(response_format, "model_validate_json"):
+        return response_format.model_validate_json(cleaned)
+    return response_format(**payload)
+
+
+def _response_formats() -> list[tuple[str, Any]]:
+    formats: list[tuple[str, Any]] = [("dict", dict)]
+    try:
+        from pydantic import BaseModel
+    except ImportError:
+        return formats
+
+    class _Shot(BaseModel):
+        timestamp: str
+        visuals: str
+        camera: str
+        narration: str
+
+    class _Storyboard(BaseModel):
+        overview: str
+        shots: list[_Shot]
+        call_to_action: str
+
+    formats.append(("pydantic", _Storyboard))
+    return formats
+
+
+def benchmark_parsing(shot_counts: tuple[int, ...] = BENCH_SHOT_COUNTS, repeats: int = BENCH_REPEATS) -> list[dict[str, Any]]:
+    """
+    Time structured-output parsing of large storyboard replies (no network):
+    the previous parse path against the current one with the stdlib and,
+    when installed, the orjson decoder. Pydantic validation is included when
+    pydantic is importable. Times are the best of `repeats` runs, in ms.
+    """
+    parsers: list[tuple[str, Callable[[str], Any]]] = [("after_stdlib_ms", json.loads)]
+    if orjson is not None:
+        parsers.append(("after_orjson_ms", orjson.loads))
+
+    def best_ms(parse) -> float:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            parse()
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(min(timings), 2)
+
+    rows = []
+    for shots in shot_counts:
+        raw_text = _benchmark_storyboard(shots)
+        for format_name, response_format in _response_formats():
+            row: dict[str, Any] = {"shots": shots, "kb": round(len(raw_text.encode("utf-8")) / 1024), "format": format_name}
+            row["before_ms"] = best_ms(lambda: _legacy_parse_structured(raw_text, response_format))
+            for column, loads in parsers:
+                row[column] = best_ms(lambda: _parse_structured(_strip_code_fence(raw_text), response_format, "benchmark", loads))
+            rows.append(row)
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Structured-output parse benchmark on large storyboards")
+    parser.add_argument("--shots", type=int, nargs="+", default=list(BENCH_SHOT_COUNTS))
+    parser.add_argument("--repeats", type=int, default=BENCH_REPEATS)
+    args = parser.parse_args(argv)
+
+    for row in benchmark_parsing(tuple(args.shots), args.repeats):
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
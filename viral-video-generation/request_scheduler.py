@@ -0,0 +1,332 @@
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator, Optional
+
+from job_log import DEFAULT_JOB_LOG_DIR, JOB_LOG_DIR_ENV
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Share of capacity each class gets when all of them are backlogged
+PRIORITY_WEIGHTS = {
+    "interactive": 8,
+    "scheduled": 3,
+    "backfill": 1,
+}
+DEFAULT_PRIORITY = "scheduled"
+
+# Gemini requests allowed in flight at once for this process
+MAX_CONCURRENT_REQUESTS = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+
+# Set to share one in-flight cap (and priority order) between every process on this host
+HOST_CONCURRENCY_ENV = "GEMINI_HOST_CONCURRENCY"
+# Slot and waiter lock files; defaults to <job log dir>/scheduler, next to the job log lock
+SCHEDULER_DIR_ENV = "GEMINI_SCHEDULER_DIR"
+HOST_POLL_SECONDS = 0.02
+
+# Estimated tokens (input + max output) allowed per minute; unset means no cap
+TOKENS_PER_MINUTE_ENV = "GEMINI_TPM"
+WINDOW_SECONDS = 60
+
+# Recent queue waits kept per class for the stats
+WAIT_HISTORY = 200
+
+_request_priority: contextvars.ContextVar[str] = contextvars.ContextVar("request_priority", default=DEFAULT_PRIORITY)
+
+
+def set_request_priority(priority: str) -> contextvars.Token:
+    """
+    Set the priority class for Gemini calls made from the current context.
+    asyncio tasks and asyncio.to_thread copy the context, so setting it at the
+    top of a workflow covers every call the workflow makes.
+    """
+    if priority not in PRIORITY_WEIGHTS:
+        raise ValueError(f"Unknown priority '{priority}', expected one of {sorted(PRIORITY_WEIGHTS)}")
+    return _request_priority.set(priority)
+
+
+def current_priority() -> str:
+    return _request_priority.get()
+
+
+def _try_lock(handle) -> bool:
+    """Take an exclusive lock on an open file without blocking; False if another handle holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(handle) -> None:
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class HostSlots:
+    """
+    Host-wide cap on in-flight Gemini requests shared by every process
+    (Streamlit, batch runs, the topic scheduler) through locked slot files.
+    A request waiting for a slot holds a waiter file named after its
+    priority class and arrival time. A free slot goes to the highest waiting
+    class, first come first served within a class, so a batch process yields
+    to interactive requests elsewhere on the host and cannot starve another
+    process by grabbing freed slots straight back. Files of crashed
+    processes are no longer locked and are ignored.
+    """
+
+    def __init__(self, directory: str, slots: int, weights: Optional[dict[str, int]] = None):
+        self.directory = directory
+        self.slots = max(1, slots)
+        self.weights = PRIORITY_WEIGHTS if weights is None else weights
+
+    def _outranked(self, priority: str, arrived: int, own_name: str) -> bool:
+        """Whether a live waiter of a higher class, or of the same class that arrived earlier, exists."""
+        weight = self.weights[priority]
+        for name in os.listdir(self.directory):
+            if not name.startswith("waiting-") or not name.endswith(".lock") or name == own_name:
+                continue
+            _, other, other_arrived, _ = name.split("-", 3)
+            other_weight = self.weights.get(other, 0)
+            if other_weight < weight or (other_weight == weight and int(other_arrived) >= arrived):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r") as handle:
+                    if not _try_lock(handle):
+                        return True
+                    _unlock(handle)
+            except OSError:
+                continue
+            # Left behind by a process that died while waiting
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return False
+
+    def _try_slot(self):
+        for index in range(self.slots):
+            handle = open(os.path.join(self.directory, f"slot-{index}.lock"), "a+")
+            if _try_lock(handle):
+                return handle
+            handle.close()
+        return None
+
+    @contextmanager
+    def slot(self, priority: str) -> Iterator[None]:
+        """Hold one of the host's slots for the with-block."""
+        os.makedirs(self.directory, exist_ok=True)
+        arrived = time.time_ns()
+        name = f"waiting-{priority}-{arrived}-{os.getpid()}.{threading.get_ident()}.lock"
+        path = os.path.join(self.directory, name)
+        # Lock before the file gets its visible name so nobody mistakes it for a stale waiter
+        waiter = open(f"{path}.tmp", "a+")
+        _try_lock(waiter)
+        os.replace(f"{path}.tmp", path)
+        try:
+            while True:
+                if not self._outranked(priority, arrived, name):
+                    held = self._try_slot()
+                    if held is not None:
+                        break
+                time.sleep(HOST_POLL_SECONDS)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            _unlock(waiter)
+            waiter.close()
+        try:
+            yield
+        finally:
+            _unlock(held)
+            held.close()
+
+
+class _Grant:
+    """Token usage booked for a scheduled request; set tokens to the actual usage once known."""
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+
+
+class RequestScheduler:
+    """
+    Weighted fair queue in front of the Gemini client.
+    Each request gets a virtual finish tag of start + cost / weight; when a slot
+    frees up the request with the smallest tag goes next. Interactive requests
+    therefore jump ahead of a batch backlog while batch classes still soak up
+    any capacity interactive traffic leaves unused.
+    With a tokens-per-minute cap the head of the queue also waits until the
+    last minute's booked tokens leave room for its estimate.
+    The queue and the token cap are per process; pass host_slots to also
+    share an in-flight cap and priority order with other processes.
+    """
+
+    def __init__(
+        self,
+        slots: int = MAX_CONCURRENT_REQUESTS,
+        weights: Optional[dict[str, int]] = None,
+        tokens_per_minute: Optional[int] = None,
+        host_slots: Optional[HostSlots] = None,
+    ):
+        self.slots = max(1, slots)
+        self.weights = PRIORITY_WEIGHTS if weights is None else weights
+        self.tokens_per_minute = tokens_per_minute
+        self.host_slots = host_slots
+        # [second, tokens] buckets for the last minute, so bookkeeping stays bounded at any request rate
+        self._token_buckets: deque = deque()
+        self._cond = threading.Condition()
+        self._queue: list[tuple[float, int, float, object]] = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_finish = {priority: 0.0 for priority in self.weights}
+        self._waits = {priority: deque(maxlen=WAIT_HISTORY) for priority in self.weights}
+        self._served = {priority: 0 for priority in self.weights}
+
+    def _prune_buckets(self, now: float) -> None:
+        while self._token_buckets and now - self._token_buckets[0][0] >= WINDOW_SECONDS:
+            self._token_buckets.popleft()
+
+    def _tokens_in_window(self, now: float) -> int:
+        self._prune_buckets(now)
+        return sum(tokens for _, tokens in self._token_buckets)
+
+    def _book_tokens(self, tokens: int) -> list:
+        now = time.monotonic()
+        self._prune_buckets(now)
+        second = float(int(now))
+        if self._token_buckets and self._token_buckets[-1][0] == second:
+            bucket = self._token_buckets[-1]
+        else:
+            bucket = [second, 0]
+            self._token_buckets.append(bucket)
+        bucket[1] += tokens
+        return bucket
+
+    def _token_wait(self, tokens: int) -> float:
+        """Seconds until tokens fit in the per-minute budget (0 when they fit now)."""
+        if self.tokens_per_minute is None or not tokens:
+            return 0.0
+        now = time.monotonic()
+        used = self._tokens_in_window(now)
+        # A single request larger than the whole budget still goes once the window is empty
+        if not self._token_buckets or used + tokens <= self.tokens_per_minute:
+            return 0.0
+        return max(0.05, WINDOW_SECONDS - (now - self._token_buckets[0][0]))
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, cost: float = 1.0, tokens: int = 0) -> Iterator[_Grant]:
+        """
+        Block until the request is scheduled, then hold a slot for the with-block.
+        tokens is the request's estimated token usage for the per-minute budget;
+        update the yielded grant's tokens once the real usage is known.
+        """
+        priority = priority or current_priority()
+        weight = self.weights[priority]
+        ticket = object()
+        queued_at = time.perf_counter()
+
+        with self._cond:
+            start = max(self._virtual_time, self._last_finish[priority])
+            finish = start + max(cost, 0.0) / weight
+            self._last_finish[priority] = finish
+            heapq.heappush(self._queue, (finish, next(self._sequence), start, ticket))
+
+            try:
+                while True:
+                    if self._active >= self.slots or self._queue[0][3] is not ticket:
+                        self._cond.wait()
+                        continue
+                    token_wait = self._token_wait(tokens)
+                    if not token_wait:
+                        break
+                    self._cond.wait(token_wait)
+            except BaseException:
+                # Interrupted while queued: drop the ticket so it can't block the queue
+                self._queue = [entry for entry in self._queue if entry[3] is not ticket]
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            _, _, start, _ = heapq.heappop(self._queue)
+            self._virtual_time = max(self._virtual_time, start)
+            self._active += 1
+            self._served[priority] += 1
+            self._waits[priority].append((time.perf_counter() - queued_at) * 1000)
+            bucket = self._book_tokens(tokens)
+            grant = _Grant(tokens)
+            # The next request in line may also fit in a free slot
+            self._cond.notify_all()
+
+        try:
+            with self.host_slots.slot(priority) if self.host_slots is not None else nullcontext():
+                yield grant
+        finally:
+            with self._cond:
+                # Swap the estimate for the actual usage the caller reported
+                bucket[1] += grant.tokens - tokens
+                self._active -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth plus requests served and wait percentiles (ms) per priority class."""
+        with self._cond:
+            classes = {}
+            for priority, waits in self._waits.items():
+                ordered = sorted(waits)
+                classes[priority] = {
+                    "served": self._served[priority],
+                    "wait_p50_ms": _wait_percentile(ordered, 0.5),
+                    "wait_p95_ms": _wait_percentile(ordered, 0.95),
+                }
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "tokens_last_minute": self._tokens_in_window(time.monotonic()),
+                "tokens_per_minute": self.tokens_per_minute,
+                "host_slots": self.host_slots.slots if self.host_slots is not None else None,
+                "classes": classes,
+            }
+
+
+def _wait_percentile(ordered: list[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+def _configured_tpm() -> Optional[int]:
+    value = os.getenv(TOKENS_PER_MINUTE_ENV)
+    return int(value) if value else None
+
+
+def _configured_host_slots() -> Optional[HostSlots]:
+    value = os.getenv(HOST_CONCURRENCY_ENV)
+    if not value:
+        return None
+    directory = os.getenv(SCHEDULER_DIR_ENV) or os.path.join(os.getenv(JOB_LOG_DIR_ENV, DEFAULT_JOB_LOG_DIR), "scheduler")
+    return HostSlots(directory, int(value))
+
+
+REQUEST_SCHEDULER = RequestScheduler(tokens_per_minute=_configured_tpm(), host_slots=_configured_host_slots())
@@ -0,0 +1,111 @@
+import json
+import os
+import re
+import threading
+from typing import Any, Iterator, Optional
+
+
+# Requests estimated above these sizes are logged / refused before they are sent
+INPUT_TOKENS_WARN = int(os.getenv("GEMINI_INPUT_TOKENS_WARN", "8000"))
+INPUT_TOKENS_LIMIT = int(os.getenv("GEMINI_INPUT_TOKENS_LIMIT", "32000"))
+
+# Words longer than this are counted as several sub-word tokens
+CHARS_PER_WORD_TOKEN = 6
+# Weight of each new usageMetadata sample in the calibration ratio
+CALIBRATION_SMOOTHING = 0.2
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class PayloadTooLargeError(ValueError):
+    """Raised when a request is estimated to exceed INPUT_TOKENS_LIMIT."""
+
+    # Another model or key would get the same oversized request
+    retryable = False
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    Uncalibrated token count: one token per punctuation mark and short word,
+    plus one per CHARS_PER_WORD_TOKEN characters of longer words.
+    """
+    return sum(1 + (len(piece) - 1) // CHARS_PER_WORD_TOKEN for piece in _PIECE_RE.findall(text))
+
+
+def _payload_texts(payload: dict[str, Any]) -> Iterator[str]:
+    for part in payload.get("systemInstruction", {}).get("parts", []):
+        yield part.get("text", "")
+    for content in payload.get("contents", []):
+        for part in content.get("parts", []):
+            yield part.get("text", "")
+    schema = payload.get("generationConfig", {}).get("responseSchema")
+    if schema:
+        yield json.dumps(schema)
+
+
+class TokenEstimator:
+    """
+    Offline input token estimator. The raw text heuristic is scaled by a ratio
+    learnt from the promptTokenCount Gemini reports back, so estimates track
+    the real tokenizer without any countTokens calls.
+    """
+
+    def __init__(self):
+        self.ratio = 1.0
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._by_label: dict[str, dict[str, int]] = {}
+
+    def raw_payload_tokens(self, payload: dict[str, Any]) -> int:
+        return sum(estimate_text_tokens(text) for text in _payload_texts(payload))
+
+    def estimate(self, raw_tokens: int) -> int:
+        return int(raw_tokens * self.ratio)
+
+    def estimate_payload(self, payload: dict[str, Any]) -> int:
+        """Calibrated estimate of the input tokens a request payload carries."""
+        return self.estimate(self.raw_payload_tokens(payload))
+
+    def calibrate(self, raw_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Fold a (raw estimate, promptTokenCount) pair into the calibration ratio."""
+        if not raw_tokens or not actual_tokens:
+            return
+        observed = actual_tokens / raw_tokens
+        with self._lock:
+            if self.samples == 0:
+                self.ratio = observed
+            else:
+                self.ratio += CALIBRATION_SMOOTHING * (observed - self.ratio)
+            self.samples += 1
+
+    def preflight(self, payload: dict[str, Any], label: Optional[str] = None) -> int:
+        """
+        Estimate a payload before it is sent, warning above INPUT_TOKENS_WARN and
+        raising PayloadTooLargeError above INPUT_TOKENS_LIMIT. Returns the estimate.
+        """
+        tokens = self.estimate_payload(payload)
+        with self._lock:
+            stats = self._by_label.setdefault(label or "unlabelled", {"requests": 0, "last": 0, "max": 0})
+            stats["requests"] += 1
+            stats["last"] = tokens
+            stats["max"] = max(stats["max"], tokens)
+
+        if tokens > INPUT_TOKENS_LIMIT:
+            raise PayloadTooLargeError(
+                f"Request for {label or 'Gemini'} is ~{tokens} input tokens, over the {INPUT_TOKENS_LIMIT} token limit"
+            )
+        if tokens > INPUT_TOKENS_WARN:
+            print(f"Warning: request for {label or 'Gemini'} is ~{tokens} input tokens (warning threshold {INPUT_TOKENS_WARN})")
+        return tokens
+
+    def stats(self) -> dict[str, Any]:
+        """Calibration state and estimated input tokens per label (template/stage)."""
+        with self._lock:
+            return {
+                "ratio": round(self.ratio, 3),
+                "samples": self.samples,
+                "by_label": {label: dict(stats) for label, stats in self._by_label.items()},
+            }
+
+
+TOKEN_ESTIMATOR = TokenEstimator()
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+from idea_index import IdeaIndex
+from main import run_workflow
+from request_scheduler import PRIORITY_WEIGHTS
+from utils import key_pool_stats, router_stats, scheduler_stats
+
+
+# Schedule definitions and the state persisted between daemon restarts
+SCHEDULES_FILE = "schedules.json"
+SCHEDULER_STATE_FILE = "scheduler_state.json"
+
+# (name, lowest value, highest value) of the five cron fields
+CRON_FIELDS = [
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 6),
+]
+
+
+def _parse_cron_field(spec: str, low: int, high: int) -> set[int]:
+    values = set()
+    for part in spec.split(","):
+        base, _, step = part.partition("/")
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(value) for value in base.split("-", 1))
+        else:
+            start = end = int(base)
+            if step:
+                end = high
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+def parse_cron(expression: str) -> list[set[int]]:
+    """
+    Parse a five-field cron expression (minute hour day month weekday).
+    Fields accept *, lists (1,15), ranges (9-17) and steps (*/15); Sunday is 0 or 7.
+    """
+    specs = expression.split()
+    if len(specs) != len(CRON_FIELDS):
+        raise ValueError(f"Cron expression '{expression}' must have {len(CRON_FIELDS)} fields")
+
+    fields = []
+    for spec, (name, low, high) in zip(specs, CRON_FIELDS):
+        try:
+            values = _parse_cron_field(spec, low, high if name != "weekday" else 7)
+        except ValueError:
+            raise ValueError(f"Invalid cron {name} field '{spec}' in '{expression}'") from None
+        if name == "weekday" and 7 in values:
+            values = (values - {7}) | {0}
+        if not values or min(values) < low or max(values) > high:
+            raise ValueError(f"Cron {name} field '{spec}' is out of range {low}-{high}")
+        fields.append(values)
+    return fields
+
+
+def cron_matches(fields: list[set[int]], moment: datetime) -> bool:
+    minutes, hours, days, months, weekdays = fields
+    if moment.minute not in minutes or moment.hour not in hours or moment.month not in months:
+        return False
+    # Like cron: when both day fields are restricted, either one matching is enough
+    day_match = moment.day in days
+    weekday_match = (moment.weekday() + 1) % 7 in weekdays
+    if len(days) < 31 and len(weekdays) < 7:
+        return day_match or weekday_match
+    return day_match and weekday_match
+
+
+class Schedule:
+    """A recurring run: a cron expression plus a topic list it rotates through."""
+
+    def __init__(
+        self,
+        name: str,
+        cron: str,
+        topics: list[str],
+        count: int = 1,
+        max_concurrent: int = 1,
+        priority: str = "scheduled",
+    ):
+        if not topics:
+            raise ValueError(f"Schedule '{name}' has no topics")
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Schedule '{name}' has unknown priority '{priority}'")
+        self.name = name
+        self.cron = cron
+        self.fields = parse_cron(cron)
+        self.topics = topics
+        self.count = count
+        self.max_concurrent = max(1, max_concurrent)
+        self.priority = priority
+
+
+def load_schedules(path: str = SCHEDULES_FILE) -> list[Schedule]:
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return [Schedule(**entry) for entry in config.get("schedules", [])]
+
+
+class TopicScheduler:
+    """
+    Long-running daemon that starts run_workflow for each schedule when its cron
+    expression matches. A run is skipped while the schedule already has
+    max_concurrent runs in flight, and the topic rotation and last-run details
+    are persisted so a restart picks up where the daemon left off.
+    """
+
+    def __init__(self, schedules: list[Schedule], state_file: str = SCHEDULER_STATE_FILE):
+        self.schedules = schedules
+        self.state_file = state_file
+        self.state = self._load_state()
+        self._active: dict[str, set[asyncio.Task]] = {schedule.name: set() for schedule in schedules}
+        # Loaded once and shared by every run, so ideas committed by one run are seen by the next
+        self.idea_index = IdeaIndex()
+
+    def _load_state(self) -> dict[str, dict[str, Any]]:
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self) -> None:
+        # Write to a temp file first so a crash never leaves half-written state
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_file, self.state_file)
+
+    def _schedule_state(self, schedule: Schedule) -> dict[str, Any]:
+        return self.state.setdefault(schedule.name, {"next_topic": 0, "runs": 0, "skipped": 0})
+
+    def tick(self, moment: datetime) -> list[asyncio.Task]:
+        """Start every schedule due at this minute; returns the tasks started."""
+        started = []
+        changed = False
+        for schedule in self.schedules:
+            if not cron_matches(schedule.fields, moment):
+                continue
+
+            changed = True
+            state = self._schedule_state(schedule)
+            active = self._active[schedule.name]
+            if len(active) >= schedule.max_concurrent:
+                print(f"Skipping '{schedule.name}' at {moment:%Y-%m-%d %H:%M}: {len(active)} run(s) still active")
+                state["skipped"] += 1
+                state["last_skipped_at"] = moment.isoformat()
+                continue
+
+            topic = schedule.topics[state["next_topic"] % len(schedule.topics)]
+            state["next_topic"] = (state["next_topic"] + 1) % len(schedule.topics)
+            state["runs"] += 1
+            state["last_run_at"] = moment.isoformat()
+            state["last_topic"] = topic
+            print(f"Starting '{schedule.name}' run for topic: '{topic}'")
+
+            task = asyncio.create_task(self._run(schedule, topic))
+            active.add(task)
+            started.append(task)
+
+        if changed:
+            self._save_state()
+        return started
+
+    async def _run(self, schedule: Schedule, topic: str) -> None:
+        state = self._schedule_state(schedule)
+        try:
+            completed = await run_workflow(topic, schedule.count, priority=schedule.priority, index=self.idea_index)
+            # run_workflow logs its own errors, so the completed count is what tells a failed run apart
+            state["last_completed"] = completed
+            if completed >= schedule.count:
+                state["last_status"] = "finished"
+            else:
+                state["last_status"] = "partial" if completed else "failed"
+        except Exception as e:
+            print(f"Scheduled run '{schedule.name}' failed: {str(e)}")
+            state["last_status"] = "failed"
+        finally:
+            state["last_finished_at"] = datetime.now().isoformat(timespec="seconds")
+            self._active[schedule.name].discard(asyncio.current_task())
+            self._save_state()
+
+    async def run_forever(self) -> None:
+        """Wake at the start of every minute and start the schedules that are due."""
+        print(f"Scheduler daemon started with {len(self.schedules)} schedule(s)")
+        last_ticked: Optional[datetime] = None
+        while True:
+            now = datetime.now()
+            next_minute = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+            await asyncio.sleep((next_minute - now).total_seconds())
+            # A wake-up just before the minute boundary (timer slack, clock steps) lands on the minute already ticked
+            if last_ticked is not None and next_minute <= last_ticked:
+                continue
+            self.tick(next_minute)
+            last_ticked = next_minute
+
+    async def run_once(self, moment: Optional[datetime] = None) -> None:
+        """Run the schedules due at moment (default: now) and wait for them to finish."""
+        tasks = self.tick((moment or datetime.now()).replace(second=0, microsecond=0))
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            schedule.name: {**self._schedule_state(schedule), "active": len(self._active[schedule.name])}
+            for schedule in self.schedules
+        }
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run topic schedules from one long-lived process")
+    parser.add_argument("--config", default=SCHEDULES_FILE, help="JSON file with the schedule definitions")
+    parser.add_argument("--state", default=SCHEDULER_STATE_FILE, help="where rotation and last-run state is kept")
+    parser.add_argument("--once", action="store_true", help="run whatever is due this minute, then exit")
+    args = parser.parse_args(argv)
+
+    daemon = TopicScheduler(load_schedules(args.config), args.state)
+    try:
+        if args.once:
+            await daemon.run_once()
+        else:
+            await daemon.run_forever()
+    finally:
+        print(f"Schedule stats: {daemon.stats()}")
+        print(f"Model router stats: {router_stats()}")
+        print(f"API key pool stats: {key_pool_stats()}")
+        print(f"Request scheduler stats: {scheduler_stats()}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Scheduler daemon stopped")
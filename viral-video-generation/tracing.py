@@ -0,0 +1,202 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator, Optional
+
+
+# Set PIPELINE_TRACE_DIR to write a Chrome trace (chrome://tracing, Perfetto) per run
+TRACE_DIR_ENV = "PIPELINE_TRACE_DIR"
+# Set PIPELINE_PROFILE_CPU=1 to also sample Python stacks while a traced run is active
+PROFILE_CPU_ENV = "PIPELINE_PROFILE_CPU"
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+# Leaf frames (file path suffix, function) where a sampled thread is blocked in a C call rather
+# than running Python code; matched on the file too so app functions named get/read/wait still count
+IDLE_FRAMES = {
+    ("threading.py", "wait"),  # Condition.wait / Event.wait, blocked in Lock.acquire
+    ("threading.py", "_wait_for_tstate_lock"),  # Thread.join
+    ("concurrent/futures/thread.py", "_worker"),  # idle executor thread, blocked in SimpleQueue.get
+    ("selectors.py", "select"),  # event loop waiting for I/O
+    ("socket.py", "readinto"),  # plain HTTP response reads
+    ("socket.py", "accept"),
+    ("socket.py", "getaddrinfo"),
+    ("socket.py", "create_connection"),
+    ("urllib3/util/connection.py", "create_connection"),
+    ("ssl.py", "read"),  # HTTPS response reads
+    ("ssl.py", "do_handshake"),
+}
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Collects finished spans for one run and writes them as a Chrome trace."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def new_span_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def record(self, name: str, started: float, ended: float, span_id: int, parent_id: Optional[int], attrs: dict[str, Any]) -> None:
+        event = {
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": round((started - self.started) * 1e6, 1),
+            "dur": round((ended - started) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"span_id": span_id, "parent_id": parent_id, **attrs},
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def write(self, path: str, metadata: Optional[dict[str, Any]] = None) -> None:
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": metadata or {}}, handle, default=str)
+
+
+@contextmanager
+def _recording_span(trace: Trace, name: str, attrs: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    span_id = trace.new_span_id()
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as exc:
+        attrs["error"] = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.record(name, started, time.perf_counter(), span_id, parent_id, attrs)
+
+
+def span(name: str, **attrs: Any):
+    """
+    Time a block as a child of the current span when a trace is active.
+    Yields the span's attribute dict so the block can add attributes; outside a
+    traced run this is a no-op context manager.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return nullcontext({})
+    return _recording_span(trace, name, attrs)
+
+
+class StackSampler:
+    """
+    Sampling profiler for the Python side of a run. A background thread grabs
+    every other thread's stack each SAMPLE_INTERVAL_SECONDS; samples whose leaf
+    frame is blocked (IDLE_FRAMES, e.g. socket reads or lock waits) are
+    counted as idle so the rest shows where non-network time goes.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.idle_samples = 0
+        self._idle_codes: dict[Any, bool] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _is_idle(self, code: Any) -> bool:
+        idle = self._idle_codes.get(code)
+        if idle is None:
+            path = code.co_filename.replace(os.sep, "/")
+            idle = any(code.co_name == name and path.endswith(f"/{suffix}") for suffix, name in IDLE_FRAMES)
+            self._idle_codes[code] = idle
+        return idle
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self._is_idle(frame.f_code):
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: str) -> None:
+        """Write collapsed stacks (flamegraph.pl / speedscope input)."""
+        with open(path, "w", encoding="utf-8") as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit: int = 10) -> list[tuple[str, int]]:
+        """Functions with the most busy samples on top of the stack (self time)."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+@contextmanager
+def trace_run(name: str, trace_dir: Optional[str] = None, profile_cpu: Optional[bool] = None, **attrs: Any) -> Iterator[dict[str, Any]]:
+    """
+    Opt-in profiling for one run. Without a trace directory (argument or
+    PIPELINE_TRACE_DIR) this only opens a span, so nested runs inside an
+    outer trace still show up. Otherwise every span in the run is written to
+    <trace_dir>/<name>-<timestamp>-<id>.json, plus a .folded CPU profile when
+    profile_cpu (or PIPELINE_PROFILE_CPU=1) is set.
+    """
+    trace_dir = trace_dir or os.getenv(TRACE_DIR_ENV)
+    if _current_trace.get() is not None or not trace_dir:
+        with span(name, **attrs) as root:
+            yield root
+        return
+
+    if profile_cpu is None:
+        profile_cpu = os.getenv(PROFILE_CPU_ENV) == "1"
+    trace = Trace(name)
+    sampler = StackSampler() if profile_cpu else None
+    token = _current_trace.set(trace)
+    if sampler is not None:
+        sampler.start()
+    try:
+        with span(name, **attrs) as root:
+            yield root
+    finally:
+        _current_trace.reset(token)
+        if sampler is not None:
+            sampler.stop()
+
+        os.makedirs(trace_dir, exist_ok=True)
+        base = os.path.join(trace_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}")
+        metadata = {"run": name, **attrs}
+        if sampler is not None:
+            sampler.write_folded(f"{base}.folded")
+            metadata["cpu_top_functions"] = sampler.top_functions()
+            metadata["cpu_idle_samples"] = sampler.idle_samples
+        trace.write(f"{base}.json", metadata)
+        print(f"Trace written to {base}.json" + (f" (CPU profile: {base}.folded)" if sampler is not None else ""))
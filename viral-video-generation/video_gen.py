@@ -1,23 +1,56 @@
-import os
 from typing import Any, Dict, Optional
 
-import requests
+from storyboard import MAX_STORYBOARD_SECONDS, SHOT_FIELDS, check_and_repair
+from tracing import span
+from utils import build_payload, get_api_key, generate_content, json_dumps, json_loads, record_parse_result
 
 
 DEFAULT_GEMINI_MODEL = "gemini-1.5-flash"
 
-
-def _get_api_key() -> Optional[str]:
-    return (
-        os.getenv("GEMINI_API_KEY")
-        or os.getenv("KIE_API_TOKEN")
-        or os.getenv("KIE_API_KEY")
-    )
-
-
-def start_video_generation(prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
-    """Generate a storyboard using Gemini for the supplied prompt."""
-    api_key = _get_api_key()
+# responseSchema sent with every storyboard request so the output is always valid JSON
+STORYBOARD_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "overview": {"type": "STRING"},
+        "shots": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    **{field: {"type": "STRING"} for field in SHOT_FIELDS},
+                    "timestamp": {"type": "STRING", "description": 'Shot time range written as "Ns-Ms", e.g. "0s-2s"'},
+                },
+                "required": SHOT_FIELDS,
+                "propertyOrdering": SHOT_FIELDS,
+            },
+        },
+        "call_to_action": {"type": "STRING"},
+    },
+    "required": ["overview", "shots", "call_to_action"],
+    "propertyOrdering": ["overview", "shots", "call_to_action"],
+}
+
+
+STORYBOARD_SYSTEM_INSTRUCTION = (
+    "You are an AI creative director specialising in viral short-form videos."
+    " Produce a JSON storyboard with time-coded shots, visuals, camera notes,"
+    " and narration that can be handed to a video generation model."
+    " Shots run in order without overlaps, the last shot ends by"
+    f" {MAX_STORYBOARD_SECONDS:g}s, and every timestamp is written as \"Ns-Ms\" (e.g. \"0s-2s\")."
+)
+
+
+def start_video_generation(
+    prompt: str,
+    model: Optional[str] = None,
+    budget_key: Optional[str] = None,
+    keep_raw: bool = True,
+) -> Dict[str, Any]:
+    """
+    Generate a storyboard using Gemini for the supplied prompt.
+    With keep_raw=False the raw API response is dropped from the result.
+    """
+    api_key = get_api_key()
     if not api_key:
         return {
             "status": "failed",
@@ -25,87 +58,71 @@ def start_video_generation(prompt: str, model: Optional[str] = None) -> Dict[str
         }
 
     target_model = model or DEFAULT_GEMINI_MODEL
-    endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{target_model}:generateContent"
 
-    system_instruction = (
-        "You are an AI creative director specialising in viral short-form videos."
-        " Produce a JSON storyboard with time-coded shots, visuals, camera notes,"
-        " and narration that can be handed to a video generation model."
-    )
+    try:
+        payload = storyboard_payload(prompt, budget_key)
+        result = generate_content(target_model, api_key, payload, budget_key or "storyboard")
+    except ValueError as exc:
+        return {
+            "status": "failed",
+            "model": target_model,
+            "error": str(exc),
+        }
+    return storyboard_result(result, api_key, budget_key, keep_raw)
+
 
+def storyboard_payload(prompt: str, budget_key: Optional[str] = None) -> Dict[str, Any]:
+    """The generateContent payload for a storyboard request (also packed into offline batch jobs)."""
     user_prompt = (
         "Create a viral short-form video plan using this generated prompt:\n\n"
         f"{prompt}"
     )
 
-    payload = {
-        "systemInstruction": {
-            "role": "system",
-            "parts": [{"text": system_instruction}],
-        },
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": user_prompt}],
-            }
-        ],
-        "generationConfig": {
-            "temperature": 0.9,
-            "topP": 0.95,
-            "topK": 40,
-            "maxOutputTokens": 2048,
-        },
-    }
-
-    try:
-        response = requests.post(
-            endpoint,
-            params={"key": api_key},
-            json=payload,
-            timeout=60,
-        )
-    except requests.RequestException as exc:
-        return {
-            "status": "failed",
-            "error": f"Gemini request failed: {exc}",
-        }
-
-    if response.status_code != 200:
-        return {
-            "status": "failed",
-            "error": f"Gemini API error {response.status_code}",
-            "details": response.text,
-        }
+    # build_payload also preflights the request size against the token limits
+    return build_payload(
+        STORYBOARD_SYSTEM_INSTRUCTION, user_prompt, 0.9, STORYBOARD_SCHEMA, label=budget_key or "storyboard"
+    )
 
-    data = response.json()
-    storyboard = _extract_text_from_response(data)
 
+def storyboard_result(
+    result: Dict[str, Any],
+    api_key: Optional[str],
+    budget_key: Optional[str] = None,
+    keep_raw: bool = True,
+) -> Dict[str, Any]:
+    """Turn a generate_content result into a start_video_generation result, repairing invalid shots."""
+    storyboard = result["text"]
     if not storyboard:
         return {
             "status": "failed",
+            "model": result["model"],
             "error": "Gemini response did not include any text output.",
-            "details": data,
+            "details": result["raw"] if keep_raw else None,
         }
 
+    shot_issues: dict[int, list[str]] = {}
+    try:
+        with span("parse.storyboard", chars=len(storyboard)):
+            parsed = json_loads(storyboard)
+        record_parse_result("storyboard", True)
+    except ValueError:
+        record_parse_result("storyboard", False)
+    else:
+        # Fix bad shots with a targeted repair call instead of regenerating the whole storyboard
+        repaired, shot_issues = check_and_repair(parsed, result["model"], api_key, STORYBOARD_SYSTEM_INSTRUCTION, budget_key)
+        if repaired is not parsed:
+            storyboard = json_dumps(repaired).decode("utf-8")
+        if shot_issues:
+            print(f"Storyboard still has invalid shots after repair: {shot_issues}")
+
     return {
         "status": "completed",
+        "model": result["model"],
         "response": {
             "text": storyboard,
-            "raw": data,
+            "raw": result["raw"] if keep_raw else None,
+            "finish_reason": result["finish_reason"],
+            "usage": result["usage"],
+            "shot_issues": shot_issues,
         },
     }
-
-
-def _extract_text_from_response(data: Dict[str, Any]) -> str:
-    candidates = data.get("candidates", [])
-    for candidate in candidates:
-        content = candidate.get("content", {})
-        parts = content.get("parts", [])
-        text_output = []
-        for part in parts:
-            text = part.get("text")
-            if text:
-                text_output.append(text)
-        if text_output:
-            return "\n".join(text_output).strip()
-    return ""